@@ -0,0 +1,158 @@
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Optional
+import asyncio
+import csv
+import os
+
+from pydantic_core import from_json
+
+from .validation import TemplateValidator
+
+# Limits for bulk uploads
+BULK_MAX_LINE_BYTES = int(os.environ.get("BULK_MAX_LINE_BYTES", str(1024 * 1024)))
+BULK_MAX_ERRORS = int(os.environ.get("BULK_MAX_ERRORS", "1000"))
+BULK_DEFAULT_CHUNK_SIZE = int(os.environ.get("BULK_DEFAULT_CHUNK_SIZE", "500"))
+BULK_MAX_CHUNK_SIZE = int(os.environ.get("BULK_MAX_CHUNK_SIZE", "5000"))
+
+# A parsed line: (line number, values or None if the line is invalid, errors)
+ParsedRow = tuple[int, Optional[Dict[str, Any]], list[str]]
+
+
+class LineTooLong(Exception):
+    pass
+
+
+async def iter_lines(stream: AsyncIterator[bytes]) -> AsyncIterator[tuple[int, bytes]]:
+    """Split a byte stream into numbered lines without buffering the whole body"""
+    buffer = bytearray()
+    line_no = 0
+    async for chunk in stream:
+        buffer += chunk
+        start = 0
+        while (end := buffer.find(b"\n", start)) != -1:
+            line_no += 1
+            yield line_no, bytes(buffer[start:end]).rstrip(b"\r")
+            start = end + 1
+        del buffer[:start]
+        if len(buffer) > BULK_MAX_LINE_BYTES:
+            raise LineTooLong(f"La línea {line_no + 1} supera el tamaño máximo de {BULK_MAX_LINE_BYTES} bytes")
+    if buffer:
+        yield line_no + 1, bytes(buffer).rstrip(b"\r")
+
+
+async def parse_ndjson(stream: AsyncIterator[bytes]) -> AsyncIterator[ParsedRow]:
+    """Parse NDJSON lines shaped like the single-row body: {"values": {...}}"""
+    async for line_no, line in iter_lines(stream):
+        if not line.strip():
+            continue
+        try:
+            row = from_json(line)
+        except ValueError as e:
+            yield line_no, None, [f"JSON inválido: {e}"]
+            continue
+        if not isinstance(row, dict) or not isinstance(row.get("values"), dict):
+            yield line_no, None, ["Cada línea debe ser un objeto con la clave 'values'"]
+            continue
+        yield line_no, row["values"], []
+
+
+async def parse_csv(stream: AsyncIterator[bytes], validator: TemplateValidator) -> AsyncIterator[ParsedRow]:
+    """Parse CSV records whose header holds template field names; empty cells are skipped"""
+    header: Optional[list[str]] = None
+    pending: list[str] = []
+    record_line = 0
+    async for line_no, raw in iter_lines(stream):
+        line = raw.decode("utf-8-sig" if line_no == 1 else "utf-8", errors="replace")
+        if not pending:
+            record_line = line_no
+        pending.append(line)
+        # A quoted cell may span several physical lines
+        if sum(part.count('"') for part in pending) % 2:
+            continue
+        record = next(csv.reader(["\n".join(pending)]), [])
+        pending = []
+        if not any(cell.strip() for cell in record):
+            continue
+        if header is None:
+            header = [name.strip() for name in record]
+            continue
+        if len(record) > len(header):
+            yield record_line, None, [f"La fila tiene {len(record)} columnas, se esperaban {len(header)}"]
+            continue
+        values, errors = validator.coerce_text({name: cell for name, cell in zip(header, record) if cell != ""})
+        yield record_line, (values if not errors else None), errors
+    if pending:
+        yield record_line, None, ["Comillas sin cerrar al final del archivo"]
+
+
+class BulkImporter:
+    """Groups parsed rows into chunks, validates each chunk in one pass and inserts it.
+
+    One chunk insert is kept in flight while the next chunk is being parsed, so
+    memory stays bounded by the chunk size regardless of the upload size.
+    """
+
+    def __init__(
+        self,
+        insert_rows: Callable[[list[Dict[str, Any]]], Awaitable[None]],
+        validator: TemplateValidator,
+        chunk_size: int,
+        prevalidated: bool = False,
+    ):
+        self.insert_rows = insert_rows
+        self.validator = validator
+        self.chunk_size = chunk_size
+        self.prevalidated = prevalidated
+        self.inserted = 0
+        self.failed = 0
+        self.errors: list[dict] = []
+        self._batch: list[tuple[int, Dict[str, Any]]] = []
+        self._pending: Optional[asyncio.Task] = None
+
+    def add_error(self, line: int, messages: list[str]) -> None:
+        self.failed += 1
+        if len(self.errors) < BULK_MAX_ERRORS:
+            self.errors.append({"line": line, "errors": messages})
+
+    async def add(self, line: int, values: Optional[Dict[str, Any]], errors: list[str]) -> None:
+        if errors:
+            self.add_error(line, errors)
+            return
+        self._batch.append((line, values))
+        if len(self._batch) >= self.chunk_size:
+            await self.flush()
+
+    async def flush(self) -> None:
+        batch, self._batch = self._batch, []
+        if not self.prevalidated and batch:
+            row_errors = self.validator.validate_many([values for _, values in batch])
+            for (line, _), errors in zip(batch, row_errors):
+                if errors:
+                    self.add_error(line, errors)
+            batch = [row for row, errors in zip(batch, row_errors) if not errors]
+        await self._wait_pending()
+        if batch:
+            self._pending = asyncio.create_task(self._insert(batch))
+
+    async def finish(self) -> dict:
+        await self.flush()
+        await self._wait_pending()
+        return {
+            "message": "Importación finalizada",
+            "inserted": self.inserted,
+            "failed": self.failed,
+            "errors": self.errors,
+            "errors_truncated": self.failed > len(self.errors),
+        }
+
+    async def _wait_pending(self) -> None:
+        if self._pending is not None:
+            pending, self._pending = self._pending, None
+            await pending
+
+    async def _insert(self, batch: list[tuple[int, Dict[str, Any]]]) -> None:
+        try:
+            await self.insert_rows([values for _, values in batch])
+            self.inserted += len(batch)
+        except Exception as e:
+            for line, _ in batch:
+                self.add_error(line, [f"Error al guardar el registro: {e}"])
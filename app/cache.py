@@ -0,0 +1,109 @@
+from collections import OrderedDict
+from threading import Lock
+from typing import TYPE_CHECKING, Any, Hashable, Optional
+import os
+import time
+
+from .singleflight import coalesce, invalidate_reads
+
+if TYPE_CHECKING:
+    # Imported for annotations only: the storage package imports this module
+    from .storage import Repository
+
+# Template cache configuration
+TEMPLATE_CACHE_SIZE = int(os.environ.get("TEMPLATE_CACHE_SIZE", "1024"))
+# Writes only invalidate the cache of the worker that handled them: with
+# several workers the others may serve a stale template until it expires
+TEMPLATE_CACHE_TTL = float(os.environ.get(
+    "TEMPLATE_CACHE_TTL", "60" if int(os.environ.get("WEB_CONCURRENCY", "1")) <= 1 else "5"
+))
+
+
+class TTLCache:
+    """Bounded in-process LRU cache whose entries expire after a TTL"""
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or entry[0] <= time.monotonic():
+                if entry is not None:
+                    del self._data[key]
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def invalidate(self, key: Hashable) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> dict:
+        """Hit/miss counters for monitoring"""
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+# (templates version the row was read under, or None, template row) keyed by (user_id, template_id)
+template_cache = TTLCache(TEMPLATE_CACHE_SIZE, TEMPLATE_CACHE_TTL)
+
+
+async def get_template(
+    repository: "Repository",
+    user_id: str,
+    template_id: str,
+    version: Optional[int] = None,
+) -> Optional[dict]:
+    """Fetch a template owned by the user (not being deleted), served from the template cache when possible.
+
+    Callers that already read the user's templates version (see conditional.templates_version_key)
+    pass it: a template cached under another version, possibly changed by another worker, is read again."""
+    key = (user_id, template_id)
+    entry = template_cache.get(key)
+    if entry is not None and (version is None or entry[0] == version):
+        return entry[1]
+
+    # Concurrent misses for the same template share one query
+    template = await coalesce(
+        "template", user_id, template_id, (),
+        lambda: repository.get_template(user_id, template_id),
+    )
+    if template is None:
+        template_cache.invalidate(key)
+        return None
+
+    template_cache.set(key, (version, template))
+    return template
+
+
+def invalidate_template(user_id: str, template_id: str) -> None:
+    """Drop a cached template after it has been modified or deleted"""
+    template_cache.invalidate((user_id, template_id))
+    invalidate_reads(user_id, template_id)
@@ -0,0 +1,83 @@
+"""Compact (positional) storage of template data values.
+
+Templates created with `compact: true`, or converted with
+`python -m app.manage compact-values`, store each row's `values` as an array
+instead of an object: `[layout version, value of fields[0], value of fields[1], ...]`,
+with null for missing values. Field names are not repeated in every row. The
+layout version is a fingerprint of the field names in order. It is checked on
+decode, because positions only mean something for the fields they were written
+with (fields cannot change once a template has data).
+
+Rows of a compact template may still be objects (written before a conversion,
+or by a worker whose cached template predates it): both forms are read.
+"""
+from functools import lru_cache
+from typing import Any, Callable, Optional
+import hashlib
+
+
+class LayoutMismatch(ValueError):
+    """A compact row was written for a different list of fields"""
+
+
+@lru_cache(maxsize=1024)
+def _layout_version(names: tuple[str, ...]) -> int:
+    return int(hashlib.md5("\x1f".join(names).encode()).hexdigest()[:4], 16)
+
+
+def layout_version(fields: list[dict]) -> int:
+    """16 bit fingerprint of the field names in order, like public.template_layout_version"""
+    return _layout_version(tuple(field["name"] for field in fields))
+
+
+def compact_layout(template: dict) -> Optional[list[str]]:
+    """Field names in storage order for a compact template, None for object storage"""
+    if not template.get("compact"):
+        return None
+    return [field["name"] for field in template["fields"]]
+
+
+def encode_values(template: dict, values: dict[str, Any]) -> dict[str, Any] | list[Any]:
+    """Values in the storage format of the template"""
+    if not template.get("compact"):
+        return values
+    return [layout_version(template["fields"])] + [values.get(field["name"]) for field in template["fields"]]
+
+
+def _decoder(template: dict) -> Callable[[list[Any]], dict[str, Any]]:
+    names = tuple(field["name"] for field in template["fields"])
+    version, width = _layout_version(names), len(names) + 1
+
+    def decode(stored: list[Any]) -> dict[str, Any]:
+        if len(stored) != width or stored[0] != version:
+            raise LayoutMismatch("Registro guardado con otra versión de los campos del template")
+        # Rows with every value set (the common case) are built in C, without a per-value check
+        if None in stored:
+            return {name: value for name, value in zip(names, stored[1:]) if value is not None}
+        return dict(zip(names, stored[1:]))
+    return decode
+
+
+def decode_values(template: dict, stored: dict[str, Any] | list[Any]) -> dict[str, Any]:
+    """Values as an object, whatever format they were stored in"""
+    if not isinstance(stored, list):
+        return stored
+    return _decoder(template)(stored)
+
+
+def decode_row(template: dict, row: dict) -> dict:
+    if not isinstance(row.get("values"), list):
+        return row
+    return {**row, "values": decode_values(template, row["values"])}
+
+
+def decode_rows(template: dict, rows: list[dict]) -> list[dict]:
+    decode = None
+    decoded = []
+    for row in rows:
+        stored = row.get("values")
+        if isinstance(stored, list):
+            decode = decode or _decoder(template)
+            row = {**row, "values": decode(stored)}
+        decoded.append(row)
+    return decoded
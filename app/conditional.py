@@ -0,0 +1,53 @@
+from typing import Any
+import hashlib
+
+from fastapi import Request, Response
+
+# Clients must revalidate every time, but may keep the body and send If-None-Match
+CACHE_CONTROL = "private, no-cache"
+
+
+def templates_version_key(user_id: str) -> str:
+    """Version of all templates of a user (list and details)"""
+    return f"templates:{user_id}"
+
+
+def template_data_version_key(template_id: str) -> str:
+    """Version of the data entries of a template"""
+    return f"template_data:{template_id}"
+
+
+def user_data_version_key(user_id: str) -> str:
+    """Version of the data entries of all templates of a user"""
+    return f"user_data:{user_id}"
+
+
+def make_etag(*parts: Any) -> str:
+    """Weak ETag derived from the resource versions and everything else shaping the response.
+
+    Weak, because GZipMiddleware sends the same tag on gzip and identity bodies:
+    they are the same content, not the same bytes.
+    """
+    digest = hashlib.sha256("\x1f".join(str(part) for part in parts).encode()).hexdigest()
+    return f'W/"{digest[:32]}"'
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """Whether the request's If-None-Match header matches the ETag (weak comparison)"""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    opaque = etag.removeprefix("W/")
+    return any(tag.strip().removeprefix("W/") == opaque for tag in header.split(","))
+
+
+def etag_headers(etag: str) -> dict[str, str]:
+    # The body may be sent gzipped or not: caches must key it on Accept-Encoding
+    return {"ETag": etag, "Cache-Control": CACHE_CONTROL, "Vary": "Accept-Encoding"}
+
+
+def not_modified(etag: str) -> Response:
+    """304 response, sent without fetching or encoding the body"""
+    return Response(status_code=304, headers=etag_headers(etag))
@@ -1,10 +1,23 @@
-from fastapi import Depends, HTTPException, status, Request
+from fastapi import Depends, Header, HTTPException, status, Request
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from typing import Optional
 from pydantic import BaseModel
+import asyncio
+import hashlib
+import hmac
+import logging
 import os
+import time
+import httpx
 import jwt
-from supabase import create_client, Client
+from supabase import acreate_client, AsyncClient, AsyncClientOptions
+from supabase_auth import AsyncGoTrueClient
+
+from .cache import TTLCache
+from .metrics import InstrumentedTransport
+from .profiling import timed
+
+logger = logging.getLogger(__name__)
 
 # Replace with your Supabase Project URL and Anon Key
 # It's recommended to use environment variables for these
@@ -17,14 +30,29 @@ JWT_SECRET = os.environ.get("SUPABASE_JWT_SECRET")
 if not JWT_SECRET:
     raise RuntimeError("SUPABASE_JWT_SECRET environment variable is not set")
 
-# Initialize the Supabase client
-try:
-    supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
-except Exception as e:
-    # Handle cases where URL or Key might be missing or invalid at startup
-    print(f"Error initializing Supabase client: {e}")
-    print("Please ensure SUPABASE_URL and SUPABASE_KEY are set correctly.")
-    supabase = None  # type: ignore
+# Asymmetric (JWT signing keys) tokens are verified with the project's JWKS,
+# loaded at startup and refreshed in the background
+JWKS_URL = os.environ.get("SUPABASE_JWKS_URL", f"{SUPABASE_URL.rstrip('/')}/auth/v1/.well-known/jwks.json")
+JWKS_REFRESH_INTERVAL = float(os.environ.get("JWKS_REFRESH_INTERVAL", "600"))
+ASYMMETRIC_ALGORITHMS = ("RS256", "ES256", "EdDSA")
+
+# Shared secret of the operator endpoints (/write-behind); unset disables them
+ADMIN_SECRET = os.environ.get("ADMIN_SECRET", "")
+
+# Verified tokens are cached until they expire
+TOKEN_CACHE_SIZE = int(os.environ.get("TOKEN_CACHE_SIZE", "10000"))
+
+# HTTP connection pool shared by every Supabase sub-client (PostgREST, auth, ...)
+SUPABASE_MAX_CONNECTIONS = int(os.environ.get("SUPABASE_MAX_CONNECTIONS", "100"))
+SUPABASE_MAX_KEEPALIVE = int(os.environ.get("SUPABASE_MAX_KEEPALIVE", "20"))
+SUPABASE_KEEPALIVE_EXPIRY = float(os.environ.get("SUPABASE_KEEPALIVE_EXPIRY", "30"))
+SUPABASE_TIMEOUT = float(os.environ.get("SUPABASE_TIMEOUT", "10"))
+
+# The async Supabase client is created lazily on first use, since it has to be
+# built inside the running event loop
+supabase: Optional[AsyncClient] = None
+_http_client: Optional[httpx.AsyncClient] = None
+_supabase_lock = asyncio.Lock()
 
 # Security scheme
 security = HTTPBearer()
@@ -38,24 +66,157 @@ class UserClaims(BaseModel):
     email: str
     phone: Optional[str] = ""
 
-def get_supabase_client() -> Client:
+def create_http_client(transport: Optional[httpx.AsyncBaseTransport] = None, **kwargs) -> httpx.AsyncClient:
+    """Build the pooled keep-alive HTTP client used to talk to Supabase"""
+    if transport is None:
+        transport = httpx.AsyncHTTPTransport(
+            limits=httpx.Limits(
+                max_connections=SUPABASE_MAX_CONNECTIONS,
+                max_keepalive_connections=SUPABASE_MAX_KEEPALIVE,
+                keepalive_expiry=SUPABASE_KEEPALIVE_EXPIRY,
+            ),
+            http2=True,
+        )
+    return httpx.AsyncClient(
+        # Every Supabase call is timed and counted for /metrics
+        transport=InstrumentedTransport(transport),
+        timeout=SUPABASE_TIMEOUT,
+        follow_redirects=True,
+        **kwargs,
+    )
+
+async def get_supabase_client() -> AsyncClient:
     """Dependency to get Supabase client instance"""
+    global supabase, _http_client
+    if supabase is None:
+        # Normally opened by the app's lifespan; created here for scripts and tests
+        async with _supabase_lock:
+            if supabase is None:
+                _http_client = create_http_client()
+                supabase = await acreate_client(
+                    SUPABASE_URL,
+                    SUPABASE_KEY,
+                    options=AsyncClientOptions(httpx_client=_http_client),
+                )
     return supabase
 
+async def get_auth_client(supabase: AsyncClient = Depends(get_supabase_client)) -> AsyncGoTrueClient:
+    """Dependency giving each request its own GoTrue client.
+
+    Sign-in and session calls store the session on the client (and the shared
+    Supabase client would then send that user's token on every query), so
+    they must never run on a shared client. A per-request client holds no
+    state beyond the request and still uses the pooled connections.
+    """
+    return AsyncGoTrueClient(
+        url=str(supabase.auth_url),
+        headers={"apiKey": supabase.supabase_key, "Authorization": f"Bearer {supabase.supabase_key}"},
+        persist_session=False,
+        auto_refresh_token=False,
+        http_client=supabase.options.httpx_client,
+    )
+
+async def open_supabase_client() -> AsyncClient:
+    """Create the Supabase client and warm it up before the app starts serving.
+
+    Loading the JWKS through the pooled client also opens the connection to
+    Supabase, so the first request does not pay for the TCP/TLS handshake.
+    """
+    client = await get_supabase_client()
+    await load_jwks()
+    return client
+
+async def close_supabase_client() -> None:
+    """Release the pooled connections held by the Supabase client"""
+    global supabase, _http_client
+    if _http_client is not None:
+        await _http_client.aclose()
+    supabase = None
+    _http_client = None
+
+# Validated claims keyed by the SHA-256 of the token
+token_cache = TTLCache(TOKEN_CACHE_SIZE, 0)
+
+# Signing keys by key id, replaced as a whole on every refresh
+_jwks_keys: dict[str, jwt.PyJWK] = {}
+
+async def load_jwks(http_client: Optional[httpx.AsyncClient] = None) -> None:
+    """Fetch the project's JWKS so asymmetric tokens can be verified locally.
+
+    Uses the pooled Supabase connection when it is open.
+    """
+    global _jwks_keys
+    http_client = http_client or _http_client
+    try:
+        if http_client is not None:
+            response = await http_client.get(JWKS_URL, headers={"apikey": SUPABASE_KEY})
+        else:
+            async with httpx.AsyncClient(timeout=SUPABASE_TIMEOUT) as client:
+                response = await client.get(JWKS_URL, headers={"apikey": SUPABASE_KEY})
+        response.raise_for_status()
+        keys = {}
+        for key in jwt.PyJWKSet.from_dict(response.json()).keys:
+            if key.key_id:
+                keys[key.key_id] = key
+        _jwks_keys = keys
+    except jwt.PyJWKSetError:
+        # Projects that only use the shared secret publish no usable keys
+        _jwks_keys = {}
+    except Exception as e:
+        logger.warning("Could not load JWKS from %s: %s", JWKS_URL, e)
+
+async def refresh_jwks_periodically(http_client: Optional[httpx.AsyncClient] = None) -> None:
+    """Background task keeping the JWKS up to date (signing key rotation)"""
+    while True:
+        await asyncio.sleep(JWKS_REFRESH_INTERVAL)
+        await load_jwks(http_client)
+
+def _verification_key(token: str):
+    header = jwt.get_unverified_header(token)
+    algorithm = header.get("alg")
+    if algorithm == JWT_ALGORITHM:
+        return JWT_SECRET, algorithm
+    if algorithm in ASYMMETRIC_ALGORITHMS:
+        key = _jwks_keys.get(header.get("kid"))
+        if key is None:
+            raise jwt.InvalidTokenError("Unknown signing key")
+        return key, algorithm
+    raise jwt.InvalidTokenError("Unsupported algorithm")
+
+@timed("auth")
+def verify_token(token: str) -> UserClaims:
+    """Verify a JWT and return its claims, using the token cache when possible"""
+    cache_key = hashlib.sha256(token.encode()).digest()
+    user_claims = token_cache.get(cache_key)
+    if user_claims is not None:
+        return user_claims
+
+    key, algorithm = _verification_key(token)
+    payload = jwt.decode(
+        token,
+        key,
+        algorithms=[algorithm],
+        audience="authenticated"
+    )
+    user_claims = UserClaims(**payload)
+
+    ttl = user_claims.exp - time.time()
+    if ttl > 0:
+        token_cache.set(cache_key, user_claims, ttl)
+    return user_claims
+
 def auth(credentials: HTTPAuthorizationCredentials = Depends(security)) -> UserClaims:
     """Authentication dependency to get the current authenticated user"""
     try:
-        payload = jwt.decode(
-            credentials.credentials,
-            JWT_SECRET,
-            algorithms=[JWT_ALGORITHM],
-            audience="authenticated"
-        )
-        user_claims = UserClaims(**payload)
-        return user_claims
+        return verify_token(credentials.credentials)
     except jwt.ExpiredSignatureError:
         raise HTTPException(status_code=401, detail="Token expired")
     except jwt.InvalidTokenError:
         raise HTTPException(status_code=401, detail="Invalid token")
     except Exception as e:
         raise HTTPException(status_code=401, detail=f"Invalid token claims: {str(e)}")
+
+def require_admin(x_admin_secret: str = Header("")) -> None:
+    """Dependency for operator endpoints: the X-Admin-Secret header must match ADMIN_SECRET"""
+    if not ADMIN_SECRET or not hmac.compare_digest(x_admin_secret.encode(), ADMIN_SECRET.encode()):
+        raise HTTPException(status_code=403, detail="Admin access required")
@@ -0,0 +1,65 @@
+from typing import Any, AsyncIterator
+import csv
+import io
+import os
+import zlib
+
+from pydantic_core import to_json
+
+# Rows fetched from the database per export page
+EXPORT_PAGE_SIZE = int(os.environ.get("EXPORT_PAGE_SIZE", "1000"))
+
+EXPORT_MEDIA_TYPES = {
+    "csv": "text/csv; charset=utf-8",
+    "ndjson": "application/x-ndjson",
+}
+
+
+def _csv_cell(value: Any) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, (dict, list)):
+        return to_json(value).decode()
+    return str(value)
+
+
+def csv_header(field_names: list[str]) -> bytes:
+    buffer = io.StringIO()
+    csv.writer(buffer).writerow(["id", "created_at", *field_names])
+    return buffer.getvalue().encode()
+
+
+def csv_rows(rows: list[dict], field_names: list[str]) -> bytes:
+    """Encode a page of rows as CSV, one column per template field in template order"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        values = row.get("values") or {}
+        writer.writerow([row["id"], row["created_at"], *(_csv_cell(values.get(name)) for name in field_names)])
+    return buffer.getvalue().encode()
+
+
+def ndjson_rows(rows: list[dict], field_names: list[str]) -> bytes:
+    """Encode a page of rows as NDJSON with `values` keys in template order"""
+    lines = []
+    for row in rows:
+        values = row.get("values") or {}
+        lines.append(to_json({
+            "id": row["id"],
+            "created_at": row["created_at"],
+            "values": {name: values[name] for name in field_names if name in values},
+        }))
+        lines.append(b"\n")
+    return b"".join(lines)
+
+
+async def gzip_stream(chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    """Compress a byte stream on the fly"""
+    compressor = zlib.compressobj(wbits=31)  # gzip container
+    async for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
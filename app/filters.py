@@ -0,0 +1,101 @@
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Any, Literal, Optional, get_args
+import math
+
+from .validation import check_iso_date
+
+FilterOperator = Literal["eq", "lt", "gt", "in"]
+FILTER_OPERATORS = get_args(FilterOperator)
+
+# Fields whose values can be compared with lt/gt
+ORDERED_FIELD_TYPES = ("int", "float", "string", "date")
+
+
+@dataclass(frozen=True)
+class FieldFilter:
+    """Predicate on one field of `values`, with the value converted to the field's type"""
+    field: str
+    type: str
+    op: FilterOperator
+    value: Any  # A tuple of values for `in`
+
+
+@dataclass(frozen=True)
+class DataFilter:
+    """Rows to keep: created in [created_after, created_before) and matching every field filter"""
+    created_after: Optional[str] = None
+    created_before: Optional[str] = None
+    fields: tuple[FieldFilter, ...] = ()
+
+
+def utc_isoformat(moment: datetime) -> str:
+    """ISO timestamp in UTC; naive datetimes are taken as UTC"""
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return moment.astimezone(timezone.utc).isoformat()
+
+
+def _number(text: str) -> int | float:
+    try:
+        return int(text)
+    except ValueError:
+        pass
+    number = float(text)
+    if not math.isfinite(number):
+        raise ValueError(text)
+    return number
+
+
+def parse_value(field_type: str, text: str) -> Any:
+    """Convert a filter value given as text to the type of the field, raising ValueError"""
+    if field_type in ("int", "float"):
+        return _number(text)
+    if field_type == "boolean":
+        if text not in ("true", "false"):
+            raise ValueError(text)
+        return text == "true"
+    if field_type == "date":
+        # Dates are stored as the ISO strings they were given in
+        check_iso_date(text)
+    return text
+
+
+def parse_field_filter(spec: str, field_types: dict[str, str]) -> FieldFilter:
+    """Parse a `field:op:value` filter (`field:in:a,b,c` for a list), raising ValueError"""
+    parts = spec.split(":", 2)
+    if len(parts) != 3:
+        raise ValueError(f"Filtro inválido: '{spec}' (se espera campo:operador:valor)")
+    name, op, text = parts
+    if name not in field_types:
+        raise ValueError(f"El campo '{name}' no existe en el template")
+    if op not in FILTER_OPERATORS:
+        raise ValueError(f"Operador de filtro inválido: '{op}' (eq, lt, gt o in)")
+    field_type = field_types[name]
+    if op in ("lt", "gt") and field_type not in ORDERED_FIELD_TYPES:
+        raise ValueError(f"El campo '{name}' no admite el operador '{op}'")
+    try:
+        if op == "in":
+            value = tuple(parse_value(field_type, item) for item in text.split(","))
+        else:
+            value = parse_value(field_type, text)
+    except ValueError:
+        raise ValueError(f"El valor del filtro para el campo '{name}' no es del tipo esperado: {field_type}")
+    return FieldFilter(name, field_type, op, value)
+
+
+def parse_data_filter(
+    fields: list[dict],
+    created_after: Optional[datetime] = None,
+    created_before: Optional[datetime] = None,
+    specs: Optional[list[str]] = None,
+) -> Optional[DataFilter]:
+    """Build the filter of a request against the template's fields (None when nothing is filtered)"""
+    if created_after is None and created_before is None and not specs:
+        return None
+    field_types = {field["name"]: field["type"] for field in fields}
+    return DataFilter(
+        created_after=utc_isoformat(created_after) if created_after is not None else None,
+        created_before=utc_isoformat(created_before) if created_before is not None else None,
+        fields=tuple(parse_field_filter(spec, field_types) for spec in specs or ()),
+    )
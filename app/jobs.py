@@ -0,0 +1,120 @@
+from typing import Optional
+import asyncio
+import logging
+import os
+
+from .storage import Repository
+
+logger = logging.getLogger(__name__)
+
+# Rows of a force-deleted template removed per database call
+DELETION_CHUNK_SIZE = int(os.environ.get("DELETION_CHUNK_SIZE", "5000"))
+# Seconds a worker holds a job; a job whose worker died is resumed by another one after this
+DELETION_JOB_LEASE = int(os.environ.get("DELETION_JOB_LEASE", "60"))
+# Seconds between checks for jobs queued by other workers or left by dead ones
+DELETION_JOB_POLL_INTERVAL = float(os.environ.get("DELETION_JOB_POLL_INTERVAL", "30"))
+
+# Seconds to wait before retrying a chunk that failed
+RETRY_DELAYS = (0.5, 1, 2, 5, 10)
+
+
+def job_progress(job: dict) -> float:
+    """Fraction of the job's rows deleted so far (total_rows is an estimate)"""
+    if job["status"] == "done":
+        return 1.0
+    if not job["total_rows"]:
+        return 0.0
+    return min(job["deleted_rows"] / job["total_rows"], 0.99)
+
+
+class DeletionJobRunner:
+    """Runs the template deletion jobs kept in the storage, one chunk per call.
+
+    Jobs are claimed with a lease, renewed by every chunk, so each one is run by
+    a single worker at a time and is picked up again after a crash. All the
+    progress (the resume point included) is written with each chunk.
+    """
+
+    def __init__(self, chunk_size: int, lease: int, poll_interval: float):
+        self.chunk_size = chunk_size
+        self.lease = lease
+        self.poll_interval = poll_interval
+        self.current_job: Optional[str] = None
+        self._repository: Optional[Repository] = None
+        self._task: Optional[asyncio.Task] = None
+        self._wakeup = asyncio.Event()
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None
+
+    def start(self, repository: Repository) -> None:
+        self._repository = repository
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop between chunks; an unfinished job is resumed once its lease expires"""
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    def wake(self) -> None:
+        """Look for jobs right away (a job was just queued)"""
+        self._wakeup.set()
+
+    async def run_job(self, job: dict) -> None:
+        self.current_job = job["id"]
+        failures = 0
+        try:
+            while job["status"] != "done":
+                try:
+                    job = await self._repository.delete_data_chunk(job["id"], self.chunk_size, self.lease)
+                    failures = 0
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    logger.warning("Deletion job %s: chunk failed: %s", job["id"], e)
+                    await self._record_error(job["id"], str(e))
+                    await asyncio.sleep(RETRY_DELAYS[min(failures, len(RETRY_DELAYS) - 1)])
+                    failures += 1
+            logger.info("Deletion job %s done: %d rows of template %s", job["id"], job["deleted_rows"], job["template_id"])
+        finally:
+            self.current_job = None
+
+    async def _record_error(self, job_id: str, error: str) -> None:
+        # Best effort: shown by the progress endpoint, cleared by the next successful chunk
+        try:
+            await self._repository.record_job_error(job_id, error)
+        except Exception:
+            pass
+
+    async def _run(self) -> None:
+        failures = 0
+        while True:
+            self._wakeup.clear()
+            try:
+                job = await self._repository.claim_deletion_job(self.lease)
+                while job is not None:
+                    await self.run_job(job)
+                    job = await self._repository.claim_deletion_job(self.lease)
+                failures = 0
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # Storage unreachable: try again later
+                logger.warning("Could not claim a deletion job: %s", e)
+                await asyncio.sleep(RETRY_DELAYS[min(failures, len(RETRY_DELAYS) - 1)])
+                failures += 1
+                continue
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+
+
+deletion_jobs = DeletionJobRunner(DELETION_CHUNK_SIZE, DELETION_JOB_LEASE, DELETION_JOB_POLL_INTERVAL)
@@ -0,0 +1,183 @@
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+import asyncio
+import logging
+import math
+import os
+import time
+
+from fastapi import Depends, HTTPException, Request
+from supabase import AsyncClient
+
+from .dependencies import UserClaims, auth, get_supabase_client
+from .metrics import admission_rejected_total, admission_waiting, rate_limited_requests_total
+
+logger = logging.getLogger(__name__)
+
+# Per-user token buckets, as "<requests per second>/<burst>"
+RATE_LIMIT_ENABLED = os.environ.get("RATE_LIMIT_ENABLED", "true").lower() == "true"
+RATE_LIMIT_DEFAULT = os.environ.get("RATE_LIMIT_DEFAULT", "20/40")
+# Extra limits per route (endpoint function name), e.g. "create_template_data=5/10,export_template_data=0.1/1"
+RATE_LIMIT_ROUTES = os.environ.get("RATE_LIMIT_ROUTES", "")
+# "memory" (per worker process) or "supabase" (shared by every worker, one extra call per request)
+RATE_LIMIT_BACKEND = os.environ.get("RATE_LIMIT_BACKEND", "memory")
+RATE_LIMIT_MAX_KEYS = int(os.environ.get("RATE_LIMIT_MAX_KEYS", "100000"))
+
+# Admission control: requests talking to Supabase at the same time, and how
+# many more may wait (and for how long) before getting a 503
+BACKEND_MAX_CONCURRENCY = int(os.environ.get("BACKEND_MAX_CONCURRENCY", "64"))
+BACKEND_MAX_QUEUE = int(os.environ.get("BACKEND_MAX_QUEUE", "256"))
+BACKEND_QUEUE_TIMEOUT = float(os.environ.get("BACKEND_QUEUE_TIMEOUT", "2"))
+
+# Routes that are expensive for Supabase: heavy writes and full scans
+DEFAULT_ROUTE_LIMITS = {
+    "create_template_data": "10/20",
+    "bulk_create_template_data": "0.2/2",
+    "aggregate_template_data": "2/10",
+    "sum_cantidad_by_template": "2/10",
+    "export_template_data": "0.2/2",
+}
+
+
+def parse_limit(spec: str) -> tuple[float, float]:
+    """Parse "<rate>/<burst>" into (tokens per second, bucket size)"""
+    rate, _, burst = spec.partition("/")
+    rate, burst = float(rate), float(burst or rate)
+    if rate <= 0 or burst < 1:
+        raise ValueError(f"Invalid rate limit: {spec!r}")
+    return rate, burst
+
+
+def parse_route_limits(spec: str) -> dict[str, tuple[float, float]]:
+    """Parse "route=<rate>/<burst>,..." into limits by route name"""
+    limits = {}
+    for item in spec.split(","):
+        if item.strip():
+            route, _, limit = item.partition("=")
+            limits[route.strip()] = parse_limit(limit.strip())
+    return limits
+
+
+default_limit = parse_limit(RATE_LIMIT_DEFAULT)
+route_limits = {route: parse_limit(limit) for route, limit in DEFAULT_ROUTE_LIMITS.items()}
+route_limits.update(parse_route_limits(RATE_LIMIT_ROUTES))
+
+
+class TokenBuckets:
+    """In-process token buckets, the least recently used dropped past `maxsize`"""
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._buckets: OrderedDict[str, tuple[float, float]] = OrderedDict()
+
+    async def take(self, key: str, rate: float, burst: float) -> float:
+        """Take a token; returns 0 when allowed, else the seconds until one is available"""
+        now = time.monotonic()
+        tokens, updated_at = self._buckets.get(key, (burst, now))
+        tokens = min(burst, tokens + (now - updated_at) * rate)
+        wait = 0.0
+        if tokens >= 1:
+            tokens -= 1
+        else:
+            wait = (1 - tokens) / rate
+        self._buckets[key] = (tokens, now)
+        self._buckets.move_to_end(key)
+        while len(self._buckets) > self.maxsize:
+            self._buckets.popitem(last=False)
+        return wait
+
+
+async def take_shared_token(supabase: AsyncClient, key: str, rate: float, burst: float) -> float:
+    """Same as TokenBuckets.take, on buckets stored in Postgres and shared by all workers"""
+    result = await supabase.rpc("take_rate_limit_token", {"p_key": key, "p_rate": rate, "p_burst": burst}).execute()
+    return float(result.data)
+
+
+buckets = TokenBuckets(RATE_LIMIT_MAX_KEYS)
+
+
+def overloaded() -> HTTPException:
+    return HTTPException(
+        status_code=503,
+        detail="Service overloaded, try again later",
+        headers={"Retry-After": str(math.ceil(BACKEND_QUEUE_TIMEOUT))},
+    )
+
+
+class AdmissionController:
+    """Caps the requests using the backend at once, with a bounded wait queue"""
+
+    def __init__(self, max_concurrency: int, max_queue: int, timeout: float):
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self.waiting = 0
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[None]:
+        if self._semaphore.locked() and self.waiting >= self.max_queue:
+            admission_rejected_total.inc("queue_full")
+            raise overloaded()
+        self.waiting += 1
+        admission_waiting.inc()
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), self.timeout)
+        except asyncio.TimeoutError:
+            admission_rejected_total.inc("timeout")
+            raise overloaded()
+        finally:
+            self.waiting -= 1
+            admission_waiting.dec()
+        try:
+            yield
+        finally:
+            self._semaphore.release()
+
+
+admission = AdmissionController(BACKEND_MAX_CONCURRENCY, BACKEND_MAX_QUEUE, BACKEND_QUEUE_TIMEOUT)
+
+
+async def _take(key: str, rate: float, burst: float) -> float:
+    if RATE_LIMIT_BACKEND == "supabase":
+        try:
+            return await take_shared_token(await get_supabase_client(), key, rate, burst)
+        except Exception as e:
+            # Fail open: an unavailable limiter must not take the API down
+            logger.warning("Shared rate limiter unavailable: %s", e)
+            return 0.0
+    return await buckets.take(key, rate, burst)
+
+
+async def check_rate_limits(route: str, user_id: str) -> None:
+    """Raise a 429 with Retry-After when the user is over the default or the route's limit"""
+    limits = [("default", default_limit)]
+    if route in route_limits:
+        limits.append((route, route_limits[route]))
+    for name, (rate, burst) in limits:
+        wait = await _take(f"{name}:{user_id}", rate, burst)
+        if wait > 0:
+            rate_limited_requests_total.inc(route, name)
+            raise HTTPException(
+                status_code=429,
+                detail="Too many requests",
+                headers={"Retry-After": str(math.ceil(wait))},
+            )
+
+
+async def admit() -> AsyncIterator[None]:
+    """Dependency holding a backend slot for the whole request, or answering 503"""
+    async with admission.slot():
+        yield
+
+
+async def limit_request(
+    request: Request,
+    user_claims: UserClaims = Depends(auth),
+) -> AsyncIterator[None]:
+    """Dependency for authenticated routes: per-user rate limits, then admission control"""
+    if RATE_LIMIT_ENABLED:
+        route = request.scope["route"].name
+        await check_rate_limits(route, user_claims.sub)
+    async with admission.slot():
+        yield
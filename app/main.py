@@ -1,20 +1,86 @@
+import time
+
+# Startup time is measured from the first import of the app, so it includes
+# loading the dependencies as well as the lifespan warmup
+_startup_started = time.perf_counter()
+
 from dotenv import load_dotenv
 
 # Load environment variables from .env file
 load_dotenv()
 
+import asyncio
+import logging
+import os
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI, status, Depends
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse
+from pydantic import BaseModel
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
+
+from .routers import authentication, templates, template_data, write_behind as write_behind_router
+from .cache import template_cache
+from .dependencies import auth, close_supabase_client, require_admin, open_supabase_client, refresh_jwks_periodically, token_cache
+from .jobs import deletion_jobs
+from .limits import admit, limit_request
+from .metrics import MetricsMiddleware, register_cache, register_write_behind, registry, startup_duration_seconds
+from .profiling import PROFILING_ENABLED, ProfilingMiddleware
+from .responses import FastJSONResponse
+from .storage import STORAGE_BACKEND, close_repository, open_repository
+from .writebehind import WRITE_BEHIND_ENABLED, write_behind
+
+logger = logging.getLogger(__name__)
+
+# Startups (imports, client creation and warmup) slower than this many seconds are logged as a warning
+STARTUP_BUDGET = float(os.environ.get("STARTUP_BUDGET", "2"))
+
+# Responses of at least GZIP_MINIMUM_SIZE bytes are gzipped for clients that accept it
+GZIP_MINIMUM_SIZE = int(os.environ.get("GZIP_MINIMUM_SIZE", "1000"))
+GZIP_COMPRESSION_LEVEL = int(os.environ.get("GZIP_COMPRESSION_LEVEL", "5"))
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Open the storage (for Supabase, the pooled client, loading the JWT signing
+    # keys too) before serving, so none of it happens on the first requests
+    repository = await open_repository()
+    # With SQLite storage, Supabase is only used for authentication, if configured
+    uses_supabase = STORAGE_BACKEND == "supabase" or "SUPABASE_URL" in os.environ
+    if STORAGE_BACKEND != "supabase" and uses_supabase:
+        await open_supabase_client()
+    jwks_refresh = asyncio.create_task(refresh_jwks_periodically()) if uses_supabase else None
+    # Replays entries left unflushed by a previous run before accepting new ones
+    if WRITE_BEHIND_ENABLED:
+        await write_behind.start(repository)
+    # Resumes the data deletions of force-deleted templates left unfinished
+    deletion_jobs.start(repository)
+
+    startup_time = time.perf_counter() - _startup_started
+    startup_duration_seconds.set(value=startup_time)
+    if startup_time > STARTUP_BUDGET:
+        logger.warning("Startup took %.0f ms, over the %.0f ms budget", startup_time * 1000, STARTUP_BUDGET * 1000)
+    else:
+        logger.info("Startup took %.0f ms", startup_time * 1000)
 
-from .routers import authentication, templates, template_data
-from .dependencies import auth
+    yield
+
+    if jwks_refresh is not None:
+        jwks_refresh.cancel()
+    await deletion_jobs.stop()
+    await write_behind.stop()
+    # Close the database and pooled Supabase connections on shutdown
+    await close_repository()
+    await close_supabase_client()
 
 # Create the FastAPI app instance
 app = FastAPI(
     title="Conta Conmigo Core API",
     description="API for the Conta Conmigo platform",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan,
+    # Responses are encoded by pydantic-core instead of jsonable_encoder + json
+    default_response_class=FastJSONResponse
 )
 
 # Configure CORS
@@ -24,31 +90,63 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],  # Allows all methods
     allow_headers=["*"],  # Allows all headers
+    expose_headers=["ETag"],  # Lets browser clients send it back in If-None-Match
 )
 
-# Include authentication router (no auth required)
+# Compress large responses (already compressed exports are left alone)
+app.add_middleware(GZipMiddleware, minimum_size=GZIP_MINIMUM_SIZE, compresslevel=GZIP_COMPRESSION_LEVEL)
+
+# Request count and latency per route, exposed at /metrics
+app.add_middleware(MetricsMiddleware)
+register_cache("template", template_cache)
+register_cache("token", token_cache)
+register_write_behind(write_behind)
+
+# Opt-in Server-Timing breakdown and request profiling (PROFILING_ENABLED)
+if PROFILING_ENABLED:
+    app.add_middleware(ProfilingMiddleware)
+
+# Include authentication router (no auth required, only admission control)
 app.include_router(
     authentication.router,
     prefix="/auth",
-    tags=["Authentication"]
+    tags=["Authentication"],
+    dependencies=[Depends(admit)]
 )
 
-# Include protected routers with authentication dependency
+# Include protected routers with authentication, per-user rate limits and admission control
 app.include_router(
     templates.router,
     prefix="/templates",
     tags=["Templates"],
-    dependencies=[Depends(auth)]
+    dependencies=[Depends(auth), Depends(limit_request)]
 )
 
 app.include_router(
     template_data.router,
     prefix="/templates",
     tags=["Template Data"],
-    dependencies=[Depends(auth)]
+    dependencies=[Depends(auth), Depends(limit_request)]
 )
 
+app.include_router(
+    write_behind_router.router,
+    prefix="/write-behind",
+    tags=["Write-behind"],
+    # Operator controls of the whole process, not per user
+    dependencies=[Depends(require_admin)]
+)
+
+class HealthResponse(BaseModel):
+    status: str
+    message: str
+
 # Health check endpoint
-@app.get("/health", response_class=JSONResponse, tags=["Health"])
+@app.get("/health", response_class=JSONResponse, response_model=HealthResponse, tags=["Health"])
 async def health_check():
     return {"status": "ok", "message": "API is running"}
+
+# Prometheus metrics (per process: with several workers, each one is scraped separately)
+@app.get("/metrics", response_class=PlainTextResponse, tags=["Health"], include_in_schema=False)
+async def metrics():
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
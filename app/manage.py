@@ -0,0 +1,93 @@
+"""Maintenance commands.
+
+Usage:
+    python -m app.manage rebuild-summaries [--template-id TEMPLATE_ID]
+    python -m app.manage prune-rate-limits
+    python -m app.manage compact-values TEMPLATE_ID [--expand] [--chunk-size N]
+"""
+from dotenv import load_dotenv
+
+# Load environment variables from .env file
+load_dotenv()
+
+import argparse
+import asyncio
+
+from .dependencies import get_supabase_client, close_supabase_client
+from .cache import TEMPLATE_CACHE_TTL
+from .storage import open_repository, close_repository
+
+
+async def rebuild_summaries(template_id: str | None) -> None:
+    """Recompute template running totals from the raw template data"""
+    supabase = await get_supabase_client()
+    try:
+        result = await supabase.rpc("rebuild_template_summaries", {"p_template_id": template_id}).execute()
+        print(f"Resúmenes reconstruidos: {result.data}")
+    finally:
+        await close_supabase_client()
+
+
+async def prune_rate_limits() -> None:
+    """Delete idle shared rate limit buckets (RATE_LIMIT_BACKEND=supabase)"""
+    supabase = await get_supabase_client()
+    try:
+        result = await supabase.rpc("prune_rate_limit_buckets", {}).execute()
+        print(f"Buckets eliminados: {result.data}")
+    finally:
+        await close_supabase_client()
+
+
+async def compact_values(template_id: str, compact: bool, chunk_size: int) -> None:
+    """Switch a template to positional storage of its data (or back) and rewrite its rows.
+
+    Instances with the template cached from before the switch keep writing rows
+    in the old format, and may miss rows in the new one in filtered or projected
+    reads, until TEMPLATE_CACHE_TTL expires: the rows are rewritten a second time
+    after that."""
+    repository = await open_repository()
+    try:
+        async def convert_all() -> int:
+            converted, after_id = 0, None
+            while True:
+                result = await repository.convert_template_values(template_id, compact, after_id, chunk_size)
+                converted += result["converted"]
+                after_id = result["last_id"]
+                if after_id is None:
+                    return converted
+                print(f"Convertidos {converted} registros...")
+
+        converted = await convert_all()
+        await asyncio.sleep(TEMPLATE_CACHE_TTL)
+        converted += await convert_all()
+        print(f"Registros convertidos: {converted}")
+    finally:
+        await close_repository()
+        await close_supabase_client()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(prog="python -m app.manage")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    rebuild = commands.add_parser("rebuild-summaries", help="Recompute template running totals from raw data")
+    rebuild.add_argument("--template-id", help="Only rebuild this template (default: all templates)")
+
+    commands.add_parser("prune-rate-limits", help="Delete shared rate limit buckets idle for a day")
+
+    compact = commands.add_parser("compact-values", help="Store a template's data positionally (see app/compact.py)")
+    compact.add_argument("template_id")
+    compact.add_argument("--expand", action="store_true", help="Convert back to one object per row")
+    compact.add_argument("--chunk-size", type=int, default=5000, help="Rows rewritten per transaction")
+
+    args = parser.parse_args()
+    if args.command == "rebuild-summaries":
+        asyncio.run(rebuild_summaries(args.template_id))
+    elif args.command == "prune-rate-limits":
+        asyncio.run(prune_rate_limits())
+    elif args.command == "compact-values":
+        asyncio.run(compact_values(args.template_id, not args.expand, args.chunk_size))
+
+
+if __name__ == "__main__":
+    main()
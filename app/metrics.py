@@ -0,0 +1,333 @@
+"""Prometheus style metrics for HTTP requests and Supabase (backend) calls.
+
+Metrics live in process memory and are exposed in the Prometheus text format
+at /metrics. Recording is a couple of dict lookups and additions, cheap enough
+to keep enabled in production.
+"""
+from bisect import bisect_left
+from typing import Callable
+import re
+import time
+
+import httpx
+
+from . import profiling
+
+# Default latency buckets, in seconds
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.075, 0.1, 0.25, 0.5, 0.75, 1.0, 2.5, 5.0, 7.5, 10.0)
+
+# Auth path segments kept in operation labels (e.g. "admin", "users", "jwks.json");
+# any other segment, such as a user or factor id, becomes "{id}" to keep labels bounded
+_AUTH_PATH_NAME = re.compile(r"[a-z_.-]+")
+
+
+def _format_labels(names: tuple[str, ...], values: tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class _Metric:
+    type = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+
+    def header(self) -> list[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type}"]
+
+
+class Counter(_Metric):
+    type = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple[str, ...] = ()):
+        super().__init__(name, documentation, labelnames)
+        self.values: dict[tuple[str, ...], float] = {}
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        self.values[labels] = self.values.get(labels, 0) + amount
+
+    def set_total(self, *labels: str, value: float) -> None:
+        """Copy a monotonic total kept elsewhere (from a collector, right before a scrape)"""
+        self.values[labels] = value
+
+    def render(self) -> list[str]:
+        return self.header() + [
+            f"{self.name}{_format_labels(self.labelnames, labels)} {value}"
+            for labels, value in self.values.items()
+        ]
+
+
+class Gauge(Counter):
+    type = "gauge"
+
+    def dec(self, *labels: str, amount: float = 1) -> None:
+        self.values[labels] = self.values.get(labels, 0) - amount
+
+    def set(self, *labels: str, value: float) -> None:
+        self.values[labels] = value
+
+
+class Histogram(_Metric):
+    type = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = LATENCY_BUCKETS,
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = buckets
+        # labels -> [bucket counts..., +Inf count, sum]
+        self.values: dict[tuple[str, ...], list[float]] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        series = self.values.get(labels)
+        if series is None:
+            series = self.values[labels] = [0] * (len(self.buckets) + 2)
+        series[bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    def render(self) -> list[str]:
+        lines = self.header()
+        for labels, series in self.values.items():
+            cumulative = 0
+            for bound, count in zip((*self.buckets, "+Inf"), series[:-1]):
+                cumulative += count
+                bucket_labels = _format_labels(self.labelnames, labels, 'le="%s"' % bound)
+                lines.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, labels)} {series[-1]}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, labels)} {cumulative}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self.metrics: list[_Metric] = []
+        self.collectors: list[Callable[[], None]] = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def add_collector(self, collector: Callable[[], None]) -> None:
+        """Register a callback that refreshes gauges (and externally kept totals) right before each scrape"""
+        self.collectors.append(collector)
+
+    def render(self) -> str:
+        for collector in self.collectors:
+            collector()
+        lines: list[str] = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+# HTTP requests served by the API, by route template
+http_requests_total = registry.register(Counter(
+    "http_requests_total", "HTTP requests served", ("method", "route", "status")
+))
+http_request_duration_seconds = registry.register(Histogram(
+    "http_request_duration_seconds", "HTTP request latency", ("method", "route")
+))
+http_requests_in_flight = registry.register(Gauge(
+    "http_requests_in_flight", "HTTP requests currently being served"
+))
+
+startup_duration_seconds = registry.register(Gauge(
+    "startup_duration_seconds", "Time from importing the app to ready to serve (imports, client creation and warmup)"
+))
+
+# Calls made to Supabase, by table (or RPC / auth endpoint) and operation
+backend_requests_total = registry.register(Counter(
+    "backend_requests_total", "Requests sent to Supabase", ("table", "operation", "status")
+))
+backend_errors_total = registry.register(Counter(
+    "backend_errors_total", "Supabase requests that failed or returned an error status", ("table", "operation")
+))
+backend_request_duration_seconds = registry.register(Histogram(
+    "backend_request_duration_seconds", "Supabase request latency until response headers", ("table", "operation")
+))
+backend_request_bytes_total = registry.register(Counter(
+    "backend_request_bytes_total", "Bytes sent to Supabase in request bodies", ("table", "operation")
+))
+backend_response_bytes_total = registry.register(Counter(
+    "backend_response_bytes_total", "Bytes received from Supabase in response bodies", ("table", "operation")
+))
+
+# Requests turned away by the per-user rate limits and by admission control
+rate_limited_requests_total = registry.register(Counter(
+    "rate_limited_requests_total", "Requests rejected with 429 by a rate limit", ("route", "limit")
+))
+admission_rejected_total = registry.register(Counter(
+    "admission_rejected_total", "Requests rejected with 503 because the backend was saturated", ("reason",)
+))
+admission_waiting = registry.register(Gauge(
+    "admission_waiting", "Requests waiting for a backend slot"
+))
+
+# Identical concurrent reads sharing one Supabase call (role: leader made the call, follower reused it)
+singleflight_calls_total = registry.register(Counter(
+    "singleflight_calls_total", "Coalescable reads by whether they made the backend call", ("call", "role")
+))
+
+# Cache statistics (refreshed on scrape)
+cache_hits_total = registry.register(Counter("cache_hits_total", "Cache hits", ("cache",)))
+cache_misses_total = registry.register(Counter("cache_misses_total", "Cache misses", ("cache",)))
+cache_entries = registry.register(Gauge("cache_entries", "Entries currently cached", ("cache",)))
+
+
+# Write-behind queue of data entries (refreshed on scrape)
+write_behind_pending = registry.register(Gauge(
+    "write_behind_pending", "Data entries accepted but not yet inserted"
+))
+write_behind_rows_total = registry.register(Counter(
+    "write_behind_rows_total", "Data entries handled by the write-behind queue", ("outcome",)
+))
+write_behind_batches_total = registry.register(Counter(
+    "write_behind_batches_total", "Batched inserts sent by the write-behind queue"
+))
+
+
+def register_write_behind(queue) -> None:
+    """Expose the counters of a WriteBehindQueue"""
+    def collect() -> None:
+        status = queue.status()
+        write_behind_pending.set(value=status["pending"])
+        for outcome in ("accepted", "flushed", "rejected"):
+            write_behind_rows_total.set_total(outcome, value=status[outcome])
+        write_behind_batches_total.set_total(value=status["batches"])
+    registry.add_collector(collect)
+
+
+def register_cache(name: str, cache) -> None:
+    """Expose the hit/miss counters of a TTLCache"""
+    def collect() -> None:
+        stats = cache.stats()
+        cache_hits_total.set_total(name, value=stats["hits"])
+        cache_misses_total.set_total(name, value=stats["misses"])
+        cache_entries.set(name, value=stats["size"])
+    registry.add_collector(collect)
+
+
+def route_template(scope) -> str:
+    """Path template of the matched route, e.g. /templates/{template_id}/data
+
+    Requests are labelled by template rather than by path to keep the number of
+    series bounded. The route of an included router may only know its own path,
+    so the router prefix is taken from the leading segments of the request path.
+    """
+    route_path = getattr(scope.get("route"), "path", None)
+    if not route_path:
+        return "unmatched"
+    segments = scope["path"].rstrip("/").split("/")
+    prefix_length = len(segments) - len(route_path.rstrip("/").split("/"))
+    if prefix_length <= 0:
+        return route_path
+    return "/".join(segments[:prefix_length + 1]) + route_path
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording request count, latency and in-flight requests per route"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        http_requests_in_flight.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            http_requests_in_flight.dec()
+            route_path = route_template(scope)
+            method = scope["method"]
+            http_requests_total.inc(method, route_path, str(status_code))
+            http_request_duration_seconds.observe(elapsed, method, route_path)
+
+
+def backend_call_labels(request: httpx.Request) -> tuple[str, str]:
+    """(table, operation) of a Supabase request, e.g. ("template_data", "select")"""
+    parts = request.url.path.strip("/").split("/")
+    if len(parts) >= 3 and parts[0] == "rest":
+        if parts[2] == "rpc" and len(parts) >= 4:
+            return parts[3], "rpc"
+        operation = {"GET": "select", "HEAD": "select", "POST": "insert", "PATCH": "update", "DELETE": "delete"}
+        return parts[2], operation.get(request.method, request.method.lower())
+    if len(parts) >= 3 and parts[0] == "auth":
+        return "auth", "/".join(part if _AUTH_PATH_NAME.fullmatch(part) else "{id}" for part in parts[2:])
+    return parts[0] if parts else "", request.method.lower()
+
+
+class _CountingStream(httpx.AsyncByteStream):
+    def __init__(self, stream, labels: tuple[str, str]):
+        self.stream = stream
+        self.labels = labels
+        self.size = 0
+
+    async def __aiter__(self):
+        async for chunk in self.stream:
+            self.size += len(chunk)
+            yield chunk
+
+    async def aclose(self) -> None:
+        backend_response_bytes_total.inc(*self.labels, amount=self.size)
+        await self.stream.aclose()
+
+
+class InstrumentedTransport(httpx.AsyncBaseTransport):
+    """httpx transport wrapper recording latency, errors and payload size of Supabase calls"""
+
+    def __init__(self, transport: httpx.AsyncBaseTransport):
+        self.transport = transport
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        labels = backend_call_labels(request)
+        content_length = request.headers.get("content-length")
+        if content_length:
+            backend_request_bytes_total.inc(*labels, amount=int(content_length))
+
+        start = time.perf_counter()
+        try:
+            response = await self.transport.handle_async_request(request)
+        except Exception:
+            backend_errors_total.inc(*labels)
+            backend_requests_total.inc(*labels, "error")
+            raise
+        finally:
+            elapsed = time.perf_counter() - start
+            backend_request_duration_seconds.observe(elapsed, *labels)
+            profiling.record("backend", elapsed)
+
+        backend_requests_total.inc(*labels, str(response.status_code))
+        if response.status_code >= 400:
+            backend_errors_total.inc(*labels)
+        response.stream = _CountingStream(response.stream, labels)
+        return response
+
+    async def aclose(self) -> None:
+        await self.transport.aclose()
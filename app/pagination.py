@@ -0,0 +1,78 @@
+from typing import Optional
+import base64
+import json
+import os
+import re
+
+# Page sizes for template data listings
+DEFAULT_PAGE_SIZE = int(os.environ.get("DEFAULT_PAGE_SIZE", "100"))
+MAX_PAGE_SIZE = int(os.environ.get("MAX_PAGE_SIZE", "1000"))
+
+# Columns returned besides `values` when a projection is requested
+BASE_COLUMNS = "id,template_id,user_id,created_at"
+
+_SIMPLE_KEY = re.compile(r"^[A-Za-z0-9_]+$")
+
+
+def encode_cursor(row: dict) -> str:
+    """Opaque cursor pointing right after the given row in (created_at, id) order"""
+    raw = json.dumps([row["created_at"], row["id"]], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[str, str]:
+    """Decode a cursor created by `encode_cursor`, raising ValueError if it is malformed"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        created_at, row_id = json.loads(raw)
+    except Exception:
+        raise ValueError("Cursor inválido")
+    if not isinstance(created_at, str) or not isinstance(row_id, str):
+        raise ValueError("Cursor inválido")
+    return created_at, row_id
+
+
+def keyset_filter(cursor: str) -> str:
+    """PostgREST `or` filter selecting the rows after the cursor in descending order"""
+    created_at, row_id = decode_cursor(cursor)
+    created_at, row_id = json.dumps(created_at), json.dumps(row_id)
+    return f"created_at.lt.{created_at},and(created_at.eq.{created_at},id.lt.{row_id})"
+
+
+def json_key(name: str) -> str:
+    """Quote a key of the `values` JSON column for use in a PostgREST path"""
+    return name if _SIMPLE_KEY.match(name) else json.dumps(name)
+
+
+def value_path(name: str, layout: Optional[list[str]] = None) -> str:
+    """Path of a field in `values`: its key, or its array index with a compact layout"""
+    if layout is not None:
+        return str(layout.index(name) + 1)
+    return json_key(name)
+
+
+def projection_select(fields: list[str], layout: Optional[list[str]] = None) -> str:
+    """Select only the requested keys of `values`, aliased by position. With a
+    compact layout rows may be arrays or objects, so both paths are selected.
+
+    Values are selected as JSON text: a missing key comes back as null and a
+    stored JSON null as the text "null", so both keep their meaning."""
+    columns = [f"f{i}:values->{json_key(name)}::text" for i, name in enumerate(fields)]
+    if layout is not None:
+        columns += [f"p{i}:values->{value_path(name, layout)}::text" for i, name in enumerate(fields)]
+    return ",".join([BASE_COLUMNS] + columns)
+
+
+def unproject(row: dict, fields: list[str]) -> dict:
+    """Rebuild the `values` object of a row selected with `projection_select`"""
+    values = {}
+    for i, name in enumerate(fields):
+        text: Optional[str] = row.pop(f"f{i}", None)
+        positional: Optional[str] = row.pop(f"p{i}", None)
+        if text is not None:
+            values[name] = json.loads(text)
+        elif positional is not None and positional != "null":
+            # Compact rows hold null for missing values
+            values[name] = json.loads(positional)
+    row["values"] = values
+    return row
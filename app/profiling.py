@@ -0,0 +1,164 @@
+"""Opt-in per-request profiling and Server-Timing breakdown.
+
+Enabled with PROFILING_ENABLED. Every request then gets a `Server-Timing`
+header splitting its time into auth, validation, backend (Supabase) and
+serialization. Requests sent with `X-Profile: <PROFILING_SECRET>`, plus a
+random PROFILING_SAMPLE_RATE fraction of all requests, are also profiled by a
+sampling profiler and written to PROFILING_DIR as folded stacks, the input
+format of flamegraph.pl, speedscope and inferno.
+
+When disabled the middleware is not installed, and the phase hooks cost a
+single context variable lookup.
+"""
+from contextvars import ContextVar
+from functools import wraps
+from typing import Optional
+import asyncio
+import hmac
+import os
+import random
+import re
+import sys
+import threading
+import time
+
+PROFILING_ENABLED = os.environ.get("PROFILING_ENABLED", "false").lower() in ("1", "true", "yes")
+PROFILING_SECRET = os.environ.get("PROFILING_SECRET", "")
+PROFILING_SAMPLE_RATE = float(os.environ.get("PROFILING_SAMPLE_RATE", "0"))
+PROFILING_DIR = os.environ.get("PROFILING_DIR", "profiles")
+# Interval between stack samples, in seconds
+PROFILING_INTERVAL = float(os.environ.get("PROFILING_INTERVAL", "0.001"))
+
+PROFILE_HEADER = b"x-profile"
+
+# Time spent per phase by the current request (None when not measuring)
+_timings: ContextVar[Optional[dict[str, float]]] = ContextVar("timings", default=None)
+
+
+def record(phase: str, seconds: float) -> None:
+    """Add time spent in a phase to the current request's Server-Timing"""
+    timings = _timings.get()
+    if timings is not None:
+        timings[phase] = timings.get(phase, 0.0) + seconds
+
+
+def timed(phase: str):
+    """Decorator recording the time spent in a (sync) function under a phase"""
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            timings = _timings.get()
+            if timings is None:
+                return func(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                timings[phase] = timings.get(phase, 0.0) + time.perf_counter() - start
+        return wrapper
+    return decorator
+
+
+def server_timing(timings: dict[str, float], total: float) -> bytes:
+    metrics = [f"{phase};dur={seconds * 1000:.2f}" for phase, seconds in timings.items()]
+    metrics.append(f"total;dur={total * 1000:.2f}")
+    return ", ".join(metrics).encode()
+
+
+class SamplingProfiler:
+    """Samples the stacks of the application threads from a background thread.
+
+    Samples cover the event loop thread and the threadpool running sync
+    dependencies, so requests served concurrently show up in the same profile.
+    """
+
+    def __init__(self, interval: float = PROFILING_INTERVAL):
+        self.interval = interval
+        self.stacks: dict[str, int] = {}
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self) -> None:
+        own_id = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({code.co_filename}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                key = ";".join(reversed(stack))
+                self.stacks[key] = self.stacks.get(key, 0) + 1
+
+    def folded(self) -> str:
+        """Profile in the folded stacks format (one `frame;frame;... count` line per stack)"""
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.items())
+
+
+def _profile_path(method: str, path: str) -> str:
+    name = re.sub(r"[^A-Za-z0-9]+", "_", path).strip("_") or "root"
+    return os.path.join(PROFILING_DIR, f"{time.strftime('%Y%m%d-%H%M%S')}-{time.monotonic_ns()}-{method}-{name}.folded")
+
+
+def _write_profile(path: str, content: str) -> None:
+    os.makedirs(PROFILING_DIR, exist_ok=True)
+    with open(path, "w") as f:
+        f.write(content)
+
+
+class ProfilingMiddleware:
+    """ASGI middleware adding Server-Timing and profiling selected requests"""
+
+    def __init__(self, app):
+        self.app = app
+        # Only one profile at a time: samples are process wide
+        self._profiling = False
+
+    def _should_profile(self, scope) -> bool:
+        if self._profiling:
+            return False
+        if PROFILING_SECRET:
+            for name, value in scope["headers"]:
+                if name == PROFILE_HEADER:
+                    return hmac.compare_digest(value, PROFILING_SECRET.encode())
+        return PROFILING_SAMPLE_RATE > 0 and random.random() < PROFILING_SAMPLE_RATE
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        timings: dict[str, float] = {}
+        token = _timings.set(timings)
+        start = time.perf_counter()
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", server_timing(timings, time.perf_counter() - start)))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        profiler = None
+        if self._should_profile(scope):
+            self._profiling = True
+            profiler = SamplingProfiler()
+            profiler.start()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _timings.reset(token)
+            if profiler is not None:
+                profiler.stop()
+                self._profiling = False
+                path = _profile_path(scope["method"], scope["path"])
+                await asyncio.to_thread(_write_profile, path, profiler.folded())
@@ -0,0 +1,23 @@
+from typing import Any
+
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+from pydantic_core import to_json
+
+from .profiling import timed
+
+
+class FastJSONResponse(JSONResponse):
+    """JSON response encoded in one pass by pydantic-core.
+
+    Used as the app's default response class. It replaces the stdlib `json`
+    encoder, and is an order of magnitude faster on large lists of rows.
+    """
+
+    @timed("serialization")
+    def render(self, content: Any) -> bytes:
+        return to_json(content)
+
+
+class MessageResponse(BaseModel):
+    message: str
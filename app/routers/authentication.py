@@ -1,11 +1,16 @@
 from fastapi import APIRouter, HTTPException, Depends, status
+from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
 from pydantic import BaseModel, EmailStr
-from supabase import Client
+from supabase_auth import AsyncGoTrueClient
 
-from ..dependencies import get_supabase_client
+from ..dependencies import get_auth_client
+from ..responses import MessageResponse
 
 router = APIRouter()
 
+# Logout revokes the bearer token when one is sent
+optional_bearer = HTTPBearer(auto_error=False)
+
 class UserCredentials(BaseModel):
     email: str
     password: str
@@ -31,10 +36,10 @@ class ResetPasswordRequest(BaseModel):
     new_password: str
 
 @router.post("/signup", response_model=SignUpResponse)
-async def signup(credentials: UserCredentials, supabase: Client = Depends(get_supabase_client)):
+async def signup(credentials: UserCredentials, auth_client: AsyncGoTrueClient = Depends(get_auth_client)):
     """Create a new user account"""
     try:
-        user_response = supabase.auth.sign_up({
+        user_response = await auth_client.sign_up({
             "email": credentials.email,
             "password": credentials.password,
         })
@@ -51,10 +56,10 @@ async def signup(credentials: UserCredentials, supabase: Client = Depends(get_su
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.post("/login", response_model=LogInResponse)
-async def login(credentials: UserCredentials, supabase: Client = Depends(get_supabase_client)):
+async def login(credentials: UserCredentials, auth_client: AsyncGoTrueClient = Depends(get_auth_client)):
     """Authenticate user and return access token"""
     try:
-        response = supabase.auth.sign_in_with_password({
+        response = await auth_client.sign_in_with_password({
             "email": credentials.email,
             "password": credentials.password
         })
@@ -77,47 +82,49 @@ async def login(credentials: UserCredentials, supabase: Client = Depends(get_sup
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.post("/logout", response_model=LogOutResponse)
-async def logout(supabase: Client = Depends(get_supabase_client)):
+async def logout(
+    credentials: HTTPAuthorizationCredentials | None = Depends(optional_bearer),
+    auth_client: AsyncGoTrueClient = Depends(get_auth_client),
+):
     """Log out the current user"""
     try:
-        response = supabase.auth.sign_out()
+        if credentials is not None:
+            await auth_client.admin.sign_out(credentials.credentials)
         return {"message": "Logout successful"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
     
-@router.post("/forgot-password")
+@router.post("/forgot-password", response_model=MessageResponse)
 async def forgot_password(
     request: ForgotPasswordRequest,
-    supabase: Client = Depends(get_supabase_client),
+    auth_client: AsyncGoTrueClient = Depends(get_auth_client),
 ):
     """
     Envía un correo con un enlace para restablecer la contraseña.
     """
     try:
-        response = supabase.auth.reset_password_email(request.email)
-
-        if "error" in response and response["error"]:
-            raise HTTPException(status_code=400, detail=response["error"]["message"])
+        # Los errores de Supabase se lanzan como excepciones
+        await auth_client.reset_password_email(request.email)
 
         return {"message": "Se envió un correo con instrucciones para restablecer tu contraseña."}
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-@router.post("/reset-password")
+@router.post("/reset-password", response_model=MessageResponse)
 async def reset_password(
     request: ResetPasswordRequest,
-    supabase: Client = Depends(get_supabase_client),
+    auth_client: AsyncGoTrueClient = Depends(get_auth_client),
 ):
     """
     Cambia la contraseña usando el access_token enviado por Supabase en el correo.
     """
     try:
-        # 1. Establecer la sesión con el access_token
-        supabase.auth.set_session(request.access_token, None)
+        # 1. Establecer la sesión con el access_token (en un cliente propio de esta petición)
+        await auth_client.set_session(request.access_token, "")
 
         # 2. Cambiar la contraseña del usuario autenticado
-        response = supabase.auth.update_user({"password": request.new_password})
+        response = await auth_client.update_user({"password": request.new_password})
 
         if hasattr(response, "error") and response.error:
             raise HTTPException(status_code=400, detail=response.error.message)
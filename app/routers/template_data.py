@@ -1,13 +1,51 @@
-from fastapi import APIRouter, HTTPException, Depends, Request
-from pydantic import BaseModel, Field as PydanticField
-from typing import Any, Dict
-from supabase import Client
-from uuid import uuid4
+from fastapi import APIRouter, HTTPException, Depends, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, ConfigDict, Field as PydanticField
+from typing import Any, AsyncIterator, Dict, Literal, Optional, get_args
 from datetime import datetime
-from ..dependencies import get_supabase_client, auth, UserClaims
+from uuid import uuid4
+from ..dependencies import auth, UserClaims
+from ..cache import get_template
+from ..storage import Repository, get_repository
+from ..conditional import (
+    etag_headers,
+    etag_matches,
+    make_etag,
+    not_modified,
+    template_data_version_key,
+    templates_version_key,
+)
+from ..validation import get_validator
+from ..filters import DataFilter, parse_data_filter
+from ..compact import compact_layout, decode_row, decode_rows, encode_values
+from ..responses import FastJSONResponse
+from ..singleflight import coalesce, invalidate_reads
+from ..writebehind import QueueFull, write_behind
+from ..bulk import (
+    BULK_DEFAULT_CHUNK_SIZE,
+    BULK_MAX_CHUNK_SIZE,
+    BulkImporter,
+    LineTooLong,
+    parse_csv,
+    parse_ndjson,
+)
+from ..pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, decode_cursor
+from ..export import (
+    EXPORT_MEDIA_TYPES,
+    EXPORT_PAGE_SIZE,
+    csv_header,
+    csv_rows,
+    gzip_stream,
+    ndjson_rows,
+)
 
 router = APIRouter()
 
+NUMERIC_FIELD_TYPES = ("int", "float")
+AggregateOperation = Literal["count", "sum", "avg", "min", "max"]
+AGGREGATE_OPERATIONS = get_args(AggregateOperation)
+TimeBucket = Literal["hour", "day", "week", "month", "year"]
+
 class TemplateDataCreate(BaseModel):
     values: Dict[str, Any] = PydanticField(
         ...,
@@ -20,67 +58,125 @@ class TemplateDataUpdate(BaseModel):
         description="Dictionary of field values to update where keys match template field names"
     )
 
-def validate_field_value(field_type: str, value: Any) -> bool:
-    """Validate that a value matches its expected type"""
-    try:
-        if field_type == "string":
-            return isinstance(value, str)
-        elif field_type == "int":
-            # Allow both strings that can be converted to int and actual ints
-            if isinstance(value, str):
-                int(value)
-            return isinstance(value, (int, str))
-        elif field_type == "float":
-            # Allow both strings that can be converted to float and actual floats
-            if isinstance(value, str):
-                float(value)
-            return isinstance(value, (float, str))
-        elif field_type == "boolean":
-            return isinstance(value, bool)
-        elif field_type == "date":
-            # Validate date string format (assuming ISO format)
-            if isinstance(value, str):
-                datetime.fromisoformat(value)
-                return True
-            return False
-        else:
-            return True  # For unknown types, accept any value
-    except (ValueError, TypeError):
-        return False
-
-@router.post("/{template_id}/data")
+# Response models
+
+class TemplateDataEntry(BaseModel):
+    model_config = ConfigDict(extra="allow")  # Other columns of the row are kept
+
+    id: str
+    template_id: str
+    user_id: str
+    values: Dict[str, Any]
+    created_at: str
+
+class TemplateDataPage(BaseModel):
+    data: list[TemplateDataEntry]
+    next_cursor: Optional[str] = None
+
+class TemplateDataCreateResponse(BaseModel):
+    message: str
+    data_id: str
+
+class TemplateDataUpdateResponse(BaseModel):
+    message: str
+    data_id: str
+    updated_data: TemplateDataEntry
+
+class TemplateDataDeleteResponse(BaseModel):
+    message: str
+    data_id: str
+    deleted_data: TemplateDataEntry
+
+class BulkImportLineErrors(BaseModel):
+    line: int
+    errors: list[str]
+
+class BulkImportReport(BaseModel):
+    message: str
+    inserted: int
+    failed: int
+    errors: list[BulkImportLineErrors]
+    errors_truncated: bool
+
+class AggregateResult(BaseModel):
+    # Only the grouping keys and operations that were requested are returned
+    group: Optional[str] = None
+    bucket: Optional[str] = None
+    records: int
+    count: Optional[int] = None
+    sum: Optional[int | float] = None
+    avg: Optional[int | float] = None
+    min: Optional[int | float] = None
+    max: Optional[int | float] = None
+
+class AggregateResponse(BaseModel):
+    template_id: str
+    field: str
+    group_by: Optional[str]
+    bucket: Optional[TimeBucket]
+    results: list[AggregateResult]
+
+class FieldSummary(BaseModel):
+    count: int
+    sum: int | float
+    min: Optional[int | float] = None
+    max: Optional[int | float] = None
+
+class TemplateSummaryResponse(BaseModel):
+    template_id: str
+    record_count: int
+    fields: Dict[str, FieldSummary]
+    updated_at: Optional[str]
+
+class SumCantidadResponse(BaseModel):
+    template_id: str
+    total_cantidad: int | float
+    registros_procesados: int
+    total_registros: Optional[int] = None
+
+class DataFilterQuery:
+    """Filters of the list, export and sum endpoints, checked against the template's fields"""
+
+    def __init__(
+        self,
+        created_after: datetime | None = Query(None, description="Only entries created at or after this time (UTC if no offset)"),
+        created_before: datetime | None = Query(None, description="Only entries created before this time (UTC if no offset)"),
+        specs: list[str] = Query(
+            [],
+            alias="filter",
+            description="`field:op:value` predicate on `values`, typed by the template field (op: eq, lt, gt, or in with comma separated values). Repeat to combine",
+        ),
+    ):
+        self.created_after = created_after
+        self.created_before = created_before
+        self.specs = specs
+
+    def parse(self, template: dict) -> Optional[DataFilter]:
+        try:
+            return parse_data_filter(template["fields"], self.created_after, self.created_before, self.specs)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+@router.post("/{template_id}/data", response_model=TemplateDataCreateResponse)
 async def create_template_data(
     template_id: str,
     data: TemplateDataCreate,
+    response: Response,
     user_claims: UserClaims = Depends(auth),
-    supabase: Client = Depends(get_supabase_client),
+    repository: Repository = Depends(get_repository),
 ):
     """Create a new data entry for a template"""
     try:
         user_id = user_claims.sub
 
         # Verify template exists and belongs to user
-        template_result = supabase.table("templates").select("*").eq("id", template_id).eq("user_id", user_id).single().execute()
+        template = await get_template(repository, user_id, template_id)
 
-        if not template_result.data:
+        if not template:
             raise HTTPException(status_code=404, detail="Template no encontrado o no autorizado")
 
-        template = template_result.data
-        template_fields = template["fields"]
-
-        # Validate all required fields are present and have correct types
-        field_errors = []
-        for field in template_fields:
-            field_name = field["name"]
-            field_type = field["type"]
-
-            # Check if field value exists
-            if field_name not in data.values:
-                continue  # Skip validation if field is not provided (no fields are required)
-
-            # Validate field type
-            if not validate_field_value(field_type, data.values[field_name]):
-                field_errors.append(f"El valor para el campo '{field_name}' no es del tipo esperado: {field_type}")
+        # Validate provided fields against the template (no fields are required, unknown fields are rejected)
+        field_errors = get_validator(template).validate(data.values)
 
         if field_errors:
             raise HTTPException(
@@ -88,19 +184,30 @@ async def create_template_data(
                 detail={"message": "Error de validación", "errors": field_errors}
             )
 
+        # Stored positionally for compact templates
+        values = encode_values(template, data.values)
+
+        # Write-behind mode: accepted now, inserted with the next batch
+        if write_behind.running:
+            try:
+                data_id = write_behind.submit(template_id, user_id, values)
+            except QueueFull:
+                raise HTTPException(
+                    status_code=503,
+                    detail="Demasiados registros pendientes de guardar",
+                    headers={"Retry-After": "1"},
+                )
+            response.status_code = 202
+            return {"message": "Datos aceptados", "data_id": data_id}
+
         # Create the data entry
-        result = supabase.table("template_data").insert({
-            "template_id": template_id,
-            "user_id": user_id,
-            "values": data.values
-        }).execute()
+        entry = await repository.insert_data(template_id, user_id, values)
 
-        if not result.data:
-            raise HTTPException(status_code=400, detail="Error al crear el registro de datos")
+        invalidate_reads(user_id, template_id)
 
         return {
             "message": "Datos guardados exitosamente",
-            "data_id": result.data[0]["id"]
+            "data_id": entry["id"]
         }
 
     except HTTPException as e:
@@ -108,77 +215,290 @@ async def create_template_data(
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-@router.get("/{template_id}/data")
+@router.post("/{template_id}/data/bulk", response_model=BulkImportReport)
+async def bulk_create_template_data(
+    template_id: str,
+    request: Request,
+    chunk_size: int = Query(
+        BULK_DEFAULT_CHUNK_SIZE,
+        ge=1,
+        le=BULK_MAX_CHUNK_SIZE,
+        description="Number of rows inserted per request to the database"
+    ),
+    user_claims: UserClaims = Depends(auth),
+    repository: Repository = Depends(get_repository),
+):
+    """
+    Bulk import data entries from a streamed body.
+
+    The body is NDJSON (one `{"values": {...}}` object per line) or, with
+    `Content-Type: text/csv`, a CSV file whose header holds the field names.
+    Returns a report with the errors found on each rejected line.
+    """
+    try:
+        user_id = user_claims.sub
+
+        # Verify template exists and belongs to user
+        template = await get_template(repository, user_id, template_id)
+
+        if not template:
+            raise HTTPException(status_code=404, detail="Template no encontrado o no autorizado")
+
+        validator = get_validator(template)
+        is_csv = request.headers.get("content-type", "").startswith("text/csv")
+
+        async def insert_rows(rows: list[dict]) -> None:
+            await repository.insert_data_batch(
+                [{"template_id": template_id, "user_id": user_id, "values": encode_values(template, values)} for values in rows]
+            )
+
+        importer = BulkImporter(insert_rows, validator, chunk_size, prevalidated=is_csv)
+        rows = parse_csv(request.stream(), validator) if is_csv else parse_ndjson(request.stream())
+
+        try:
+            try:
+                async for line, values, errors in rows:
+                    await importer.add(line, values, errors)
+            except LineTooLong as e:
+                importer.add_error(0, [str(e)])
+
+            return await importer.finish()
+        finally:
+            # Chunks may have been inserted even when the import fails halfway
+            invalidate_reads(user_id, template_id)
+
+    except HTTPException as e:
+        raise e
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/{template_id}/data", response_model=TemplateDataPage)
 async def list_template_data(
     template_id: str,
+    request: Request,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE, description="Maximum number of entries to return"),
+    cursor: str | None = Query(None, description="Cursor returned as `next_cursor` by the previous page"),
+    fields: str | None = Query(None, description="Comma separated field names to include in `values`"),
+    filters: DataFilterQuery = Depends(),
+    user_claims: UserClaims = Depends(auth),
+    repository: Repository = Depends(get_repository),
+):
+    """List data entries for a specific template, newest first, one page at a time"""
+    try:
+        user_id = user_claims.sub
+
+        # The page changes with the template's data, and disappears with the
+        # template itself (covered by the user's templates version). Versions
+        # are read before the rows, so a concurrent write only makes the ETag stale.
+        # Identical concurrent reads share the same queries.
+        versions = await coalesce(
+            "template_data_versions", user_id, template_id, (),
+            lambda: repository.fetch_versions(template_data_version_key(template_id), templates_version_key(user_id)),
+        )
+        etag = make_etag(request.url.path, request.url.query, user_id, *versions)
+        if etag_matches(request, etag):
+            return not_modified(etag)
+
+        # Verify template exists and belongs to user; a cached template is
+        # only used if no worker changed the user's templates since
+        template = await get_template(repository, user_id, template_id, versions[1])
+
+        if not template:
+            raise HTTPException(status_code=404, detail="Template no encontrado o no autorizado")
+
+        # Optional projection of the values object
+        projected_fields = None
+        if fields is not None:
+            projected_fields = [name.strip() for name in fields.split(",") if name.strip()]
+            template_field_names = {field["name"] for field in template["fields"]}
+            unknown = [name for name in projected_fields if name not in template_field_names]
+            if unknown:
+                raise HTTPException(status_code=400, detail=f"Campos inexistentes en el template: {', '.join(unknown)}")
+
+        # Filtered in the database, so only matching entries are sent
+        data_filter = filters.parse(template)
+
+        if cursor:
+            try:
+                decode_cursor(cursor)
+            except ValueError as e:
+                raise HTTPException(status_code=400, detail=str(e))
+
+        async def fetch_page() -> tuple[list[dict], Optional[str]]:
+            rows, next_cursor = await repository.list_data(
+                user_id, template_id, limit, cursor, projected_fields, data_filter, compact_layout(template),
+            )
+            return decode_rows(template, rows), next_cursor
+
+        page_key = (limit, cursor, tuple(projected_fields) if projected_fields is not None else None, data_filter)
+        rows, next_cursor = await coalesce("template_data_page", user_id, template_id, page_key, fetch_page)
+
+        # Rows come straight from the database: encode them directly instead of
+        # validating every row again against the response model
+        return FastJSONResponse({"data": rows, "next_cursor": next_cursor}, headers=etag_headers(etag))
+
+    except HTTPException as e:
+        raise e
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+async def get_template_summary(repository: Repository, user_id: str, template_id: str) -> dict:
+    """Running totals of a template, shared by identical concurrent reads"""
+    return await coalesce(
+        "template_summary", user_id, template_id, (),
+        lambda: repository.get_template_summary(user_id, template_id),
+    )
+
+@router.get("/{template_id}/data/aggregate", response_model=AggregateResponse, response_model_exclude_unset=True)
+async def aggregate_template_data(
+    template_id: str,
+    field: str = Query(..., description="Numeric field (int or float) to aggregate"),
+    ops: list[AggregateOperation] = Query(list(AGGREGATE_OPERATIONS), description="Operations to compute"),
+    group_by: str | None = Query(None, description="Field whose values group the results"),
+    bucket: TimeBucket | None = Query(None, description="Group the results by a time bucket on created_at"),
     user_claims: UserClaims = Depends(auth),
-    supabase: Client = Depends(get_supabase_client),
+    repository: Repository = Depends(get_repository),
 ):
-    """List all data entries for a specific template"""
+    """Compute count/sum/avg/min/max of a numeric field, optionally grouped, in the database"""
     try:
         user_id = user_claims.sub
 
         # Verify template exists and belongs to user
-        template_exists = supabase.table("templates").select("id").eq("id", template_id).eq("user_id", user_id).single().execute()
+        template = await get_template(repository, user_id, template_id)
 
-        if not template_exists.data:
+        if not template:
             raise HTTPException(status_code=404, detail="Template no encontrado o no autorizado")
 
-        # Get all data entries for this template
-        result = supabase.table("template_data").select("*").eq("template_id", template_id).eq("user_id", user_id).order("created_at", desc=True).execute()
+        field_types = {f["name"]: f["type"] for f in template["fields"]}
+        if field_types.get(field) not in NUMERIC_FIELD_TYPES:
+            raise HTTPException(status_code=400, detail=f"El campo '{field}' no existe o no es numérico")
+        if group_by is not None and group_by not in field_types:
+            raise HTTPException(status_code=400, detail=f"El campo '{group_by}' no existe en el template")
+
+        if group_by is None and bucket is None:
+            # Totals are read from the running summary instead of scanning the data
+            summary = await get_template_summary(repository, user_id, template_id)
+            totals = summary["fields"].get(field) or {}
+            count = totals.get("count", 0)
+            rows = [{
+                "records": summary["record_count"],
+                "count": count,
+                "sum": totals.get("sum") if count else None,
+                "avg": totals["sum"] / count if count else None,
+                "min": totals.get("min"),
+                "max": totals.get("max"),
+            }] if summary["record_count"] else []
+        else:
+            rows = await repository.aggregate_data(user_id, template_id, field, group_by, bucket, layout=compact_layout(template))
+
+        results = []
+        for row in rows:
+            result = {}
+            if group_by is not None:
+                result["group"] = row["group_value"]
+            if bucket is not None:
+                result["bucket"] = row["bucket"]
+            result["records"] = row["records"]
+            for op in ops:
+                result[op] = row[op]
+            results.append(result)
 
-        return {"data": result.data}
+        return {
+            "template_id": template_id,
+            "field": field,
+            "group_by": group_by,
+            "bucket": bucket,
+            "results": results
+        }
 
     except HTTPException as e:
         raise e
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-@router.get("/{template_id}/data/sum")
+@router.get("/{template_id}/data/summary", response_model=TemplateSummaryResponse)
+async def get_template_data_summary(
+    template_id: str,
+    user_claims: UserClaims = Depends(auth),
+    repository: Repository = Depends(get_repository),
+):
+    """Running totals of a template: record count and count/sum/min/max per numeric field"""
+    try:
+        user_id = user_claims.sub
+
+        # Verify template exists and belongs to user
+        template = await get_template(repository, user_id, template_id)
+
+        if not template:
+            raise HTTPException(status_code=404, detail="Template no encontrado o no autorizado")
+
+        summary = await get_template_summary(repository, user_id, template_id)
+
+        return {"template_id": template_id, **summary}
+
+    except HTTPException as e:
+        raise e
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/{template_id}/data/sum", response_model=SumCantidadResponse, response_model_exclude_unset=True)
 async def sum_cantidad_by_template(
     template_id: str,
+    filters: DataFilterQuery = Depends(),
     user_claims: UserClaims = Depends(auth),
-    supabase: Client = Depends(get_supabase_client),
+    repository: Repository = Depends(get_repository),
 ):
     """Calcular la sumatoria del campo 'Cantidad' para un template específico"""
     try:
         user_id = user_claims.sub
 
         # Verificar que el template existe y pertenece al usuario
-        template_exists = supabase.table("templates").select("id").eq("id", template_id).eq("user_id", user_id).single().execute()
-        print("Existe el template: " + str(template_exists)) #Imprimo si el template existe
+        template = await get_template(repository, user_id, template_id)
 
-        if not template_exists.data:
+        if not template:
             raise HTTPException(status_code=404, detail="Template no encontrado o no autorizado")
 
-        # Obtener todos los registros de datos para este template
-        result = supabase.table("template_data").select("values").eq("template_id", template_id).eq("user_id", user_id).execute()
+        data_filter = filters.parse(template)
+
+        # Solo se suman los valores que ya son numéricos. El resumen acumula los campos
+        # int y float: si 'Cantidad' es de otro tipo se suma en la base de datos, como con filtros
+        cantidad_type = next((field["type"] for field in template["fields"] if field["name"] == "Cantidad"), None)
+
+        if data_filter is not None or cantidad_type not in (None, "int", "float"):
+            # Con filtros la sumatoria se calcula en la base de datos sobre los registros que coinciden
+            rows = await repository.aggregate_data(
+                user_id, template_id, "Cantidad", filters=data_filter, layout=compact_layout(template),
+            )
+            if not rows:
+                return {
+                    "template_id": template_id,
+                    "total_cantidad": 0,
+                    "registros_procesados": 0
+                }
+            return {
+                "template_id": template_id,
+                "total_cantidad": float(rows[0]["sum"] or 0),
+                "registros_procesados": rows[0]["count"],
+                "total_registros": rows[0]["records"]
+            }
+
+        # La sumatoria se lee del resumen que mantiene la base de datos
+        summary = await get_template_summary(repository, user_id, template_id)
 
-        if not result.data:
+        if not summary["record_count"]:
             return {
                 "template_id": template_id,
                 "total_cantidad": 0,
                 "registros_procesados": 0
             }
 
-        # Calcular la sumatoria del campo 'Cantidad'
-        total_cantidad = 0
-        registros_procesados = 0
-
-        for registro in result.data:
-            values = registro.get("values", {})
-            if isinstance(values, dict) and "Cantidad" in values:
-                cantidad = values["Cantidad"]
-                # Solo procesar valores que ya son numéricos
-                if isinstance(cantidad, (int, float)):
-                    total_cantidad += float(cantidad)
-                    registros_procesados += 1
+        cantidad = summary["fields"].get("Cantidad") or {}
 
         return {
             "template_id": template_id,
-            "total_cantidad": total_cantidad,
-            "registros_procesados": registros_procesados,
-            "total_registros": len(result.data)
+            "total_cantidad": float(cantidad.get("sum") or 0),
+            "registros_procesados": cantidad.get("count", 0),
+            "total_registros": summary["record_count"]
         }
 
     except HTTPException as e:
@@ -187,70 +507,114 @@ async def sum_cantidad_by_template(
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@router.get("/{template_id}/data/{data_id}")
+@router.get(
+    "/{template_id}/data/export",
+    response_class=StreamingResponse,
+    responses={200: {"content": {media_type: {} for media_type in EXPORT_MEDIA_TYPES.values()}}},
+)
+async def export_template_data(
+    template_id: str,
+    format: Literal["csv", "ndjson"] = Query("csv", description="Export format"),
+    gzip: bool = Query(False, description="Compress the transfer with gzip (Content-Encoding; clients save the decoded file)"),
+    filters: DataFilterQuery = Depends(),
+    user_claims: UserClaims = Depends(auth),
+    repository: Repository = Depends(get_repository),
+):
+    """Stream every data entry of a template (or the ones matching the filters) as CSV or NDJSON, columns in template field order"""
+    try:
+        user_id = user_claims.sub
+
+        # Verify template exists and belongs to user
+        template = await get_template(repository, user_id, template_id)
+
+        if not template:
+            raise HTTPException(status_code=404, detail="Template no encontrado o no autorizado")
+
+        field_names = [field["name"] for field in template["fields"]]
+        encode_rows = csv_rows if format == "csv" else ndjson_rows
+        data_filter = filters.parse(template)
+
+        async def generate() -> AsyncIterator[bytes]:
+            if format == "csv":
+                yield csv_header(field_names)
+            cursor = None
+            while True:
+                rows, cursor = await repository.list_data(
+                    user_id, template_id, EXPORT_PAGE_SIZE, cursor, filters=data_filter, layout=compact_layout(template),
+                )
+                if rows:
+                    yield encode_rows(decode_rows(template, rows), field_names)
+                if cursor is None:
+                    break
+
+        # With gzip only the transfer is compressed: browsers and HTTP clients
+        # decode the body, so the file keeps its plain extension
+        headers = {"Content-Disposition": f'attachment; filename="{template_id}.{format}"'}
+        if gzip:
+            headers["Content-Encoding"] = "gzip"
+
+        return StreamingResponse(
+            gzip_stream(generate()) if gzip else generate(),
+            media_type=EXPORT_MEDIA_TYPES[format],
+            headers=headers,
+        )
+
+    except HTTPException as e:
+        raise e
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/{template_id}/data/{data_id}", response_model=TemplateDataEntry)
 async def get_template_data(
     template_id: str,
     data_id: str,
     user_claims: UserClaims = Depends(auth),
-    supabase: Client = Depends(get_supabase_client),
+    repository: Repository = Depends(get_repository),
 ):
     """Get a specific data entry for a template"""
     try:
         user_id = user_claims.sub
 
+        # Verify template exists and belongs to user: the data of a template
+        # being deleted is hidden along with it
+        template = await get_template(repository, user_id, template_id)
+
+        if not template:
+            raise HTTPException(status_code=404, detail="Template no encontrado o no autorizado")
+
         # Get the specific data entry
-        result = supabase.table("template_data").select("*").eq("id", data_id).eq("template_id", template_id).eq("user_id", user_id).single().execute()
+        entry = await repository.get_data(user_id, template_id, data_id)
 
-        if not result.data:
+        if not entry:
             raise HTTPException(status_code=404, detail="Registro no encontrado o no autorizado")
 
-        return result.data
+        return decode_row(template, entry)
 
     except HTTPException as e:
         raise e
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-@router.put("/{template_id}/data/{data_id}")
+@router.put("/{template_id}/data/{data_id}", response_model=TemplateDataUpdateResponse)
 async def update_template_data(
     template_id: str,
     data_id: str,
     data: TemplateDataUpdate,
     user_claims: UserClaims = Depends(auth),
-    supabase: Client = Depends(get_supabase_client),
+    repository: Repository = Depends(get_repository),
 ):
     """Update a specific data entry for a template"""
     try:
         user_id = user_claims.sub
 
         # Verify template exists and belongs to user
-        template_result = supabase.table("templates").select("*").eq("id", template_id).eq("user_id", user_id).single().execute()
+        template = await get_template(repository, user_id, template_id)
 
-        if not template_result.data:
+        if not template:
             raise HTTPException(status_code=404, detail="Template no encontrado o no autorizado")
 
-        template = template_result.data
-        template_fields = template["fields"]
-
-        # Verify the data entry exists and belongs to the user
-        existing_data_result = supabase.table("template_data").select("*").eq("id", data_id).eq("template_id", template_id).eq("user_id", user_id).single().execute()
-
-        if not existing_data_result.data:
-            raise HTTPException(status_code=404, detail="Registro no encontrado o no autorizado")
-
-        # Validate all provided fields have correct types
-        field_errors = []
-        for field in template_fields:
-            field_name = field["name"]
-            field_type = field["type"]
-
-            # Check if field value exists in the update data
-            if field_name not in data.values:
-                continue  # Skip validation if field is not provided in update
-
-            # Validate field type
-            if not validate_field_value(field_type, data.values[field_name]):
-                field_errors.append(f"El valor para el campo '{field_name}' no es del tipo esperado: {field_type}")
+        # Validate provided fields against the template (unknown fields are rejected)
+        field_errors = get_validator(template).validate(data.values)
 
         if field_errors:
             raise HTTPException(
@@ -258,18 +622,18 @@ async def update_template_data(
                 detail={"message": "Error de validación", "errors": field_errors}
             )
 
-        # Update the data entry
-        result = supabase.table("template_data").update({
-            "values": data.values
-        }).eq("id", data_id).eq("template_id", template_id).eq("user_id", user_id).execute()
+        # Update the data entry; only an existing entry owned by the user is updated
+        entry = await repository.update_data(user_id, template_id, data_id, encode_values(template, data.values))
+
+        if not entry:
+            raise HTTPException(status_code=404, detail="Registro no encontrado o no autorizado")
 
-        if not result.data:
-            raise HTTPException(status_code=400, detail="Error al actualizar el registro de datos")
+        invalidate_reads(user_id, template_id)
 
         return {
             "message": "Datos actualizados exitosamente",
             "data_id": data_id,
-            "updated_data": result.data[0]
+            "updated_data": decode_row(template, entry)
         }
 
     except HTTPException as e:
@@ -277,42 +641,37 @@ async def update_template_data(
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-@router.delete("/{template_id}/data/{data_id}")
+@router.delete("/{template_id}/data/{data_id}", response_model=TemplateDataDeleteResponse)
 async def delete_template_data(
     template_id: str,
     data_id: str,
     user_claims: UserClaims = Depends(auth),
-    supabase: Client = Depends(get_supabase_client),
+    repository: Repository = Depends(get_repository),
 ):
     """Delete a specific data entry for a template"""
     try:
         user_id = user_claims.sub
 
-        # Verify template exists and belongs to user
-        template_exists = supabase.table("templates").select("id").eq("id", template_id).eq("user_id", user_id).single().execute()
+        # Verify template exists and belongs to user: the data of a template
+        # being deleted is left to its deletion job
+        template = await get_template(repository, user_id, template_id)
 
-        if not template_exists.data:
+        if not template:
             raise HTTPException(status_code=404, detail="Template no encontrado o no autorizado")
 
-        # Verify the data entry exists and belongs to the user
-        existing_data_result = supabase.table("template_data").select("*").eq("id", data_id).eq("template_id", template_id).eq("user_id", user_id).single().execute()
+        # Delete the data entry; only an existing entry owned by the user is
+        # deleted, and the deleted row is returned for the response
+        entry = await repository.delete_data(user_id, template_id, data_id)
 
-        if not existing_data_result.data:
+        if not entry:
             raise HTTPException(status_code=404, detail="Registro no encontrado o no autorizado")
 
-        # Store the data before deletion for the response
-        deleted_data = existing_data_result.data
-
-        # Delete the data entry
-        result = supabase.table("template_data").delete().eq("id", data_id).eq("template_id", template_id).eq("user_id", user_id).execute()
-
-        if not result.data:
-            raise HTTPException(status_code=400, detail="Error al eliminar el registro de datos")
+        invalidate_reads(user_id, template_id)
 
         return {
             "message": "Registro eliminado exitosamente",
             "data_id": data_id,
-            "deleted_data": deleted_data
+            "deleted_data": decode_row(template, entry)
         }
 
     except HTTPException as e:
@@ -1,9 +1,22 @@
-from fastapi import APIRouter, HTTPException, Depends, Query, Request, Body
-from pydantic import BaseModel, validator, Field as PydanticField
-from supabase import Client
+from fastapi import APIRouter, HTTPException, Depends, Query, Request, Response, Body
+from pydantic import BaseModel, ConfigDict, validator, Field as PydanticField
 from uuid import uuid4
-from ..dependencies import get_supabase_client, auth, UserClaims
-from typing import Literal, Dict, Any
+from ..dependencies import auth, UserClaims
+from ..cache import invalidate_template
+from ..storage import Repository, get_repository
+from ..conditional import (
+    etag_headers,
+    etag_matches,
+    make_etag,
+    not_modified,
+    templates_version_key,
+    user_data_version_key,
+)
+from .template_data import FieldSummary
+from ..jobs import deletion_jobs, job_progress
+from ..singleflight import coalesce, invalidate_reads
+from ..responses import FastJSONResponse, MessageResponse
+from typing import Literal, Dict, Any, Optional
 from datetime import datetime
 
 router = APIRouter()
@@ -18,130 +31,261 @@ class Field(BaseModel):
 class TemplateCreate(BaseModel):
     name: str         # Nombre del template (e.g., "Agua Tomada")
     fields: list[Field]  # Lista de campos definidos por el usuario
-
-@router.post("/")
+    compact: bool = False  # Guardar los datos por posición (ver app/compact.py); solo al crear
+
+# Modelos de respuesta
+class TemplateCreateResponse(BaseModel):
+    message: str
+    template_id: str
+
+class Template(BaseModel):
+    model_config = ConfigDict(extra="allow")  # Se conservan las demás columnas de la tabla
+
+    id: str
+    user_id: str
+    name: str
+    fields: list[Field]
+
+class TemplateListResponse(BaseModel):
+    templates: list[Template]
+
+class TemplateDetailsResponse(BaseModel):
+    template_id: str
+    name: str
+    fields: list[Field]
+
+class TemplateOverview(BaseModel):
+    template_id: str
+    name: str
+    fields: list[Field]
+    record_count: int
+    last_entry_at: Optional[str]
+    totals: Dict[str, FieldSummary]  # count/sum/min/max por campo numérico
+
+class TemplatesSummaryResponse(BaseModel):
+    templates: list[TemplateOverview]
+
+class TemplateDeleteResponse(BaseModel):
+    message: str
+    job_id: Optional[str] = None  # Con datos y force=true: tarea que borra los datos en segundo plano
+
+class TemplateJobResponse(BaseModel):
+    job_id: str
+    template_id: str
+    status: Literal["pending", "running", "done"]
+    total_rows: int  # Estimado al crear la tarea
+    deleted_rows: int
+    progress: float  # Entre 0 y 1
+    error: Optional[str]
+    created_at: str
+    updated_at: str
+    finished_at: Optional[str]
+
+@router.post("/", response_model=TemplateCreateResponse)
 async def create_template(
     template: TemplateCreate,
     user_claims: UserClaims = Depends(auth),
-    supabase: Client = Depends(get_supabase_client),
+    repository: Repository = Depends(get_repository),
 ):
     """Crear un nuevo template dinámico"""
     try:
         user_id = user_claims.sub  # Use the sub claim as the user ID
 
-        # Guardamos el template en la base de datos de Supabase
-        result = supabase.table("templates").insert({
-            "name": template.name,
-            "user_id": user_id,  # Asociamos el template con el usuario
-            "fields": [field.model_dump() for field in template.fields]  # Guardamos los campos como JSON
-        }).execute()
+        # Guardamos el template asociado al usuario, con los campos como JSON
+        created = await repository.create_template(
+            user_id,
+            template.name,
+            [field.model_dump() for field in template.fields],
+            compact=template.compact,
+        )
 
-        # Check if the operation was successful by checking if data was returned
-        if not result.data:
-            raise HTTPException(status_code=400, detail="Failed to create template")
+        invalidate_reads(user_id)
 
         return {
             "message": "Template creado exitosamente",
-            "template_id": result.data[0]["id"]
+            "template_id": created["id"]
         }
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-@router.get("/")
+@router.get("/", response_model=TemplateListResponse)
 async def list_templates(
+    request: Request,
     user_claims: UserClaims = Depends(auth),
-    supabase: Client = Depends(get_supabase_client),
+    repository: Repository = Depends(get_repository),
 ):
     """Listar todos los templates del usuario autenticado"""
     try:
         user_id = user_claims.sub
 
+        # La versión se lee antes que los datos: si cambian entre ambas lecturas,
+        # el ETag queda desactualizado y el cliente vuelve a pedirlos
+        (version,) = await repository.fetch_versions(templates_version_key(user_id))
+        etag = make_etag(request.url.path, user_id, version)
+        if etag_matches(request, etag):
+            return not_modified(etag)
+
         # Buscar templates por user_id
-        result = supabase.table("templates").select("*").eq("user_id", user_id).execute()
+        user_templates = await repository.list_templates(user_id)
+
+        # Las filas vienen de la base de datos: se codifican directamente, sin validarlas de nuevo
+        return FastJSONResponse({"templates": user_templates}, headers=etag_headers(etag))
 
-        # Check if the operation was successful
-        if result.data is None:
-            raise HTTPException(status_code=400, detail="Failed to fetch templates")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
 
-        return {"templates": result.data}
+@router.get("/summary", response_model=TemplatesSummaryResponse)
+async def get_templates_summary(
+    request: Request,
+    user_claims: UserClaims = Depends(auth),
+    repository: Repository = Depends(get_repository),
+):
+    """Resumen de todos los templates del usuario (cantidad de registros, último registro y totales) en una sola llamada"""
+    try:
+        user_id = user_claims.sub
+
+        # Cambia con cualquier escritura en los templates o en los datos del usuario
+        versions = await repository.fetch_versions(templates_version_key(user_id), user_data_version_key(user_id))
+        etag = make_etag(request.url.path, user_id, *versions)
+        if etag_matches(request, etag):
+            return not_modified(etag)
+
+        # Templates, totales acumulados y fecha del último registro en una sola consulta
+        overview = await repository.templates_summary(user_id)
+
+        return FastJSONResponse({"templates": overview}, headers=etag_headers(etag))
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-@router.get("/{template_id}")
+@router.get("/{template_id}", response_model=TemplateDetailsResponse)
 async def get_template_details(
     template_id: str,
+    request: Request,
+    response: Response,
     user_claims: UserClaims = Depends(auth),
-    supabase: Client = Depends(get_supabase_client),
+    repository: Repository = Depends(get_repository),
 ):
     """Obtener detalles de un template específico por su ID"""
     try:
         user_id = user_claims.sub
 
+        # Respuesta 304 sin buscar el template si el cliente ya tiene esta versión.
+        # Las lecturas idénticas concurrentes comparten la misma consulta
+        (version,) = await coalesce(
+            "template_versions", user_id, None, (),
+            lambda: repository.fetch_versions(templates_version_key(user_id)),
+        )
+        etag = make_etag(request.url.path, user_id, version)
+        if etag_matches(request, etag):
+            return not_modified(etag)
+
         # Buscar el template por ID y asegurar que pertenece al usuario autenticado
-        result = supabase.table("templates").select("*").eq("id", template_id).eq("user_id", user_id).single().execute()
+        template = await coalesce(
+            "template_details", user_id, template_id, (),
+            lambda: repository.get_template(user_id, template_id),
+        )
 
         # Check if template was found
-        if not result.data:
+        if not template:
             raise HTTPException(status_code=404, detail="Template no encontrado o no pertenece al usuario")
 
+        response.headers.update(etag_headers(etag))
         return {
-            "template_id": result.data["id"],
-            "name": result.data["name"],
-            "fields": result.data["fields"]
+            "template_id": template["id"],
+            "name": template["name"],
+            "fields": template["fields"]
         }
 
+    except HTTPException as e:
+        raise e
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@router.delete("/{template_id}")
+@router.delete("/{template_id}", response_model=TemplateDeleteResponse, response_model_exclude_unset=True)
 async def delete_template(
     template_id: str,
+    response: Response,
     force: bool = Query(False, description="Eliminar también si hay datos asociados"),
     user_claims: UserClaims = Depends(auth),
-    supabase: Client = Depends(get_supabase_client),
+    repository: Repository = Depends(get_repository),
 ):
-    """Eliminar un template (con confirmación si hay datos asociados)"""
+    """
+    Eliminar un template (con confirmación si hay datos asociados).
+
+    Con `force=true` y datos asociados, el template se oculta de inmediato y sus
+    datos se borran en segundo plano: responde 202 con el `job_id` de la tarea,
+    cuyo avance se consulta en `GET /templates/{template_id}/jobs/{job_id}`.
+    """
     try:
         user_id = user_claims.sub
 
-        # Verificar si el template existe y pertenece al usuario
-        result = supabase.table("templates").select("*").eq("id", template_id).eq("user_id", user_id).single().execute()
-        if not result.data:
-            raise HTTPException(status_code=404, detail="Template no encontrado o no autorizado")
+        # Verificación y borrado (u ocultación, con los datos en segundo plano) en una sola llamada
+        result = await repository.delete_template(user_id, template_id, force)
+        invalidate_template(user_id, template_id)
 
-        # Verificar si hay datos asociados al template
-        data_check = supabase.table("template_data").select("id").eq("template_id", template_id).limit(1).execute()
-        if data_check.data and not force:
+        outcome = result["status"]
+        if outcome == "not_found":
+            raise HTTPException(status_code=404, detail="Template no encontrado o no autorizado")
+        if outcome == "has_data":
             raise HTTPException(
                 status_code=400,
                 detail="Este template tiene datos asociados. Usa 'force=true' para eliminarlo junto con los datos."
             )
+        if outcome == "queued":
+            deletion_jobs.wake()
+            response.status_code = 202
+            return {"message": "Template eliminado, borrando sus datos", "job_id": result["job_id"]}
 
-        # Eliminar datos asociados (si existen y se confirma con `force`)
-        if data_check.data and force:
-            delete_data = supabase.table("template_data").delete().eq("template_id", template_id).execute()
-            if not delete_data.data:
-                raise HTTPException(status_code=500, detail="Error al eliminar los datos asociados")
+        return {"message": "Template eliminado correctamente"}
 
-        # Eliminar el template
-        delete_template = supabase.table("templates").delete().eq("id", template_id).execute()
-        if not delete_template.data:
-            raise HTTPException(status_code=500, detail="Error al eliminar el template")
+    except HTTPException as e:
+        raise e
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
 
-        return {"message": "Template eliminado correctamente"}
+@router.get("/{template_id}/jobs/{job_id}", response_model=TemplateJobResponse)
+async def get_template_job(
+    template_id: str,
+    job_id: str,
+    user_claims: UserClaims = Depends(auth),
+    repository: Repository = Depends(get_repository),
+):
+    """Avance de una tarea en segundo plano de un template (borrado de sus datos)"""
+    try:
+        user_id = user_claims.sub
+
+        # La tarea sigue disponible después de borrado el template
+        job = await repository.get_deletion_job(user_id, template_id, job_id)
+
+        if not job:
+            raise HTTPException(status_code=404, detail="Tarea no encontrada o no autorizada")
+        return {
+            "job_id": job["id"],
+            "template_id": job["template_id"],
+            "status": job["status"],
+            "total_rows": job["total_rows"],
+            "deleted_rows": job["deleted_rows"],
+            "progress": job_progress(job),
+            "error": job["error"],
+            "created_at": job["created_at"],
+            "updated_at": job["updated_at"],
+            "finished_at": job["finished_at"],
+        }
 
+    except HTTPException as e:
+        raise e
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
-    
-@router.put("/{template_id}")
+
+@router.put("/{template_id}", response_model=MessageResponse)
 async def update_template(
     template_id: str,
     updated_template: TemplateCreate = Body(...),
     user_claims: UserClaims = Depends(auth),
-    supabase: Client = Depends(get_supabase_client),
+    repository: Repository = Depends(get_repository),
 ):
     """
     Editar un template existente. Si tiene datos asociados, solo se puede cambiar el nombre.
@@ -150,16 +294,13 @@ async def update_template(
         user_id = user_claims.sub
 
         # Verificar que el template existe y pertenece al usuario
-        result = supabase.table("templates").select("*").eq("id", template_id).eq("user_id", user_id).single().execute()
+        existing_template = await repository.get_template(user_id, template_id)
 
-        if not result.data:
+        if not existing_template:
             raise HTTPException(status_code=404, detail="Template no encontrado o no autorizado")
 
-        existing_template = result.data
-
         # Verificar si tiene datos asociados
-        data_check = supabase.table("template_data").select("id").eq("template_id", template_id).limit(1).execute()
-        has_data = bool(data_check.data)
+        has_data = await repository.template_has_data(template_id)
 
         updates = {"name": updated_template.name}
 
@@ -172,9 +313,10 @@ async def update_template(
         else:
             updates["fields"] = [f.model_dump() for f in updated_template.fields]
 
-        update_result = supabase.table("templates").update(updates).eq("id", template_id).execute()
+        updated = await repository.update_template(user_id, template_id, updates)
+        invalidate_template(user_id, template_id)
 
-        if not update_result.data:
+        if not updated:
             raise HTTPException(status_code=500, detail="Error al actualizar el template")
 
         return {"message": "Template actualizado correctamente"}
@@ -0,0 +1,47 @@
+from fastapi import APIRouter, HTTPException
+from pydantic import BaseModel
+from typing import Optional
+
+from ..writebehind import write_behind
+
+router = APIRouter()
+
+class WriteBehindStatus(BaseModel):
+    enabled: bool
+    pending: int
+    accepted: int
+    flushed: int
+    rejected: int
+    batches: int
+    last_flush_at: Optional[str]
+    last_error: Optional[str]
+
+class WriteBehindReplayResponse(BaseModel):
+    recovered: int
+    status: WriteBehindStatus
+
+# Counters are per worker process, like /metrics
+
+@router.get("/status", response_model=WriteBehindStatus)
+async def get_write_behind_status():
+    """Entries accepted by this worker and not yet inserted, and flush statistics"""
+    return write_behind.status()
+
+@router.post("/flush", response_model=WriteBehindStatus)
+async def flush_write_behind():
+    """Insert every pending entry now instead of waiting for the next batch"""
+    if not write_behind.running:
+        return write_behind.status()
+    try:
+        await write_behind.flush()
+    except Exception as e:
+        raise HTTPException(status_code=503, detail=f"No se pudieron guardar los registros pendientes: {e}")
+    return write_behind.status()
+
+@router.post("/replay", response_model=WriteBehindReplayResponse)
+async def replay_write_behind():
+    """Take over the journals left by workers that stopped without flushing them"""
+    if not write_behind.running:
+        raise HTTPException(status_code=409, detail="El modo write-behind no está activo")
+    recovered = write_behind.replay()
+    return {"recovered": recovered, "status": write_behind.status()}
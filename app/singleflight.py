@@ -0,0 +1,75 @@
+from typing import Any, Awaitable, Callable, Hashable, Optional, TypeVar
+import asyncio
+import os
+
+from .metrics import singleflight_calls_total
+
+# Concurrent identical reads share one Supabase call
+SINGLEFLIGHT_ENABLED = os.environ.get("SINGLEFLIGHT_ENABLED", "true").lower() == "true"
+
+T = TypeVar("T")
+
+# Reads are grouped by what invalidates them: (user_id, template_id), or
+# (user_id, None) for reads spanning all templates of the user
+Scope = tuple[str, Optional[str]]
+
+
+class SingleFlight:
+    """Shares the result of an in-flight call with identical calls made meanwhile.
+
+    Callers must treat the shared result as read-only. A write bumps the
+    generation of its scope, so calls made after the write never join a call
+    started before it. Generations only exist while calls of the scope are in
+    flight, which keeps the bookkeeping bounded.
+    """
+
+    def __init__(self):
+        self._flights: dict[Hashable, asyncio.Task] = {}
+        self._active: dict[Scope, int] = {}
+        self._generations: dict[Scope, int] = {}
+
+    async def do(self, call: str, scope: Scope, key: Hashable, fn: Callable[[], Awaitable[T]]) -> T:
+        if not SINGLEFLIGHT_ENABLED:
+            return await fn()
+        flight_key = (call, scope, self._generations.get(scope, 0), key)
+        task = self._flights.get(flight_key)
+        if task is None:
+            singleflight_calls_total.inc(call, "leader")
+            task = asyncio.ensure_future(fn())
+            self._flights[flight_key] = task
+            self._active[scope] = self._active.get(scope, 0) + 1
+            task.add_done_callback(lambda done: self._finish(scope, flight_key, done))
+        else:
+            singleflight_calls_total.inc(call, "follower")
+        # A caller going away (client disconnect) must not cancel the call for the others
+        return await asyncio.shield(task)
+
+    def _finish(self, scope: Scope, flight_key: Hashable, task: asyncio.Task) -> None:
+        if self._flights.get(flight_key) is task:
+            del self._flights[flight_key]
+        self._active[scope] -= 1
+        if not self._active[scope]:
+            del self._active[scope]
+            self._generations.pop(scope, None)
+        # Retrieved so an error nobody waits for anymore is not reported as unhandled
+        if not task.cancelled():
+            task.exception()
+
+    def invalidate(self, user_id: str, template_id: Optional[str] = None) -> None:
+        """Stop sharing calls started before a write to the template (and to the user's overall reads)"""
+        for scope in ((user_id, template_id), (user_id, None)):
+            if scope in self._active:
+                self._generations[scope] = self._generations.get(scope, 0) + 1
+
+
+reads = SingleFlight()
+
+
+def invalidate_reads(user_id: str, template_id: Optional[str] = None) -> None:
+    """Call after a write has completed"""
+    reads.invalidate(user_id, template_id)
+
+
+async def coalesce(call: str, user_id: str, template_id: Optional[str], key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+    """Run `fn`, or wait for the identical call already in flight"""
+    return await reads.do(call, (user_id, template_id), key, fn)
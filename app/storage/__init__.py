@@ -0,0 +1,72 @@
+"""Storage backends for templates and template data.
+
+`STORAGE_BACKEND=supabase` (default) keeps everything in the Supabase project;
+`STORAGE_BACKEND=sqlite` uses an embedded database at `SQLITE_PATH`, for
+single-tenant edge deployments and local benchmarks. Authentication still goes
+through Supabase Auth in both cases.
+"""
+from typing import Optional
+import os
+
+from fastapi import Depends
+from supabase import AsyncClient
+
+from ..dependencies import get_supabase_client, open_supabase_client
+from .base import DataError, Repository
+from .sqlite import SQLiteRepository
+from .supabase import SupabaseRepository
+
+STORAGE_BACKEND = os.environ.get("STORAGE_BACKEND", "supabase")
+SQLITE_PATH = os.environ.get("SQLITE_PATH", "data.sqlite3")
+
+if STORAGE_BACKEND not in ("supabase", "sqlite"):
+    raise RuntimeError(f"Unknown STORAGE_BACKEND: {STORAGE_BACKEND!r}")
+
+_sqlite: Optional[SQLiteRepository] = None
+
+
+def sqlite_repository() -> SQLiteRepository:
+    global _sqlite
+    if _sqlite is None:
+        _sqlite = SQLiteRepository(SQLITE_PATH)
+    return _sqlite
+
+
+async def _get_supabase_repository(supabase: AsyncClient = Depends(get_supabase_client)) -> Repository:
+    return SupabaseRepository(supabase)
+
+
+async def _get_sqlite_repository() -> Repository:
+    return sqlite_repository()
+
+
+# Dependency giving the routers the configured storage
+get_repository = _get_sqlite_repository if STORAGE_BACKEND == "sqlite" else _get_supabase_repository
+
+
+async def open_repository() -> Repository:
+    """Open the configured storage (and warm it up) before the app starts serving"""
+    if STORAGE_BACKEND == "sqlite":
+        repository = sqlite_repository()
+        await repository.open()
+        return repository
+    return SupabaseRepository(await open_supabase_client())
+
+
+async def close_repository() -> None:
+    global _sqlite
+    if _sqlite is not None:
+        await _sqlite.close()
+        _sqlite = None
+
+
+__all__ = [
+    "DataError",
+    "Repository",
+    "SQLiteRepository",
+    "STORAGE_BACKEND",
+    "SupabaseRepository",
+    "close_repository",
+    "get_repository",
+    "open_repository",
+]
@@ -0,0 +1,147 @@
+from abc import ABC, abstractmethod
+from typing import Any, Optional
+
+from ..filters import DataFilter
+
+
+class DataError(Exception):
+    """Rows the database rejected for good (invalid data or a constraint
+    violation, e.g. their template was deleted): retrying cannot help"""
+
+
+class Repository(ABC):
+    """Template and template data storage used by the routers.
+
+    Rows are plain dicts with the columns of the Supabase tables (`values`
+    and `fields` decoded from JSON). Templates being deleted by a background
+    job are hidden from every template read.
+    """
+
+    async def open(self) -> None:
+        """Prepare the storage before the app starts serving"""
+
+    async def close(self) -> None:
+        """Release connections on shutdown"""
+
+    # Templates
+
+    @abstractmethod
+    async def create_template(self, user_id: str, name: str, fields: list[dict], compact: bool = False) -> dict:
+        """Create a template; `compact` stores its data positionally (see app.compact)"""
+
+    @abstractmethod
+    async def list_templates(self, user_id: str) -> list[dict]:
+        ...
+
+    @abstractmethod
+    async def get_template(self, user_id: str, template_id: str) -> Optional[dict]:
+        """The user's template, or None when it does not exist or is not theirs"""
+
+    @abstractmethod
+    async def update_template(self, user_id: str, template_id: str, updates: dict[str, Any]) -> Optional[dict]:
+        ...
+
+    @abstractmethod
+    async def delete_template(self, user_id: str, template_id: str, force: bool) -> dict:
+        """Returns {"status": "deleted" | "not_found" | "has_data"}, or
+        {"status": "queued", "job_id": ...} when a template with data is force-deleted"""
+
+    @abstractmethod
+    async def template_has_data(self, template_id: str) -> bool:
+        ...
+
+    @abstractmethod
+    async def templates_summary(self, user_id: str) -> list[dict]:
+        """Every template of the user with its record count, totals and last entry date"""
+
+    # Template data
+
+    @abstractmethod
+    async def insert_data(self, template_id: str, user_id: str, values: dict[str, Any]) -> dict:
+        ...
+
+    @abstractmethod
+    async def insert_data_batch(self, rows: list[dict], ignore_duplicates: bool = False) -> None:
+        """Insert rows (template_id, user_id, values and optionally id and created_at)
+        without returning them; raises DataError when the database rejects them"""
+
+    @abstractmethod
+    async def get_data(self, user_id: str, template_id: str, data_id: str) -> Optional[dict]:
+        ...
+
+    @abstractmethod
+    async def update_data(self, user_id: str, template_id: str, data_id: str, values: dict[str, Any]) -> Optional[dict]:
+        ...
+
+    @abstractmethod
+    async def delete_data(self, user_id: str, template_id: str, data_id: str) -> Optional[dict]:
+        """Delete an entry and return it, or None when it was not found"""
+
+    @abstractmethod
+    async def list_data(
+        self,
+        user_id: str,
+        template_id: str,
+        limit: int,
+        cursor: Optional[str] = None,
+        fields: Optional[list[str]] = None,
+        filters: Optional[DataFilter] = None,
+        layout: Optional[list[str]] = None,
+    ) -> tuple[list[dict], Optional[str]]:
+        """One page of entries, newest first, and the cursor of the next page.
+        With `fields`, `values` only holds those keys; with `filters`, only
+        matching entries are returned. `layout` gives the field positions of a
+        compact template. Rows are returned as stored, except projected ones."""
+
+    @abstractmethod
+    async def aggregate_data(
+        self,
+        user_id: str,
+        template_id: str,
+        field: str,
+        group_by: Optional[str] = None,
+        bucket: Optional[str] = None,
+        filters: Optional[DataFilter] = None,
+        layout: Optional[list[str]] = None,
+    ) -> list[dict]:
+        """Rows of group_value, bucket, records, count, sum, avg, min and max of a numeric field,
+        over the entries matching `filters`"""
+
+    @abstractmethod
+    async def get_template_summary(self, user_id: str, template_id: str) -> dict:
+        """Record count and count/sum/min/max per numeric field, with updated_at"""
+
+    @abstractmethod
+    async def convert_template_values(
+        self,
+        template_id: str,
+        compact: bool,
+        after_id: Optional[str] = None,
+        chunk_size: int = 5000,
+    ) -> dict:
+        """Set the template's storage format and rewrite the next chunk of its rows (in id order
+        after `after_id`). Returns {"rows", "converted", "last_id"}; last_id is None once done."""
+
+    # ETag versions
+
+    @abstractmethod
+    async def fetch_versions(self, *keys: str) -> tuple[int, ...]:
+        """Current versions of the given keys (0 for keys never bumped)"""
+
+    # Background deletion jobs
+
+    @abstractmethod
+    async def get_deletion_job(self, user_id: str, template_id: str, job_id: str) -> Optional[dict]:
+        ...
+
+    @abstractmethod
+    async def claim_deletion_job(self, lease: int) -> Optional[dict]:
+        """Take the oldest unfinished job nobody holds a lease on"""
+
+    @abstractmethod
+    async def delete_data_chunk(self, job_id: str, chunk_size: int, lease: int) -> dict:
+        """Delete the next chunk of a job's rows and renew its lease; returns the job"""
+
+    @abstractmethod
+    async def record_job_error(self, job_id: str, error: str) -> None:
+        ...
@@ -0,0 +1,652 @@
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Iterator, Optional, TypeVar
+import asyncio
+import json
+import sqlite3
+import uuid
+
+from ..compact import compact_layout, decode_values, encode_values
+from ..filters import DataFilter
+from ..pagination import decode_cursor, encode_cursor
+from .base import DataError, Repository
+
+T = TypeVar("T")
+
+NUMERIC_FIELD_TYPES = ("int", "float")
+FILTER_SQL_OPERATORS = {"eq": "=", "lt": "<", "gt": ">"}
+
+# Same tables as in Supabase, with JSON stored as text and timestamps as ISO
+# 8601 text in UTC (which sorts chronologically). Versions are bumped by
+# triggers like in 20261017000500_resource_versions.sql; running totals are
+# computed on read from the (user_id, template_id) index instead of kept by triggers.
+SCHEMA = """
+create table if not exists templates (
+    id text primary key,
+    user_id text not null,
+    name text not null,
+    description text,
+    fields text not null,
+    compact integer not null default 0,
+    created_at text not null,
+    updated_at text not null,
+    deleted_at text
+);
+create index if not exists templates_user_idx on templates (user_id, created_at, id);
+
+create table if not exists template_data (
+    id text primary key,
+    template_id text not null references templates (id),
+    user_id text not null,
+    "values" text not null,
+    created_at text not null,
+    updated_at text not null
+);
+-- Keyset pagination, newest first, and the last entry of a template
+create index if not exists template_data_keyset_idx
+    on template_data (user_id, template_id, created_at desc, id desc);
+-- Id range chunks of deletion jobs
+create index if not exists template_data_template_id_idx on template_data (template_id, id);
+
+create table if not exists resource_versions (
+    key text primary key,
+    version integer not null
+);
+
+create trigger if not exists templates_versions_insert after insert on templates begin
+    insert into resource_versions (key, version) values ('templates:' || new.user_id, 1)
+    on conflict (key) do update set version = version + 1;
+end;
+create trigger if not exists templates_versions_update after update on templates begin
+    insert into resource_versions (key, version) values ('templates:' || new.user_id, 1)
+    on conflict (key) do update set version = version + 1;
+end;
+create trigger if not exists templates_versions_delete after delete on templates begin
+    insert into resource_versions (key, version) values ('templates:' || old.user_id, 1)
+    on conflict (key) do update set version = version + 1;
+end;
+create trigger if not exists template_data_versions_insert after insert on template_data begin
+    insert into resource_versions (key, version)
+    values ('template_data:' || new.template_id, 1), ('user_data:' || new.user_id, 1)
+    on conflict (key) do update set version = version + 1;
+end;
+create trigger if not exists template_data_versions_update after update on template_data begin
+    insert into resource_versions (key, version)
+    values ('template_data:' || new.template_id, 1), ('user_data:' || new.user_id, 1)
+    on conflict (key) do update set version = version + 1;
+end;
+create trigger if not exists template_data_versions_delete after delete on template_data begin
+    insert into resource_versions (key, version)
+    values ('template_data:' || old.template_id, 1), ('user_data:' || old.user_id, 1)
+    on conflict (key) do update set version = version + 1;
+end;
+
+create table if not exists template_deletion_jobs (
+    id text primary key,
+    template_id text not null,
+    user_id text not null,
+    status text not null default 'pending',
+    total_rows integer not null default 0,
+    deleted_rows integer not null default 0,
+    last_id text,
+    lease_until text,
+    error text,
+    created_at text not null,
+    updated_at text not null,
+    finished_at text
+);
+create index if not exists template_deletion_jobs_template_idx on template_deletion_jobs (template_id);
+create index if not exists template_deletion_jobs_unfinished_idx
+    on template_deletion_jobs (created_at)
+    where status <> 'done';
+"""
+
+DATA_COLUMNS = 'id, template_id, user_id, "values", created_at, updated_at'
+# Columns returned with a projection of `values`, as with projection_select
+PROJECTED_COLUMNS = 'id, template_id, user_id, "values", created_at'
+
+
+def utcnow(delta: float = 0) -> str:
+    return (datetime.now(timezone.utc) + timedelta(seconds=delta)).isoformat(timespec="microseconds")
+
+
+def timestamp(value: str) -> str:
+    """Same format as utcnow, so that timestamps sort as text"""
+    return datetime.fromisoformat(value).astimezone(timezone.utc).isoformat(timespec="microseconds")
+
+
+def json_path(name: str) -> str:
+    return "$." + json.dumps(name)
+
+
+def sql_string(value: str) -> str:
+    return "'" + value.replace("'", "''") + "'"
+
+
+def path_sql(name: str, layout: Optional[list[str]] = None) -> str:
+    """JSON path of a field in `values`. With a compact layout, rows may be
+    arrays or objects (not converted yet), so the path depends on the row."""
+    path = sql_string(json_path(name))
+    if layout is None:
+        return path
+    return f"""(case json_type("values") when 'array' then '$[{layout.index(name) + 1}]' else {path} end)"""
+
+
+def number_sql(name: str, layout: Optional[list[str]] = None) -> str:
+    """Numeric value of a field of `values`, like public.template_data_number"""
+    path = path_sql(name, layout)
+    return (
+        f'case json_type("values", {path}) '
+        f"when 'integer' then \"values\" ->> {path} "
+        f"when 'real' then \"values\" ->> {path} end"
+    )
+
+
+def group_sql(name: str, layout: Optional[list[str]] = None) -> str:
+    """Text of a field of `values`, like the Postgres `->>` operator"""
+    path = path_sql(name, layout)
+    return (
+        f'case json_type("values", {path}) '
+        f"when 'text' then \"values\" ->> {path} "
+        f"when 'null' then null "
+        f"else \"values\" -> {path} end"
+    )
+
+
+def date_trunc(bucket: Optional[str], timestamp: str) -> Optional[str]:
+    """Start of the hour/day/week/month/year of a timestamp, like Postgres date_trunc in UTC"""
+    if bucket is None:
+        return None
+    moment = datetime.fromisoformat(timestamp).astimezone(timezone.utc)
+    if bucket == "hour":
+        moment = moment.replace(minute=0, second=0, microsecond=0)
+    else:
+        moment = moment.replace(hour=0, minute=0, second=0, microsecond=0)
+        if bucket == "week":
+            moment -= timedelta(days=moment.weekday())
+        elif bucket == "month":
+            moment = moment.replace(day=1)
+        elif bucket == "year":
+            moment = moment.replace(month=1, day=1)
+    return moment.isoformat()
+
+
+def filter_sql(filters: DataFilter, layout: Optional[list[str]] = None) -> tuple[str, list[Any]]:
+    """SQL conditions (each starting with `and`) and parameters of a DataFilter,
+    with the semantics of the PostgREST filters: values only match filters of their JSON type"""
+    conditions, params = [], []
+    if filters.created_after is not None:
+        conditions.append("created_at >= ?")
+        params.append(timestamp(filters.created_after))
+    if filters.created_before is not None:
+        conditions.append("created_at < ?")
+        params.append(timestamp(filters.created_before))
+    for f in filters.fields:
+        path = path_sql(f.field, layout)
+        values = list(f.value) if f.op == "in" else [f.value]
+        if f.type == "boolean":
+            # SQLite reads JSON booleans as 1 and 0: compare their JSON type instead
+            conditions.append(f'json_type("values", {path}) in ({", ".join("?" * len(values))})')
+            params += ["true" if value else "false" for value in values]
+            continue
+        json_types = "'integer', 'real'" if f.type in NUMERIC_FIELD_TYPES else "'text'"
+        if f.op == "in":
+            comparison = f'in ({", ".join("?" * len(values))})'
+        else:
+            comparison = f"{FILTER_SQL_OPERATORS[f.op]} ?"
+        conditions.append(f'json_type("values", {path}) in ({json_types}) and "values" ->> {path} {comparison}')
+        params += values
+    return "".join(f" and ({condition})" for condition in conditions), params
+
+
+def _template(row: sqlite3.Row) -> dict:
+    template = dict(row)
+    template["fields"] = json.loads(template["fields"])
+    template["compact"] = bool(template["compact"])
+    return template
+
+
+def _data(row: sqlite3.Row, fields: Optional[list[str]] = None, layout: Optional[list[str]] = None) -> dict:
+    """A template_data row; values are returned as stored, unless projected on `fields`"""
+    data = dict(row)
+    values = json.loads(data["values"])
+    if fields is not None:
+        if isinstance(values, list):
+            # Compact rows hold null for missing values
+            values = {name: value for name, value in zip(layout or [], values[1:]) if value is not None}
+        values = {name: values[name] for name in fields if name in values}
+    data["values"] = values
+    return data
+
+
+class SQLiteRepository(Repository):
+    """Storage in an embedded SQLite database (a file, or ":memory:").
+
+    For single-tenant edge deployments and for benchmarks without the network.
+    All queries run on one connection, in a dedicated thread so the event loop
+    never blocks on the database. Several processes can share a file (WAL mode).
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._db: Optional[sqlite3.Connection] = None
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="sqlite")
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._db is None:
+            db = sqlite3.connect(self.path, isolation_level=None, check_same_thread=False)
+            db.row_factory = sqlite3.Row
+            db.execute("pragma journal_mode = wal")
+            db.execute("pragma synchronous = normal")
+            db.execute("pragma foreign_keys = on")
+            db.execute("pragma busy_timeout = 5000")
+            db.create_function("date_trunc", 2, date_trunc, deterministic=True)
+            db.executescript(SCHEMA)
+            self._db = db
+        return self._db
+
+    async def _run(self, function: Callable[..., T], *args: Any) -> T:
+        def call() -> T:
+            return function(self._connection(), *args)
+        return await asyncio.get_running_loop().run_in_executor(self._executor, call)
+
+    @staticmethod
+    @contextmanager
+    def _transaction(db: sqlite3.Connection) -> Iterator[None]:
+        # Write lock taken up front, so concurrent processes wait instead of failing
+        db.execute("begin immediate")
+        try:
+            yield
+        except BaseException:
+            db.execute("rollback")
+            raise
+        db.execute("commit")
+
+    async def open(self) -> None:
+        await self._run(lambda db: None)
+
+    async def close(self) -> None:
+        def close(db: sqlite3.Connection) -> None:
+            db.close()
+            self._db = None
+        if self._db is not None:
+            await self._run(close)
+        self._executor.shutdown(wait=False)
+
+    # Templates
+
+    async def create_template(self, user_id: str, name: str, fields: list[dict], compact: bool = False) -> dict:
+        def create(db: sqlite3.Connection) -> dict:
+            now = utcnow()
+            row = db.execute(
+                "insert into templates (id, user_id, name, fields, compact, created_at, updated_at) values (?, ?, ?, ?, ?, ?, ?) returning *",
+                (str(uuid.uuid4()), user_id, name, json.dumps(fields), compact, now, now),
+            ).fetchone()
+            return _template(row)
+        return await self._run(create)
+
+    async def list_templates(self, user_id: str) -> list[dict]:
+        def list_(db: sqlite3.Connection) -> list[dict]:
+            rows = db.execute(
+                "select * from templates where user_id = ? and deleted_at is null order by created_at, id", (user_id,)
+            ).fetchall()
+            return [_template(row) for row in rows]
+        return await self._run(list_)
+
+    async def get_template(self, user_id: str, template_id: str) -> Optional[dict]:
+        def get(db: sqlite3.Connection) -> Optional[dict]:
+            row = db.execute(
+                "select * from templates where id = ? and user_id = ? and deleted_at is null", (template_id, user_id)
+            ).fetchone()
+            return _template(row) if row else None
+        return await self._run(get)
+
+    async def update_template(self, user_id: str, template_id: str, updates: dict[str, Any]) -> Optional[dict]:
+        def update(db: sqlite3.Connection) -> Optional[dict]:
+            columns = {name: json.dumps(value) if name == "fields" else value for name, value in updates.items()}
+            columns["updated_at"] = utcnow()
+            assignments = ", ".join(f"{name} = ?" for name in columns)
+            row = db.execute(
+                f"update templates set {assignments} where id = ? and user_id = ? returning *",
+                (*columns.values(), template_id, user_id),
+            ).fetchone()
+            return _template(row) if row else None
+        return await self._run(update)
+
+    async def delete_template(self, user_id: str, template_id: str, force: bool) -> dict:
+        def delete(db: sqlite3.Connection) -> dict:
+            with self._transaction(db):
+                found = db.execute(
+                    "select 1 from templates where id = ? and user_id = ? and deleted_at is null", (template_id, user_id)
+                ).fetchone()
+                if not found:
+                    return {"status": "not_found"}
+                if not db.execute("select 1 from template_data where template_id = ? limit 1", (template_id,)).fetchone():
+                    db.execute("delete from templates where id = ?", (template_id,))
+                    return {"status": "deleted"}
+                if not force:
+                    return {"status": "has_data"}
+
+                # Hidden now, its data is deleted in chunks by a background job
+                now = utcnow()
+                db.execute("update templates set deleted_at = ? where id = ?", (now, template_id))
+                (total_rows,) = db.execute(
+                    "select count(*) from template_data where user_id = ? and template_id = ?", (user_id, template_id)
+                ).fetchone()
+                job_id = str(uuid.uuid4())
+                db.execute(
+                    "insert into template_deletion_jobs (id, template_id, user_id, total_rows, created_at, updated_at) values (?, ?, ?, ?, ?, ?)",
+                    (job_id, template_id, user_id, total_rows, now, now),
+                )
+                return {"status": "queued", "job_id": job_id}
+        return await self._run(delete)
+
+    async def template_has_data(self, template_id: str) -> bool:
+        def has_data(db: sqlite3.Connection) -> bool:
+            return db.execute("select 1 from template_data where template_id = ? limit 1", (template_id,)).fetchone() is not None
+        return await self._run(has_data)
+
+    async def templates_summary(self, user_id: str) -> list[dict]:
+        def summary(db: sqlite3.Connection) -> list[dict]:
+            overview = []
+            for row in db.execute(
+                "select * from templates where user_id = ? and deleted_at is null order by created_at, id", (user_id,)
+            ).fetchall():
+                template = _template(row)
+                totals = self._summary(db, user_id, template)
+                (last_entry_at,) = db.execute(
+                    "select max(created_at) from template_data where user_id = ? and template_id = ?", (user_id, template["id"])
+                ).fetchone()
+                overview.append({
+                    "template_id": template["id"],
+                    "name": template["name"],
+                    "fields": template["fields"],
+                    "record_count": totals["record_count"],
+                    "totals": totals["fields"],
+                    "last_entry_at": last_entry_at,
+                })
+            return overview
+        return await self._run(summary)
+
+    # Template data
+
+    async def insert_data(self, template_id: str, user_id: str, values: dict[str, Any]) -> dict:
+        def insert(db: sqlite3.Connection) -> dict:
+            now = utcnow()
+            row = db.execute(
+                f'insert into template_data ({DATA_COLUMNS}) values (?, ?, ?, ?, ?, ?) returning *',
+                (str(uuid.uuid4()), template_id, user_id, json.dumps(values), now, now),
+            ).fetchone()
+            return _data(row)
+        return await self._run(insert)
+
+    async def insert_data_batch(self, rows: list[dict], ignore_duplicates: bool = False) -> None:
+        def insert(db: sqlite3.Connection) -> None:
+            now = utcnow()
+            verb = "insert or ignore" if ignore_duplicates else "insert"
+            try:
+                with self._transaction(db):
+                    db.executemany(
+                        f"{verb} into template_data ({DATA_COLUMNS}) values (?, ?, ?, ?, ?, ?)",
+                        [
+                            (
+                                row.get("id") or str(uuid.uuid4()),
+                                row["template_id"],
+                                row["user_id"],
+                                json.dumps(row["values"]),
+                                timestamp(row["created_at"]) if row.get("created_at") else now,
+                                timestamp(row["created_at"]) if row.get("created_at") else now,
+                            )
+                            for row in rows
+                        ],
+                    )
+            except sqlite3.IntegrityError as e:
+                raise DataError(str(e)) from e
+        await self._run(insert)
+
+    async def get_data(self, user_id: str, template_id: str, data_id: str) -> Optional[dict]:
+        def get(db: sqlite3.Connection) -> Optional[dict]:
+            row = db.execute(
+                f"select {DATA_COLUMNS} from template_data where id = ? and template_id = ? and user_id = ?",
+                (data_id, template_id, user_id),
+            ).fetchone()
+            return _data(row) if row else None
+        return await self._run(get)
+
+    async def update_data(self, user_id: str, template_id: str, data_id: str, values: dict[str, Any]) -> Optional[dict]:
+        def update(db: sqlite3.Connection) -> Optional[dict]:
+            row = db.execute(
+                f'update template_data set "values" = ?, updated_at = ? where id = ? and template_id = ? and user_id = ? returning {DATA_COLUMNS}',
+                (json.dumps(values), utcnow(), data_id, template_id, user_id),
+            ).fetchone()
+            return _data(row) if row else None
+        return await self._run(update)
+
+    async def delete_data(self, user_id: str, template_id: str, data_id: str) -> Optional[dict]:
+        def delete(db: sqlite3.Connection) -> Optional[dict]:
+            row = db.execute(
+                f"delete from template_data where id = ? and template_id = ? and user_id = ? returning {DATA_COLUMNS}",
+                (data_id, template_id, user_id),
+            ).fetchone()
+            return _data(row) if row else None
+        return await self._run(delete)
+
+    async def list_data(
+        self,
+        user_id: str,
+        template_id: str,
+        limit: int,
+        cursor: Optional[str] = None,
+        fields: Optional[list[str]] = None,
+        filters: Optional[DataFilter] = None,
+        layout: Optional[list[str]] = None,
+    ) -> tuple[list[dict], Optional[str]]:
+        def list_(db: sqlite3.Connection) -> tuple[list[dict], Optional[str]]:
+            columns = PROJECTED_COLUMNS if fields is not None else DATA_COLUMNS
+            query = f"select {columns} from template_data where user_id = ? and template_id = ?"
+            params: list[Any] = [user_id, template_id]
+            if filters is not None:
+                conditions, filter_params = filter_sql(filters, layout)
+                query += conditions
+                params += filter_params
+            # Keyset pagination on (created_at, id)
+            if cursor:
+                created_at, row_id = decode_cursor(cursor)
+                query += " and (created_at < ? or (created_at = ? and id < ?))"
+                params += [created_at, created_at, row_id]
+            # One extra row tells whether there is a next page
+            query += " order by created_at desc, id desc limit ?"
+            params.append(limit + 1)
+            rows = [_data(row, fields, layout) for row in db.execute(query, params).fetchall()]
+            if len(rows) > limit:
+                rows = rows[:limit]
+                return rows, encode_cursor(rows[-1])
+            return rows, None
+        return await self._run(list_)
+
+    async def aggregate_data(
+        self,
+        user_id: str,
+        template_id: str,
+        field: str,
+        group_by: Optional[str] = None,
+        bucket: Optional[str] = None,
+        filters: Optional[DataFilter] = None,
+        layout: Optional[list[str]] = None,
+    ) -> list[dict]:
+        def aggregate(db: sqlite3.Connection) -> list[dict]:
+            group_value = group_sql(group_by, layout) if group_by is not None else "null"
+            bucket_value = "date_trunc(?, created_at)" if bucket is not None else "?"
+            conditions, filter_params = filter_sql(filters, layout) if filters is not None else ("", [])
+            rows = db.execute(
+                f"""
+                select
+                    group_value,
+                    bucket,
+                    count(*) as records,
+                    count(value) as count,
+                    sum(value) as sum,
+                    avg(value) as avg,
+                    min(value) as min,
+                    max(value) as max
+                from (
+                    select {group_value} as group_value, {bucket_value} as bucket, {number_sql(field, layout)} as value
+                    from template_data
+                    where user_id = ? and template_id = ?{conditions}
+                )
+                group by 1, 2
+                order by 2, 1
+                """,
+                (bucket, user_id, template_id, *filter_params),
+            ).fetchall()
+            return [dict(row) for row in rows]
+        return await self._run(aggregate)
+
+    def _summary(self, db: sqlite3.Connection, user_id: str, template: dict) -> dict:
+        numeric = [field["name"] for field in template["fields"] if field["type"] in NUMERIC_FIELD_TYPES]
+        layout = compact_layout(template)
+        values = ", ".join(["updated_at"] + [f"{number_sql(name, layout)} as v{i}" for i, name in enumerate(numeric)])
+        totals = ", ".join(["count(*)", "max(updated_at)"] + [f"count(v{i}), sum(v{i}), min(v{i}), max(v{i})" for i in range(len(numeric))])
+        row = db.execute(
+            f"select {totals} from (select {values} from template_data where user_id = ? and template_id = ?)",
+            (user_id, template["id"]),
+        ).fetchone()
+        fields = {}
+        for i, name in enumerate(numeric):
+            count, total, minimum, maximum = row[2 + 4 * i:6 + 4 * i]
+            if count:
+                fields[name] = {"count": count, "sum": total, "min": minimum, "max": maximum}
+        return {"record_count": row[0], "fields": fields, "updated_at": row[1]}
+
+    async def get_template_summary(self, user_id: str, template_id: str) -> dict:
+        def summary(db: sqlite3.Connection) -> dict:
+            row = db.execute("select * from templates where id = ? and user_id = ?", (template_id, user_id)).fetchone()
+            if row is None:
+                return {"record_count": 0, "fields": {}, "updated_at": None}
+            return self._summary(db, user_id, _template(row))
+        return await self._run(summary)
+
+    async def convert_template_values(
+        self,
+        template_id: str,
+        compact: bool,
+        after_id: Optional[str] = None,
+        chunk_size: int = 5000,
+    ) -> dict:
+        def convert(db: sqlite3.Connection) -> dict:
+            with self._transaction(db):
+                row = db.execute(
+                    "update templates set compact = ?, updated_at = ? where id = ? returning *",
+                    (compact, utcnow(), template_id),
+                ).fetchone()
+                if row is None:
+                    return {"rows": 0, "converted": 0, "last_id": None}
+                template = _template(row)
+                rows = db.execute(
+                    'select id, "values" from template_data where template_id = ? and id > ? order by id limit ?',
+                    (template_id, after_id or "", chunk_size),
+                ).fetchall()
+                updates = []
+                for data_id, stored in rows:
+                    values = json.loads(stored)
+                    if isinstance(values, list) != compact:
+                        updates.append((json.dumps(encode_values(template, decode_values(template, values))), data_id))
+                db.executemany('update template_data set "values" = ? where id = ?', updates)
+            return {
+                "rows": len(rows),
+                "converted": len(updates),
+                "last_id": rows[-1]["id"] if len(rows) == chunk_size else None,
+            }
+        return await self._run(convert)
+
+    # ETag versions
+
+    async def fetch_versions(self, *keys: str) -> tuple[int, ...]:
+        def fetch(db: sqlite3.Connection) -> tuple[int, ...]:
+            placeholders = ", ".join("?" * len(keys))
+            versions = dict(db.execute(f"select key, version from resource_versions where key in ({placeholders})", keys).fetchall())
+            return tuple(versions.get(key, 0) for key in keys)
+        return await self._run(fetch)
+
+    # Background deletion jobs
+
+    async def get_deletion_job(self, user_id: str, template_id: str, job_id: str) -> Optional[dict]:
+        def get(db: sqlite3.Connection) -> Optional[dict]:
+            row = db.execute(
+                "select * from template_deletion_jobs where id = ? and template_id = ? and user_id = ?",
+                (job_id, template_id, user_id),
+            ).fetchone()
+            return dict(row) if row else None
+        return await self._run(get)
+
+    async def claim_deletion_job(self, lease: int) -> Optional[dict]:
+        def claim(db: sqlite3.Connection) -> Optional[dict]:
+            with self._transaction(db):
+                row = db.execute(
+                    """
+                    select id from template_deletion_jobs
+                    where status <> 'done' and (lease_until is null or lease_until < ?)
+                    order by created_at
+                    limit 1
+                    """,
+                    (utcnow(),),
+                ).fetchone()
+                if row is None:
+                    return None
+                job = db.execute(
+                    "update template_deletion_jobs set status = 'running', lease_until = ?, updated_at = ? where id = ? returning *",
+                    (utcnow(lease), utcnow(), row["id"]),
+                ).fetchone()
+                return dict(job)
+        return await self._run(claim)
+
+    async def delete_data_chunk(self, job_id: str, chunk_size: int, lease: int) -> dict:
+        def delete_chunk(db: sqlite3.Connection) -> dict:
+            with self._transaction(db):
+                job = db.execute("select * from template_deletion_jobs where id = ?", (job_id,)).fetchone()
+                if job is None or job["status"] == "done":
+                    return dict(job) if job else None
+                template_id, last_id = job["template_id"], job["last_id"] or ""
+                # Upper bound of the next id range, from the (template_id, id) index
+                (range_end,) = db.execute(
+                    "select max(id) from (select id from template_data where template_id = ? and id > ? order by id limit ?)",
+                    (template_id, last_id, chunk_size),
+                ).fetchone()
+                if range_end is not None:
+                    deleted = db.execute(
+                        "delete from template_data where template_id = ? and id > ? and id <= ?",
+                        (template_id, last_id, range_end),
+                    ).rowcount
+                    job = db.execute(
+                        """
+                        update template_deletion_jobs
+                        set deleted_rows = deleted_rows + ?, last_id = ?, lease_until = ?, error = null, updated_at = ?
+                        where id = ? returning *
+                        """,
+                        (deleted, range_end, utcnow(lease), utcnow(), job_id),
+                    ).fetchone()
+                elif db.execute("select 1 from template_data where template_id = ? limit 1", (template_id,)).fetchone():
+                    # Rows written behind the resume point while the job ran: start over
+                    job = db.execute(
+                        "update template_deletion_jobs set last_id = null, lease_until = ?, updated_at = ? where id = ? returning *",
+                        (utcnow(lease), utcnow(), job_id),
+                    ).fetchone()
+                else:
+                    db.execute("delete from templates where id = ?", (template_id,))
+                    now = utcnow()
+                    job = db.execute(
+                        """
+                        update template_deletion_jobs
+                        set status = 'done', lease_until = null, error = null, updated_at = ?, finished_at = ?
+                        where id = ? returning *
+                        """,
+                        (now, now, job_id),
+                    ).fetchone()
+                return dict(job)
+        return await self._run(delete_chunk)
+
+    async def record_job_error(self, job_id: str, error: str) -> None:
+        def record(db: sqlite3.Connection) -> None:
+            db.execute("update template_deletion_jobs set error = ? where id = ?", (error, job_id))
+        await self._run(record)
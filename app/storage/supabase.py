@@ -0,0 +1,284 @@
+from typing import Any, Optional
+import json
+
+from postgrest import AsyncSelectRequestBuilder, ReturnMethod
+from postgrest.exceptions import APIError
+from supabase import AsyncClient
+
+from ..filters import DataFilter, FieldFilter
+from ..pagination import encode_cursor, json_key, keyset_filter, projection_select, unproject, value_path
+from .base import DataError, Repository
+
+# jsonb sorts strings below numbers and booleans above them: ranges on numeric
+# fields get the opposite bound too, so that only JSON numbers match
+JSON_NUMBER_MIN = "-1e1000"
+JSON_NUMBER_MAX = "1e1000"
+
+
+def is_data_error(error: APIError) -> bool:
+    """Errors that retrying cannot fix: data exceptions and integrity violations (SQLSTATE 22xxx / 23xxx)"""
+    return str(error.code or "")[:2] in ("22", "23")
+
+
+def quote(value: Any) -> str:
+    """Value inside a PostgREST logic tree or `in` list, in double quotes"""
+    return '"' + str(value).replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+
+def field_conditions(f: FieldFilter, path: str) -> list[tuple[str, str, str]]:
+    """(column, operator, criteria) PostgREST filters for a field filter, with the field read at `path`"""
+    if f.type == "string" or f.type == "date":
+        # Text comparisons; dates are ISO strings, so they sort chronologically
+        column = f"values->>{path}"
+        if f.op == "in":
+            return [(column, "in", "(" + ",".join(quote(value) for value in f.value) + ")")]
+        return [(column, f.op, f.value)]
+    column = f"values->{path}"
+    if f.op == "in":
+        return [(column, "in", "(" + ",".join(quote(json.dumps(value)) for value in f.value) + ")")]
+    if f.op == "eq":
+        return [(column, "eq", json.dumps(f.value))]
+    bound = ("gt", JSON_NUMBER_MIN) if f.op == "lt" else ("lt", JSON_NUMBER_MAX)
+    return [(column, f.op, json.dumps(f.value)), (column, *bound)]
+
+
+def apply_filters(
+    query: AsyncSelectRequestBuilder,
+    filters: DataFilter,
+    layout: Optional[list[str]] = None,
+) -> AsyncSelectRequestBuilder:
+    """Add a DataFilter to a template_data query as PostgREST filters"""
+    if filters.created_after is not None:
+        query = query.gte("created_at", filters.created_after)
+    if filters.created_before is not None:
+        query = query.lt("created_at", filters.created_before)
+    for f in filters.fields:
+        if layout is not None:
+            # Rows of a compact template are arrays, or objects not converted yet
+            branches = [
+                "and(" + ",".join(
+                    f"{column}.{op}.{criteria if op == 'in' else quote(criteria)}"
+                    for column, op, criteria in field_conditions(f, path)
+                ) + ")"
+                for path in (json_key(f.field), value_path(f.field, layout))
+            ]
+            query = query.or_(",".join(branches))
+        elif f.op == "eq":
+            # Containment is answered from the GIN index on `values`
+            query = query.contains("values", {f.field: f.value})
+        else:
+            for column, op, criteria in field_conditions(f, json_key(f.field)):
+                query = query.filter(column, op, criteria)
+    return query
+
+
+def filters_param(filters: DataFilter) -> list[dict]:
+    """Field filters as the `p_filters` argument of public.template_data_matches"""
+    return [
+        {"field": f.field, "op": f.op, "value": list(f.value) if f.op == "in" else f.value}
+        for f in filters.fields
+    ]
+
+
+class SupabaseRepository(Repository):
+    """Storage in the Supabase Postgres database, through PostgREST.
+
+    Summaries, versions and deletion jobs are maintained by the triggers and
+    functions in `supabase/migrations`.
+    """
+
+    def __init__(self, supabase: AsyncClient):
+        self.supabase = supabase
+
+    # Templates
+
+    async def create_template(self, user_id: str, name: str, fields: list[dict], compact: bool = False) -> dict:
+        template = {
+            "name": name,
+            "user_id": user_id,
+            "fields": fields,
+        }
+        if compact:
+            template["compact"] = True
+        result = await self.supabase.table("templates").insert(template).execute()
+        return result.data[0]
+
+    async def list_templates(self, user_id: str) -> list[dict]:
+        result = await self.supabase.table("templates").select("*").eq("user_id", user_id).is_("deleted_at", "null").execute()
+        return result.data
+
+    async def get_template(self, user_id: str, template_id: str) -> Optional[dict]:
+        result = await self.supabase.table("templates").select("*").eq("id", template_id).eq("user_id", user_id).is_("deleted_at", "null").maybe_single().execute()
+        if result is None or not result.data:
+            return None
+        return result.data
+
+    async def update_template(self, user_id: str, template_id: str, updates: dict[str, Any]) -> Optional[dict]:
+        result = await self.supabase.table("templates").update(updates).eq("id", template_id).eq("user_id", user_id).execute()
+        return result.data[0] if result.data else None
+
+    async def delete_template(self, user_id: str, template_id: str, force: bool) -> dict:
+        # Check, deletion (or hiding, with the data left to a job) in a single call
+        result = await self.supabase.rpc("delete_template", {
+            "p_template_id": template_id,
+            "p_user_id": user_id,
+            "p_force": force,
+        }).execute()
+        return result.data
+
+    async def template_has_data(self, template_id: str) -> bool:
+        result = await self.supabase.table("template_data").select("id").eq("template_id", template_id).limit(1).execute()
+        return bool(result.data)
+
+    async def templates_summary(self, user_id: str) -> list[dict]:
+        result = await self.supabase.rpc("user_templates_summary", {"p_user_id": user_id}).execute()
+        return result.data or []
+
+    # Template data
+
+    async def insert_data(self, template_id: str, user_id: str, values: dict[str, Any]) -> dict:
+        result = await self.supabase.table("template_data").insert({
+            "template_id": template_id,
+            "user_id": user_id,
+            "values": values,
+        }).execute()
+        return result.data[0]
+
+    async def insert_data_batch(self, rows: list[dict], ignore_duplicates: bool = False) -> None:
+        try:
+            if ignore_duplicates:
+                await self.supabase.table("template_data").upsert(
+                    rows,
+                    ignore_duplicates=True,
+                    returning=ReturnMethod.minimal,
+                ).execute()
+            else:
+                await self.supabase.table("template_data").insert(rows, returning=ReturnMethod.minimal).execute()
+        except APIError as e:
+            if is_data_error(e):
+                raise DataError(e.message) from e
+            raise
+
+    async def get_data(self, user_id: str, template_id: str, data_id: str) -> Optional[dict]:
+        result = await self.supabase.table("template_data").select("*").eq("id", data_id).eq("template_id", template_id).eq("user_id", user_id).maybe_single().execute()
+        if result is None or not result.data:
+            return None
+        return result.data
+
+    async def update_data(self, user_id: str, template_id: str, data_id: str, values: dict[str, Any]) -> Optional[dict]:
+        # The filter only matches an existing entry owned by the user
+        result = await self.supabase.table("template_data").update({
+            "values": values
+        }).eq("id", data_id).eq("template_id", template_id).eq("user_id", user_id).execute()
+        return result.data[0] if result.data else None
+
+    async def delete_data(self, user_id: str, template_id: str, data_id: str) -> Optional[dict]:
+        result = await self.supabase.table("template_data").delete().eq("id", data_id).eq("template_id", template_id).eq("user_id", user_id).execute()
+        return result.data[0] if result.data else None
+
+    async def list_data(
+        self,
+        user_id: str,
+        template_id: str,
+        limit: int,
+        cursor: Optional[str] = None,
+        fields: Optional[list[str]] = None,
+        filters: Optional[DataFilter] = None,
+        layout: Optional[list[str]] = None,
+    ) -> tuple[list[dict], Optional[str]]:
+        select = projection_select(fields, layout) if fields is not None else "*"
+        query = self.supabase.table("template_data").select(select).eq("template_id", template_id).eq("user_id", user_id)
+        if filters is not None:
+            query = apply_filters(query, filters, layout)
+
+        # Keyset pagination on (created_at, id)
+        if cursor:
+            query = query.or_(keyset_filter(cursor))
+
+        # Fetch one extra row to know whether there is a next page
+        result = await query.order("created_at", desc=True).order("id", desc=True).limit(limit + 1).execute()
+        rows = result.data
+        if fields is not None:
+            rows = [unproject(row, fields) for row in rows]
+
+        if len(rows) > limit:
+            rows = rows[:limit]
+            return rows, encode_cursor(rows[-1])
+        return rows, None
+
+    async def aggregate_data(
+        self,
+        user_id: str,
+        template_id: str,
+        field: str,
+        group_by: Optional[str] = None,
+        bucket: Optional[str] = None,
+        filters: Optional[DataFilter] = None,
+        layout: Optional[list[str]] = None,
+    ) -> list[dict]:
+        # Compact rows are decoded by the function itself
+        params = {
+            "p_template_id": template_id,
+            "p_user_id": user_id,
+            "p_field": field,
+            "p_group_by": group_by,
+            "p_bucket": bucket,
+        }
+        if filters is not None:
+            params["p_created_after"] = filters.created_after
+            params["p_created_before"] = filters.created_before
+            params["p_filters"] = filters_param(filters)
+        result = await self.supabase.rpc("aggregate_template_data", params).execute()
+        return result.data or []
+
+    async def get_template_summary(self, user_id: str, template_id: str) -> dict:
+        # Running totals maintained by database triggers
+        result = await self.supabase.table("template_summaries").select("record_count,fields,updated_at").eq("template_id", template_id).eq("user_id", user_id).maybe_single().execute()
+        if result is None or not result.data:
+            return {"record_count": 0, "fields": {}, "updated_at": None}
+        return result.data
+
+    async def convert_template_values(
+        self,
+        template_id: str,
+        compact: bool,
+        after_id: Optional[str] = None,
+        chunk_size: int = 5000,
+    ) -> dict:
+        result = await self.supabase.rpc("convert_template_values", {
+            "p_template_id": template_id,
+            "p_compact": compact,
+            "p_after_id": after_id,
+            "p_chunk_size": chunk_size,
+        }).execute()
+        return result.data
+
+    # ETag versions
+
+    async def fetch_versions(self, *keys: str) -> tuple[int, ...]:
+        result = await self.supabase.table("resource_versions").select("key,version").in_("key", list(keys)).execute()
+        versions = {row["key"]: row["version"] for row in result.data}
+        return tuple(versions.get(key, 0) for key in keys)
+
+    # Background deletion jobs
+
+    async def get_deletion_job(self, user_id: str, template_id: str, job_id: str) -> Optional[dict]:
+        result = await self.supabase.table("template_deletion_jobs").select("*").eq("id", job_id).eq("template_id", template_id).eq("user_id", user_id).maybe_single().execute()
+        if result is None or not result.data:
+            return None
+        return result.data
+
+    async def claim_deletion_job(self, lease: int) -> Optional[dict]:
+        result = await self.supabase.rpc("claim_template_deletion_job", {"p_lease_seconds": lease}).execute()
+        return result.data or None
+
+    async def delete_data_chunk(self, job_id: str, chunk_size: int, lease: int) -> dict:
+        result = await self.supabase.rpc("delete_template_data_chunk", {
+            "p_job_id": job_id,
+            "p_chunk_size": chunk_size,
+            "p_lease_seconds": lease,
+        }).execute()
+        return result.data
+
+    async def record_job_error(self, job_id: str, error: str) -> None:
+        await self.supabase.table("template_deletion_jobs").update({"error": error}).eq("id", job_id).execute()
@@ -0,0 +1,146 @@
+from typing import Any, Dict
+import os
+
+from pydantic_core import SchemaValidator, ValidationError, core_schema
+
+from .cache import TTLCache
+from .profiling import timed
+
+# Compiled validators kept in memory, keyed by (template_id, version)
+VALIDATOR_CACHE_SIZE = int(os.environ.get("VALIDATOR_CACHE_SIZE", "1024"))
+
+# Dates are ISO strings in extended format (2025-05-01 or 2025-05-01T12:00:00):
+# they are stored as given, and only that form sorts chronologically as text.
+# The shape is matched and the calendar checked inside the compiled validator.
+_DATE_SCHEMA = core_schema.chain_schema([
+    core_schema.str_schema(strict=True, pattern=r"^[0-9]{4}-[0-9]{2}-[0-9]{2}(T|$)"),
+    core_schema.datetime_schema(),
+])
+_date_validator = SchemaValidator(_DATE_SCHEMA)
+
+
+def check_iso_date(text: str) -> str:
+    """Return an ISO date or date-time string unchanged, raising ValueError for anything else"""
+    try:
+        _date_validator.validate_python(text)
+    except ValidationError:
+        raise ValueError("Fecha inválida") from None
+    return text
+
+
+def _number_schema(schema: Any) -> core_schema.CoreSchema:
+    # Numbers, or strings holding a number. The choice is picked by the exact type
+    # of the value, so booleans (a subclass of int) match none and are rejected
+    lax = schema()
+    return core_schema.tagged_union_schema({int: lax, float: lax, str: lax}, discriminator=type)
+
+
+_FIELD_SCHEMAS = {
+    "string": core_schema.str_schema(strict=True),
+    "int": _number_schema(core_schema.int_schema),
+    "float": _number_schema(core_schema.float_schema),
+    "boolean": core_schema.bool_schema(strict=True),
+    "date": _DATE_SCHEMA,
+}
+
+# Text sources (e.g. CSV cells) also need booleans parsed from strings
+_TEXT_FIELD_SCHEMAS = {**_FIELD_SCHEMAS, "boolean": core_schema.bool_schema()}
+
+
+def _values_schema(field_types: Dict[str, str], schemas: dict) -> core_schema.CoreSchema:
+    return core_schema.typed_dict_schema(
+        {
+            name: core_schema.typed_dict_field(schemas.get(field_type, core_schema.any_schema()), required=False)
+            for name, field_type in field_types.items()
+        },
+        extra_behavior="forbid",
+        total=False,
+    )
+
+
+class TemplateValidator:
+    """Validator for the `values` of a template, compiled once into a pydantic-core schema"""
+
+    def __init__(self, fields: list[dict]):
+        self.field_types = {field["name"]: field["type"] for field in fields}
+        self._validator = SchemaValidator(_values_schema(self.field_types, _FIELD_SCHEMAS))
+        # Bulk-only validators are compiled on first use
+        self._batch_validator: SchemaValidator | None = None
+        self._text_validator: SchemaValidator | None = None
+
+    @timed("validation")
+    def validate(self, values: Dict[str, Any]) -> list[str]:
+        """Return the list of validation errors for the given values (empty if valid)"""
+        try:
+            self._validator.validate_python(values)
+            return []
+        except ValidationError as e:
+            return self._format_errors(e.errors())
+
+    @timed("validation")
+    def validate_many(self, rows: list[Dict[str, Any]]) -> list[list[str]]:
+        """Validate a batch of values in a single pass, returning the errors of each row"""
+        if self._batch_validator is None:
+            self._batch_validator = SchemaValidator(core_schema.list_schema(_values_schema(self.field_types, _FIELD_SCHEMAS)))
+        try:
+            self._batch_validator.validate_python(rows)
+            return [[] for _ in rows]
+        except ValidationError as e:
+            row_errors: Dict[int, list] = {}
+            for err in e.errors():
+                index, *loc = err["loc"]
+                row_errors.setdefault(index, []).append({**err, "loc": tuple(loc)})
+            return [self._format_errors(row_errors[i]) if i in row_errors else [] for i in range(len(rows))]
+
+    @timed("validation")
+    def coerce_text(self, values: Dict[str, str]) -> tuple[Dict[str, Any], list[str]]:
+        """Validate values given as text and convert them to their field types.
+
+        Dates are kept as the original ISO strings.
+        """
+        if self._text_validator is None:
+            self._text_validator = SchemaValidator(_values_schema(self.field_types, _TEXT_FIELD_SCHEMAS))
+        try:
+            typed = self._text_validator.validate_python(values)
+        except ValidationError as e:
+            return {}, self._format_errors(e.errors())
+        for name in typed:
+            if self.field_types[name] == "date":
+                typed[name] = values[name]
+        return typed, []
+
+    def _format_errors(self, errors: list[dict]) -> list[str]:
+        messages = []
+        seen = set()
+        for err in errors:
+            if not err["loc"]:
+                messages.append("Los valores deben ser un objeto")
+                continue
+            field_name = err["loc"][0]
+            if field_name in seen:
+                continue
+            seen.add(field_name)
+            if err["type"] == "extra_forbidden":
+                messages.append(f"El campo '{field_name}' no existe en el template")
+            else:
+                messages.append(f"El valor para el campo '{field_name}' no es del tipo esperado: {self.field_types[field_name]}")
+        return messages
+
+
+_validator_cache = TTLCache(VALIDATOR_CACHE_SIZE, float("inf"))
+
+
+def template_version(fields: list[dict]) -> int:
+    """Fingerprint of a template's field definitions, changes whenever the fields do"""
+    return hash(tuple((field["name"], field["type"]) for field in fields))
+
+
+def get_validator(template: dict) -> TemplateValidator:
+    """Get the compiled validator for a template, compiling it on first use"""
+    fields = template["fields"]
+    key = (template["id"], template_version(fields))
+    validator = _validator_cache.get(key)
+    if validator is None:
+        validator = TemplateValidator(fields)
+        _validator_cache.set(key, validator)
+    return validator
@@ -0,0 +1,266 @@
+from collections import deque
+from datetime import datetime, timezone
+from typing import Any, Optional
+import asyncio
+import fcntl
+import glob
+import json
+import logging
+import os
+import time
+import uuid
+
+from .singleflight import invalidate_reads
+from .storage import DataError, Repository
+
+logger = logging.getLogger(__name__)
+
+# Write-behind mode for single data entries: accepted right away, inserted in batches
+WRITE_BEHIND_ENABLED = os.environ.get("WRITE_BEHIND_ENABLED", "false").lower() == "true"
+WRITE_BEHIND_DIR = os.environ.get("WRITE_BEHIND_DIR", "write-behind")
+# A batch is inserted when it reaches this many rows, or after this many seconds
+WRITE_BEHIND_BATCH_SIZE = int(os.environ.get("WRITE_BEHIND_BATCH_SIZE", "500"))
+WRITE_BEHIND_FLUSH_INTERVAL = float(os.environ.get("WRITE_BEHIND_FLUSH_INTERVAL", "0.5"))
+# Back-pressure: new entries are refused while this many are waiting
+WRITE_BEHIND_MAX_PENDING = int(os.environ.get("WRITE_BEHIND_MAX_PENDING", "100000"))
+# fsync the journal on every entry (survives an OS crash, not only a process crash)
+WRITE_BEHIND_FSYNC = os.environ.get("WRITE_BEHIND_FSYNC", "false").lower() == "true"
+
+# Seconds to wait before retrying after Supabase could not be reached
+RETRY_DELAYS = (0.5, 1, 2, 5, 10)
+
+
+class QueueFull(Exception):
+    pass
+
+
+class Journal:
+    """Append-only file of accepted rows, with markers of how many were flushed.
+
+    Each line is {"row": {...}} or {"flushed": n}. Rows are flushed in the order
+    they were written, so the rows after the last marker are still pending. The
+    file is locked while its worker is alive; an unlocked journal belongs to a
+    worker that died and can be replayed.
+    """
+
+    def __init__(self, path: str, fsync: bool = False):
+        self.path = path
+        self.fsync = fsync
+        self.written = 0
+        self.flushed = 0
+        self._file = open(path, "ab")
+        fcntl.flock(self._file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+
+    def _write(self, entry: dict) -> None:
+        self._file.write(json.dumps(entry, separators=(",", ":")).encode() + b"\n")
+        self._file.flush()
+        if self.fsync:
+            os.fsync(self._file.fileno())
+
+    def append(self, row: dict) -> None:
+        self._write({"row": row})
+        self.written += 1
+
+    def mark_flushed(self, count: int) -> None:
+        self.flushed += count
+        self._write({"flushed": self.flushed})
+
+    def reset(self) -> None:
+        """Start over once every row has been flushed"""
+        self._file.truncate(0)
+        self.written = self.flushed = 0
+
+    def close(self, remove: bool = False) -> None:
+        if remove:
+            os.remove(self.path)
+        self._file.close()
+
+    @staticmethod
+    def read_pending(path: str) -> list[dict]:
+        rows, flushed = [], 0
+        with open(path, "rb") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # Last line cut short by a crash
+                    continue
+                if "row" in entry:
+                    rows.append(entry["row"])
+                else:
+                    flushed = entry["flushed"]
+        return rows[flushed:]
+
+
+class WriteBehindQueue:
+    """In-process queue of template data rows, journaled to disk and inserted in batches (group commit)"""
+
+    def __init__(self, directory: str, batch_size: int, interval: float, max_pending: int, fsync: bool = False):
+        self.directory = directory
+        self.batch_size = batch_size
+        self.interval = interval
+        self.max_pending = max_pending
+        self.fsync = fsync
+        self.pending: deque[dict] = deque()
+        self.accepted_total = 0
+        self.flushed_total = 0
+        self.rejected_total = 0
+        self.batches_total = 0
+        self.last_flush_at: Optional[float] = None
+        self.last_error: Optional[str] = None
+        self._repository: Optional[Repository] = None
+        self._journal: Optional[Journal] = None
+        self._task: Optional[asyncio.Task] = None
+        self._wakeup = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None
+
+    async def start(self, repository: Repository) -> None:
+        """Open this worker's journal, take over journals left by dead workers and start flushing"""
+        os.makedirs(self.directory, exist_ok=True)
+        self._repository = repository
+        path = os.path.join(self.directory, f"journal-{os.getpid()}-{uuid.uuid4().hex[:8]}.ndjson")
+        self._journal = Journal(path, self.fsync)
+        recovered = self.replay()
+        if recovered:
+            logger.info("Recovered %d unflushed data entries from previous journals", recovered)
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Flush what is left and close the journal (kept on disk if rows could not be flushed)"""
+        if self._task is None:
+            return
+        self._task.cancel()
+        self._task = None
+        try:
+            await self.flush()
+        except Exception as e:
+            logger.warning("Could not flush %d data entries on shutdown: %s", len(self.pending), e)
+        self._journal.close(remove=not self.pending)
+        self._journal = None
+
+    def replay(self) -> int:
+        """Move the pending rows of journals no live worker holds into this worker's queue"""
+        recovered = 0
+        for path in sorted(glob.glob(os.path.join(self.directory, "journal-*.ndjson"))):
+            if path == self._journal.path:
+                continue
+            try:
+                with open(path, "rb") as f:
+                    fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    for row in Journal.read_pending(path):
+                        self._enqueue(row)
+                        recovered += 1
+                    # Rows are now in this worker's journal
+                    os.remove(path)
+            except BlockingIOError:
+                continue
+            except FileNotFoundError:
+                continue
+        if recovered:
+            self._wakeup.set()
+        return recovered
+
+    def submit(self, template_id: str, user_id: str, values: dict[str, Any]) -> str:
+        """Accept a validated entry and return its id; it is inserted with the next batch"""
+        if len(self.pending) >= self.max_pending:
+            raise QueueFull()
+        row = {
+            "id": str(uuid.uuid4()),
+            "template_id": template_id,
+            "user_id": user_id,
+            "values": values,
+            "created_at": datetime.now(timezone.utc).isoformat(),
+        }
+        self._enqueue(row)
+        self.accepted_total += 1
+        if len(self.pending) >= self.batch_size:
+            self._wakeup.set()
+        return row["id"]
+
+    def _enqueue(self, row: dict) -> None:
+        self._journal.append(row)
+        self.pending.append(row)
+
+    async def flush(self) -> None:
+        """Insert every pending row, one batch per request"""
+        async with self._flush_lock:
+            while self.pending:
+                batch = [self.pending[i] for i in range(min(self.batch_size, len(self.pending)))]
+                await self._insert(batch)
+                for user_id, template_id in {(row["user_id"], row["template_id"]) for row in batch}:
+                    invalidate_reads(user_id, template_id)
+                for _ in batch:
+                    self.pending.popleft()
+                self.batches_total += 1
+                self.last_flush_at = time.time()
+                if self.pending:
+                    self._journal.mark_flushed(len(batch))
+                else:
+                    self._journal.reset()
+
+    async def _insert(self, batch: list[dict]) -> None:
+        # Ids are generated on accept, so a batch replayed after a crash is not inserted twice
+        try:
+            await self._repository.insert_data_batch(batch, ignore_duplicates=True)
+            self.flushed_total += len(batch)
+        except DataError:
+            # Rejected by the database (e.g. the template was deleted): insert the rows
+            # one by one so that only the offending ones are dropped
+            for row in batch:
+                try:
+                    await self._repository.insert_data_batch([row], ignore_duplicates=True)
+                    self.flushed_total += 1
+                except DataError as e:
+                    self._reject(row, e)
+
+    def _reject(self, row: dict, error: DataError) -> None:
+        self.rejected_total += 1
+        logger.warning("Dropping data entry %s: %s", row["id"], error)
+        with open(os.path.join(self.directory, "rejected.ndjson"), "ab") as f:
+            f.write(json.dumps({"row": row, "error": str(error)}, separators=(",", ":")).encode() + b"\n")
+
+    async def _run(self) -> None:
+        failures = 0
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await self.flush()
+                self.last_error = None
+                failures = 0
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # Supabase unreachable: keep the rows and retry later
+                self.last_error = str(e)
+                logger.warning("Write-behind flush failed (%d entries pending): %s", len(self.pending), e)
+                await asyncio.sleep(RETRY_DELAYS[min(failures, len(RETRY_DELAYS) - 1)])
+                failures += 1
+
+    def status(self) -> dict:
+        return {
+            "enabled": self.running,
+            "pending": len(self.pending),
+            "accepted": self.accepted_total,
+            "flushed": self.flushed_total,
+            "rejected": self.rejected_total,
+            "batches": self.batches_total,
+            "last_flush_at": datetime.fromtimestamp(self.last_flush_at, timezone.utc).isoformat() if self.last_flush_at else None,
+            "last_error": self.last_error,
+        }
+
+
+write_behind = WriteBehindQueue(
+    WRITE_BEHIND_DIR,
+    WRITE_BEHIND_BATCH_SIZE,
+    WRITE_BEHIND_FLUSH_INTERVAL,
+    WRITE_BEHIND_MAX_PENDING,
+    WRITE_BEHIND_FSYNC,
+)
@@ -0,0 +1,144 @@
+"""Concurrent authentication benchmark against the GoTrue stub in benchmarks.fake_backend.
+
+Every seeded user logs in at the same time (up to `--concurrency` in flight),
+then resets their password with their own access token, then logs in again
+with the new password. Each response is checked against the user that sent
+the request: a login answered with someone else's session, or a password
+reset applied to the wrong account, is counted as a leak and fails the run.
+
+Run with:
+    python -m benchmarks.auth --users 200 --concurrency 50
+"""
+from typing import Awaitable, Callable
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import time
+
+# Imported first: it sets the environment the app reads at import time
+from .load import _free_port, _wait_for_port, percentile
+
+import httpx
+import jwt
+from supabase import AsyncClientOptions, acreate_client
+
+from app.dependencies import create_http_client, get_supabase_client
+from app.main import app
+
+from .fake_backend import BENCHMARK_PASSWORD, user_email
+
+
+class Phase:
+    """Latencies, errors and leaks of one step of the benchmark"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.latencies: list[float] = []
+        self.errors = 0
+        self.leaks = 0
+        self.elapsed = 0.0
+
+    def report(self) -> str:
+        values = sorted(self.latencies)
+        throughput = len(values) / self.elapsed if self.elapsed else 0.0
+        return (
+            f"{self.name:<24} {len(values):>7} {self.errors:>5} {self.leaks:>6} {throughput:>8.1f} "
+            f"{percentile(values, 0.50) * 1000:>8.1f} {percentile(values, 0.95) * 1000:>8.1f} "
+            f"{percentile(values, 0.99) * 1000:>8.1f}"
+        )
+
+
+async def run_phase(phase: Phase, users: int, concurrency: int, step: Callable[[int], Awaitable[None]]) -> None:
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(index: int) -> None:
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                await step(index)
+            except Exception:
+                phase.errors += 1
+            phase.latencies.append(time.perf_counter() - start)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(users)))
+    phase.elapsed = time.perf_counter() - started
+
+
+async def run(args: argparse.Namespace) -> list[Phase]:
+    port = _free_port()
+    backend_process = subprocess.Popen([
+        sys.executable, "-m", "benchmarks.fake_backend", "--port", str(port),
+        "--latency-ms", str(args.latency_ms), "--users", str(args.users), "--templates", "0",
+    ], env={**os.environ, "SUPABASE_JWT_SECRET": os.environ["SUPABASE_JWT_SECRET"]})
+    http_client = create_http_client()
+
+    try:
+        await _wait_for_port(port)
+        supabase = await acreate_client(
+            f"http://127.0.0.1:{port}", os.environ["SUPABASE_KEY"], options=AsyncClientOptions(httpx_client=http_client)
+        )
+
+        async def benchmark_supabase_client():
+            return supabase
+
+        app.dependency_overrides[get_supabase_client] = benchmark_supabase_client
+        tokens: dict[int, str] = {}
+        user_ids: dict[int, str] = {}
+        login, reset, relogin = Phase("POST /auth/login"), Phase("POST /auth/reset-password"), Phase("POST /auth/login (new)")
+
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app), base_url="http://api", timeout=None) as api:
+
+            def log_in(phase: Phase, password: Callable[[int], str]) -> Callable[[int], Awaitable[None]]:
+                async def step(index: int) -> None:
+                    email = user_email(index)
+                    response = await api.post("/auth/login", json={"email": email, "password": password(index)})
+                    response.raise_for_status()
+                    body = response.json()
+                    claims = jwt.decode(body["access_token"], options={"verify_signature": False})
+                    if body["user"]["email"] != email or claims["sub"] != body["user"]["id"]:
+                        phase.leaks += 1
+                    if user_ids.setdefault(index, body["user"]["id"]) != body["user"]["id"]:
+                        phase.leaks += 1
+                    tokens[index] = body["access_token"]
+                return step
+
+            async def reset_password(index: int) -> None:
+                response = await api.post(
+                    "/auth/reset-password",
+                    json={"access_token": tokens[index], "new_password": f"{BENCHMARK_PASSWORD}-{index}"},
+                )
+                response.raise_for_status()
+
+            await run_phase(login, args.users, args.concurrency, log_in(login, lambda index: BENCHMARK_PASSWORD))
+            await run_phase(reset, args.users, args.concurrency, reset_password)
+            # A reset applied to another user's account shows up as a failed login here
+            await run_phase(relogin, args.users, args.concurrency, log_in(relogin, lambda index: f"{BENCHMARK_PASSWORD}-{index}"))
+        return [login, reset, relogin]
+    finally:
+        app.dependency_overrides.pop(get_supabase_client, None)
+        await http_client.aclose()
+        backend_process.terminate()
+        backend_process.wait()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.auth")
+    parser.add_argument("--users", type=int, default=200, help="Seeded users, each logging in once per phase")
+    parser.add_argument("--concurrency", type=int, default=50, help="Requests in flight at the same time")
+    parser.add_argument("--latency-ms", type=float, default=20, help="GoTrue round trip latency")
+    args = parser.parse_args()
+
+    phases = asyncio.run(run(args))
+    print(f"{'phase':<24} {'req':>7} {'err':>5} {'leaks':>6} {'req/s':>8} {'p50':>8} {'p95':>8} {'p99':>8}")
+    for phase in phases:
+        print(phase.report())
+    if any(phase.errors or phase.leaks for phase in phases):
+        print("\nAuthentication errors or cross-user leaks detected")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
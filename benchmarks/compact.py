@@ -0,0 +1,61 @@
+"""Microbenchmark: template data values stored as objects vs compact (positional) arrays.
+
+Reports the JSON size of `values` per row and the time to parse and decode a
+page of rows back to objects, for the benchmark template fields.
+
+Run with: python -m benchmarks.compact
+"""
+import json
+import random
+import timeit
+
+from app.compact import decode_rows, encode_values
+
+from .fake_backend import BENCHMARK_FIELDS, random_values
+
+ROW_COUNTS = (100, 1000, 10000)
+
+
+def build_rows(count: int, template: dict) -> list[dict]:
+    rng = random.Random(0)
+    rows = []
+    for _ in range(count):
+        values = random_values(rng)
+        # Some entries leave optional fields out
+        if rng.random() < 0.2:
+            del values["Precio"]
+        rows.append({"values": encode_values(template, values)})
+    return rows
+
+
+def run(repeat: int = 3) -> None:
+    plain = {"fields": BENCHMARK_FIELDS, "compact": False}
+    compact = {"fields": BENCHMARK_FIELDS, "compact": True}
+
+    print(f"{'rows':>6} {'object (B/row)':>15} {'compact (B/row)':>16} {'saved':>6} "
+          f"{'object decode (ms)':>19} {'compact decode (ms)':>20}")
+    for row_count in ROW_COUNTS:
+        pages = {}
+        for template in (plain, compact):
+            rows = build_rows(row_count, template)
+            pages[template["compact"]] = (
+                json.dumps(rows, separators=(",", ":")),
+                sum(len(json.dumps(row["values"], separators=(",", ":"))) for row in rows) / row_count,
+            )
+        assert decode_rows(compact, json.loads(pages[True][0])) == json.loads(pages[False][0])
+
+        number = max(1, 10000 // row_count)
+        timings = [
+            min(timeit.repeat(lambda: decode_rows(template, json.loads(pages[template["compact"]][0])),
+                              number=number, repeat=repeat)) / number
+            for template in (plain, compact)
+        ]
+        object_size, compact_size = pages[False][1], pages[True][1]
+        print(
+            f"{row_count:>6} {object_size:>15.1f} {compact_size:>16.1f} {1 - compact_size / object_size:>6.0%} "
+            f"{timings[0] * 1e3:>19.2f} {timings[1] * 1e3:>20.2f}"
+        )
+
+
+if __name__ == "__main__":
+    run()
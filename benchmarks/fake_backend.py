@@ -0,0 +1,827 @@
+"""In-process stand-in for the Supabase APIs used by the app (PostgREST and GoTrue).
+
+It implements just enough of PostgREST for the queries the routers send
+(filters, `or`/`and` logic, JSON path selects, ordering, limits, single object
+responses), the RPC functions from `supabase/migrations` and the password auth
+endpoints of GoTrue. Every call waits `latency` seconds (plus up to `jitter`)
+to model the network round trip to the database.
+
+It can be used in-process through `httpx.ASGITransport(backend.app)`, or served
+on localhost:
+
+    python -m benchmarks.fake_backend --port 54321 --latency-ms 5
+"""
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Optional
+import argparse
+import asyncio
+import json
+import os
+import random
+import re
+import time
+import uuid
+
+import jwt
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response
+from starlette.routing import Route
+
+from app.compact import layout_version
+
+# Query parameters that are not filters
+_RESERVED_PARAMS = {"select", "order", "limit", "offset", "on_conflict", "columns"}
+_MISSING = object()
+_JSON_PATH = re.compile(r"(->>?)(\"[^\"]*\"|[^-]+)")
+
+
+def utcnow() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+def split_top_level(text: str, separator: str = ",") -> list[str]:
+    """Split on a separator outside of parentheses and double quotes"""
+    parts, depth, current, quoted = [], 0, [], False
+    for char in text:
+        if char == '"':
+            quoted = not quoted
+        elif not quoted and char == "(":
+            depth += 1
+        elif not quoted and char == ")":
+            depth -= 1
+        if char == separator and depth == 0 and not quoted:
+            parts.append("".join(current))
+            current = []
+        else:
+            current.append(char)
+    if current:
+        parts.append("".join(current))
+    return parts
+
+
+def column_value(row: dict, column: str, missing: Any = None) -> Any:
+    """Value of a column, following `->` / `->>` JSON paths (`missing` when a path step is absent)"""
+    arrow = column.find("-")
+    if arrow == -1:
+        return row.get(column)
+    value = row.get(column[:arrow])
+    as_text = False
+    for operator, key in _JSON_PATH.findall(column[arrow:]):
+        key = key.strip('"')
+        if isinstance(value, dict) and key in value:
+            value = value[key]
+        elif isinstance(value, list) and key.lstrip("-").isdigit() and -len(value) <= int(key) < len(value):
+            value = value[int(key)]
+        else:
+            return missing
+        as_text = operator == "->>"
+    if as_text and value is not None and not isinstance(value, str):
+        if isinstance(value, bool):
+            return "true" if value else "false"
+        return json.dumps(value) if isinstance(value, (dict, list)) else str(value)
+    return value
+
+
+def _comparable(value: Any, argument: str) -> tuple[Any, Any]:
+    if isinstance(value, bool):
+        return value, argument == "true"
+    if isinstance(value, (int, float)):
+        try:
+            return value, float(argument)
+        except ValueError:
+            return str(value), argument
+    return str(value), argument
+
+
+def compile_filter(column: str, expression: str) -> Callable[[dict], bool]:
+    """Predicate for a PostgREST filter such as `eq.5`, `not.is.null` or `in.(a,b)`"""
+    negate = expression.startswith("not.")
+    if negate:
+        expression = expression[4:]
+    operator, _, argument = expression.partition(".")
+    if len(argument) > 1 and argument[0] == argument[-1] == '"':
+        argument = re.sub(r"\\(.)", r"\1", argument[1:-1])
+
+    if operator == "is":
+        expected = None if argument == "null" else argument == "true"
+        test = lambda value: value is expected
+    elif operator == "in":
+        options = [option.strip('"') for option in split_top_level(argument[1:-1])]
+        test = lambda value: value is not None and any(a == b for a, b in (_comparable(value, o) for o in options))
+    elif operator == "eq" and re.search(r"->[^>]*$", column):
+        # jsonb values compare with their JSON type: 7 is not "7"
+        try:
+            expected = json.loads(argument)
+        except ValueError:
+            expected = argument
+        test = lambda value: value is not None and json_type(value) == json_type(expected) and value == expected
+    elif operator == "cs":
+        wanted = json.loads(argument)
+        test = lambda value: isinstance(value, dict) and all(value.get(k) == v for k, v in wanted.items())
+    else:
+        compare = {
+            "eq": lambda a, b: a == b, "neq": lambda a, b: a != b,
+            "lt": lambda a, b: a < b, "lte": lambda a, b: a <= b,
+            "gt": lambda a, b: a > b, "gte": lambda a, b: a >= b,
+        }[operator]
+        test = lambda value: value is not None and compare(*_comparable(value, argument))
+
+    if negate:
+        return lambda row: not test(column_value(row, column))
+    return lambda row: test(column_value(row, column))
+
+
+def compile_logic(expression: str, mode: str) -> Callable[[dict], bool]:
+    """Predicate for an `or=(...)` / `and=(...)` filter"""
+    predicates = []
+    for part in split_top_level(expression[1:-1]):
+        if part.startswith(("and(", "or(")):
+            sub_mode = part[:part.index("(")]
+            predicates.append(compile_logic(part[len(sub_mode):], sub_mode))
+        else:
+            column, condition = part.split(".", 1)
+            predicates.append(compile_filter(column, condition))
+    if mode == "or":
+        return lambda row: any(predicate(row) for predicate in predicates)
+    return lambda row: all(predicate(row) for predicate in predicates)
+
+
+def project(row: dict, select: Optional[str]) -> dict:
+    if select in (None, "*"):
+        return dict(row)
+    projected = {}
+    for column in split_top_level(select):
+        alias = None
+        if ":" in column:
+            alias, column = column.split(":", 1)
+        if column == "*":
+            projected.update(row)
+            continue
+        column, _, cast = column.partition("::")
+        name = alias or re.split(r"->>?", column)[-1].strip('"')
+        if cast == "text":
+            # JSON text of the value, SQL null when a path step is absent
+            value = column_value(row, column, _MISSING)
+            projected[name] = None if value is _MISSING else json.dumps(value)
+        else:
+            projected[name] = column_value(row, column)
+    return projected
+
+
+def number(value: Any) -> Optional[float]:
+    """Numeric value of a field, like public.template_data_number"""
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return value
+    return None
+
+
+def json_type(value: Any) -> str:
+    if isinstance(value, bool):
+        return "boolean"
+    if isinstance(value, (int, float)):
+        return "number"
+    return type(value).__name__
+
+
+def matches(values: dict, filters: list[dict]) -> bool:
+    """Whether values match every filter, like public.template_data_matches"""
+    for f in filters:
+        value = values.get(f["field"])
+        if value is None:
+            return False
+        if f["op"] == "eq":
+            ok = json_type(value) == json_type(f["value"]) and value == f["value"]
+        elif f["op"] == "in":
+            ok = any(json_type(value) == json_type(option) and value == option for option in f["value"])
+        elif json_type(value) != json_type(f["value"]):
+            ok = False
+        else:
+            ok = value < f["value"] if f["op"] == "lt" else value > f["value"]
+        if not ok:
+            return False
+    return True
+
+
+def truncate(timestamp: str, bucket: str) -> str:
+    moment = datetime.fromisoformat(timestamp)
+    if bucket == "week":
+        moment -= timedelta(days=moment.weekday())
+    fields = {"hour": 4, "day": 3, "week": 3, "month": 2, "year": 1}[bucket]
+    replace = {"minute": 0, "second": 0, "microsecond": 0}
+    if fields <= 3:
+        replace["hour"] = 0
+    if fields <= 2:
+        replace["day"] = 1
+    if fields <= 1:
+        replace["month"] = 1
+    return moment.replace(**replace).isoformat()
+
+
+class Table:
+    """Rows of a table, indexed by id and optionally by one more column"""
+
+    def __init__(self, index_column: Optional[str] = None):
+        self.rows: dict[str, dict] = {}
+        self.index_column = index_column
+        self.index: dict[Any, dict[str, dict]] = {}
+
+    def insert(self, row: dict) -> None:
+        self.rows[row["id"]] = row
+        if self.index_column:
+            self.index.setdefault(row.get(self.index_column), {})[row["id"]] = row
+
+    def delete(self, row: dict) -> None:
+        del self.rows[row["id"]]
+        if self.index_column:
+            self.index[row.get(self.index_column)].pop(row["id"], None)
+
+    def candidates(self, params) -> list[dict]:
+        """Rows that can match the query, narrowed down by the index when filtered on it"""
+        if self.index_column:
+            condition = params.get(self.index_column)
+            if condition and condition.startswith("eq."):
+                return list(self.index.get(condition[3:], {}).values())
+        return list(self.rows.values())
+
+
+# Version keys bumped by writes to each table: (key prefix, column)
+VERSION_KEYS = {
+    "templates": (("templates", "user_id"),),
+    "template_data": (("template_data", "template_id"), ("user_data", "user_id")),
+}
+
+
+class FakeSupabase:
+    """PostgREST + GoTrue stand-in holding its data in memory"""
+
+    def __init__(self, latency: float = 0.0, jitter: float = 0.0, jwt_secret: Optional[str] = None):
+        self.latency = latency
+        self.jitter = jitter
+        self.jwt_secret = jwt_secret or os.environ["SUPABASE_JWT_SECRET"]
+        self.tables = {
+            "templates": Table("user_id"),
+            "template_data": Table("template_id"),
+            "template_summaries": Table(),
+            "resource_versions": Table(),
+        }
+        self.users: dict[str, dict] = {}
+        self.rpcs: dict[str, Callable[..., Any]] = {
+            "aggregate_template_data": self.aggregate_template_data,
+            "rebuild_template_summaries": self.rebuild_template_summaries,
+            "delete_template": self.delete_template,
+            "take_rate_limit_token": self.take_rate_limit_token,
+            "claim_template_deletion_job": self.claim_template_deletion_job,
+            "delete_template_data_chunk": self.delete_template_data_chunk,
+            "user_templates_summary": self.user_templates_summary,
+            "convert_template_values": self.convert_template_values,
+        }
+        self.rate_limit_buckets: dict[str, tuple[float, float]] = {}
+        self.calls: dict[str, int] = {}
+        self.app = Starlette(routes=[
+            Route("/rest/v1/rpc/{function}", self.handle_rpc, methods=["GET", "POST"]),
+            Route("/rest/v1/{table}", self.handle_table, methods=["GET", "POST", "PATCH", "DELETE"]),
+            Route("/auth/v1/signup", self.handle_signup, methods=["POST"]),
+            Route("/auth/v1/token", self.handle_token, methods=["POST"]),
+            Route("/auth/v1/logout", self.handle_logout, methods=["POST"]),
+            Route("/auth/v1/user", self.handle_user, methods=["GET", "PUT"]),
+            Route("/auth/v1/recover", self.handle_recover, methods=["POST"]),
+            Route("/auth/v1/.well-known/jwks.json", self.handle_jwks, methods=["GET"]),
+        ])
+
+    async def _round_trip(self, call: str) -> None:
+        self.calls[call] = self.calls.get(call, 0) + 1
+        delay = self.latency + (random.random() * self.jitter if self.jitter else 0)
+        if delay:
+            await asyncio.sleep(delay)
+
+    # Data
+
+    def table(self, name: str) -> Table:
+        if name not in self.tables:
+            self.tables[name] = Table()
+        return self.tables[name]
+
+    def add_user(self, email: str, password: str) -> dict:
+        user = {
+            "id": str(uuid.uuid4()),
+            "aud": "authenticated",
+            "role": "authenticated",
+            "email": email,
+            "created_at": utcnow(),
+            "app_metadata": {"provider": "email"},
+            "user_metadata": {},
+        }
+        self.users[email] = {"user": user, "password": password}
+        return user
+
+    def add_template(self, user_id: str, name: str, fields: list[dict]) -> dict:
+        template = {
+            "id": str(uuid.uuid4()),
+            "user_id": user_id,
+            "name": name,
+            "description": None,
+            "fields": fields,
+            "created_at": utcnow(),
+            "updated_at": utcnow(),
+            "deleted_at": None,
+        }
+        self.table("templates").insert(template)
+        self.bump_versions("templates", [template])
+        return template
+
+    def add_rows(self, template_id: str, user_id: str, values: list[dict], start: datetime, step: timedelta) -> None:
+        """Bulk load data rows with increasing created_at, bypassing the HTTP layer"""
+        added = []
+        for i, row_values in enumerate(values):
+            created_at = (start + step * i).isoformat()
+            row = {
+                "id": str(uuid.uuid4()),
+                "template_id": template_id,
+                "user_id": user_id,
+                "values": row_values,
+                "created_at": created_at,
+                "updated_at": created_at,
+            }
+            self.table("template_data").insert(row)
+            added.append(row)
+        self.apply_summary_changes([], added)
+        self.bump_versions("template_data", added)
+
+    # Versions, bumped like the triggers in 20261017000500_resource_versions.sql
+    # and 20261017000700_user_templates_summary.sql
+
+    def bump_versions(self, table_name: str, rows: list[dict]) -> None:
+        versions = self.table("resource_versions")
+        keys = {f"{prefix}:{row[column]}" for prefix, column in VERSION_KEYS.get(table_name, ()) for row in rows}
+        for key in keys:
+            entry = versions.rows.get(key)
+            if entry is None:
+                versions.insert({"id": key, "key": key, "version": 1})
+            else:
+                entry["version"] += 1
+
+    def _values(self, row: dict) -> dict:
+        """Values of a row as an object, like public.template_data_object"""
+        values = row["values"]
+        if not isinstance(values, list):
+            return values
+        template = self.table("templates").rows.get(row["template_id"])
+        if template is None:
+            return {}
+        return {
+            field["name"]: value
+            for field, value in zip(template["fields"], values[1:])
+            if value is not None
+        }
+
+    # Summaries, maintained like the triggers in 20261017000300_template_summaries.sql
+
+    def _numeric_fields(self, template_id: str) -> list[str]:
+        template = self.table("templates").rows.get(template_id)
+        if template is None:
+            return []
+        return [field["name"] for field in template["fields"] if field["type"] in ("int", "float")]
+
+    def apply_summary_changes(self, removed: list[dict], added: list[dict]) -> None:
+        summaries = self.table("template_summaries")
+        for sign, rows in ((-1, removed), (1, added)):
+            for row in rows:
+                template_id = row["template_id"]
+                template = self.table("templates").rows.get(template_id)
+                # Rows deleted by a deletion job leave the totals alone
+                if template is None or (sign < 0 and template.get("deleted_at")):
+                    continue
+                summary = summaries.rows.get(template_id)
+                if summary is None:
+                    summary = {"id": template_id, "template_id": template_id, "user_id": row["user_id"],
+                               "record_count": 0, "fields": {}, "updated_at": utcnow()}
+                    summaries.insert(summary)
+                summary["record_count"] += sign
+                summary["updated_at"] = utcnow()
+                values = self._values(row)
+                for name in self._numeric_fields(template_id):
+                    value = number(values.get(name))
+                    if value is None:
+                        continue
+                    stats = summary["fields"].setdefault(name, {"count": 0, "sum": 0, "min": None, "max": None})
+                    stats["count"] += sign
+                    stats["sum"] += sign * value
+                    if sign > 0:
+                        stats["min"] = value if stats["min"] is None else min(stats["min"], value)
+                        stats["max"] = value if stats["max"] is None else max(stats["max"], value)
+                    elif value in (stats["min"], stats["max"]):
+                        self._recompute_extremes(template_id, name, stats)
+
+    def _recompute_extremes(self, template_id: str, field: str, stats: dict) -> None:
+        values = [
+            value for value in (number(self._values(row).get(field)) for row in self.table("template_data").index.get(template_id, {}).values())
+            if value is not None
+        ]
+        stats["min"] = min(values, default=None)
+        stats["max"] = max(values, default=None)
+
+    # RPC functions
+
+    def aggregate_template_data(
+        self, p_template_id, p_user_id, p_field, p_group_by=None, p_bucket=None,
+        p_created_after=None, p_created_before=None, p_filters=None,
+    ) -> list[dict]:
+        groups: dict[tuple, dict] = {}
+        for row in self.table("template_data").index.get(p_template_id, {}).values():
+            if row["user_id"] != p_user_id:
+                continue
+            if p_created_after is not None and row["created_at"] < p_created_after:
+                continue
+            if p_created_before is not None and row["created_at"] >= p_created_before:
+                continue
+            values = self._values(row)
+            if p_filters is not None and not matches(values, p_filters):
+                continue
+            group_value = values.get(p_group_by) if p_group_by else None
+            key = (
+                None if group_value is None else str(group_value),
+                truncate(row["created_at"], p_bucket) if p_bucket else None,
+            )
+            group = groups.setdefault(key, {"records": 0, "numbers": []})
+            group["records"] += 1
+            value = number(values.get(p_field))
+            if value is not None:
+                group["numbers"].append(value)
+        result = []
+        for (group_value, bucket), group in groups.items():
+            numbers = group["numbers"]
+            result.append({
+                "group_value": group_value,
+                "bucket": bucket,
+                "records": group["records"],
+                "count": len(numbers),
+                "sum": sum(numbers) if numbers else None,
+                "avg": sum(numbers) / len(numbers) if numbers else None,
+                "min": min(numbers, default=None),
+                "max": max(numbers, default=None),
+            })
+        return sorted(result, key=lambda r: (r["bucket"] or "", r["group_value"] or ""))
+
+    def rebuild_template_summaries(self, p_template_id=None) -> int:
+        summaries = self.table("template_summaries")
+        templates = [
+            template for template in self.table("templates").rows.values()
+            if p_template_id is None or template["id"] == p_template_id
+        ]
+        for template in templates:
+            if template["id"] in summaries.rows:
+                summaries.delete(summaries.rows[template["id"]])
+            rows = list(self.table("template_data").index.get(template["id"], {}).values())
+            summaries.insert({"id": template["id"], "template_id": template["id"], "user_id": template["user_id"],
+                              "record_count": 0, "fields": {}, "updated_at": utcnow()})
+            self.apply_summary_changes([], rows)
+        return len(templates)
+
+    def convert_template_values(self, p_template_id, p_compact, p_after_id=None, p_chunk_size=5000) -> dict:
+        template = self.table("templates").rows.get(p_template_id)
+        if template is None:
+            return {"rows": 0, "converted": 0, "last_id": None}
+        template["compact"] = p_compact
+        rows = sorted(
+            (row for row in self.table("template_data").index.get(p_template_id, {}).values()
+             if p_after_id is None or row["id"] > p_after_id),
+            key=lambda row: row["id"],
+        )[:p_chunk_size]
+        converted = 0
+        for row in rows:
+            if isinstance(row["values"], list) == p_compact:
+                continue
+            values = self._values(row)
+            if p_compact:
+                row["values"] = [layout_version(template["fields"])] + [values.get(field["name"]) for field in template["fields"]]
+            else:
+                row["values"] = values
+            converted += 1
+        return {
+            "rows": len(rows),
+            "converted": converted,
+            "last_id": rows[-1]["id"] if len(rows) == p_chunk_size else None,
+        }
+
+    def delete_template(self, p_template_id, p_user_id, p_force=False) -> dict:
+        templates = self.table("templates")
+        template = templates.rows.get(p_template_id)
+        if template is None or template["user_id"] != p_user_id or template.get("deleted_at"):
+            return {"status": "not_found"}
+        if not self.table("template_data").index.get(p_template_id):
+            templates.delete(template)
+            self.bump_versions("templates", [template])
+            self._delete_summary(p_template_id)
+            return {"status": "deleted"}
+        if not p_force:
+            return {"status": "has_data"}
+        template["deleted_at"] = utcnow()
+        self.bump_versions("templates", [template])
+        summary = self.table("template_summaries").rows.get(p_template_id) or {}
+        job = {
+            "id": str(uuid.uuid4()),
+            "template_id": p_template_id,
+            "user_id": p_user_id,
+            "status": "pending",
+            "total_rows": summary.get("record_count", 0),
+            "deleted_rows": 0,
+            "last_id": None,
+            "lease_until": None,
+            "error": None,
+            "created_at": utcnow(),
+            "updated_at": utcnow(),
+            "finished_at": None,
+        }
+        self.table("template_deletion_jobs").insert(job)
+        self._delete_summary(p_template_id)
+        return {"status": "queued", "job_id": job["id"]}
+
+    def _delete_summary(self, template_id: str) -> None:
+        summary = self.table("template_summaries").rows.get(template_id)
+        if summary is not None:
+            self.table("template_summaries").delete(summary)
+
+    # Deletion jobs, like 20261017000800_template_deletion_jobs.sql
+
+    def claim_template_deletion_job(self, p_lease_seconds=60) -> Optional[dict]:
+        now = time.time()
+        jobs = sorted(self.table("template_deletion_jobs").rows.values(), key=lambda job: job["created_at"])
+        for job in jobs:
+            if job["status"] != "done" and (job["lease_until"] is None or job["lease_until"] < now):
+                job.update(status="running", lease_until=now + p_lease_seconds, updated_at=utcnow())
+                return job
+        return None
+
+    def delete_template_data_chunk(self, p_job_id, p_chunk_size=5000, p_lease_seconds=60) -> Optional[dict]:
+        job = self.table("template_deletion_jobs").rows.get(p_job_id)
+        if job is None or job["status"] == "done":
+            return job
+        data = self.table("template_data")
+        remaining = data.index.get(job["template_id"], {})
+        chunk = sorted(row_id for row_id in remaining if job["last_id"] is None or row_id > job["last_id"])[:p_chunk_size]
+        rows = [remaining[row_id] for row_id in chunk]
+        for row in rows:
+            data.delete(row)
+        self.bump_versions("template_data", rows)
+        if rows:
+            job.update(deleted_rows=job["deleted_rows"] + len(rows), last_id=chunk[-1], error=None)
+        elif remaining:
+            job["last_id"] = None
+        else:
+            template = self.table("templates").rows.get(job["template_id"])
+            if template is not None:
+                self.table("templates").delete(template)
+                self.bump_versions("templates", [template])
+            job.update(status="done", error=None, finished_at=utcnow())
+        job["lease_until"] = None if job["status"] == "done" else time.time() + p_lease_seconds
+        job["updated_at"] = utcnow()
+        return job
+
+    def user_templates_summary(self, p_user_id) -> list[dict]:
+        templates = sorted(
+            (t for t in self.table("templates").index.get(p_user_id, {}).values() if not t.get("deleted_at")),
+            key=lambda t: (t["created_at"], t["id"]),
+        )
+        overview = []
+        for template in templates:
+            summary = self.table("template_summaries").rows.get(template["id"]) or {}
+            rows = self.table("template_data").index.get(template["id"], {}).values()
+            overview.append({
+                "template_id": template["id"],
+                "name": template["name"],
+                "fields": template["fields"],
+                "record_count": summary.get("record_count", 0),
+                "totals": summary.get("fields", {}),
+                "last_entry_at": max((row["created_at"] for row in rows if row["user_id"] == p_user_id), default=None),
+            })
+        return overview
+
+    def take_rate_limit_token(self, p_key, p_rate, p_burst) -> float:
+        now = time.monotonic()
+        tokens, updated_at = self.rate_limit_buckets.get(p_key, (p_burst, now))
+        tokens = min(p_burst, tokens + (now - updated_at) * p_rate)
+        if tokens >= 1:
+            self.rate_limit_buckets[p_key] = (tokens - 1, now)
+            return 0
+        self.rate_limit_buckets[p_key] = (tokens, now)
+        return (1 - tokens) / p_rate
+
+    # PostgREST
+
+    def _filter(self, table: Table, params) -> list[dict]:
+        predicates = [
+            compile_logic(value, key) if key in ("or", "and") else compile_filter(key, value)
+            for key, value in params.multi_items()
+            if key not in _RESERVED_PARAMS
+        ]
+        return [row for row in table.candidates(params) if all(predicate(row) for predicate in predicates)]
+
+    def _respond(self, request: Request, rows: list[dict], status_code: int = 200) -> Response:
+        rows = [project(row, request.query_params.get("select")) for row in rows]
+        if "vnd.pgrst.object" in request.headers.get("accept", ""):
+            if len(rows) != 1:
+                return JSONResponse({
+                    "code": "PGRST116",
+                    "message": "JSON object requested, multiple (or no) rows returned",
+                    "details": f"The result contains {len(rows)} rows",
+                    "hint": None,
+                }, status_code=406)
+            return JSONResponse(rows[0], status_code=status_code)
+        if request.method != "GET" and "return=representation" not in request.headers.get("prefer", ""):
+            return Response(status_code=201 if request.method == "POST" else 204)
+        return JSONResponse(rows, status_code=status_code)
+
+    async def handle_table(self, request: Request) -> Response:
+        name = request.path_params["table"]
+        await self._round_trip(f"{request.method} {name}")
+        table = self.table(name)
+        params = request.query_params
+
+        if request.method == "GET":
+            rows = self._filter(table, params)
+            order = params.get("order")
+            if order:
+                for spec in reversed(order.split(",")):
+                    column, _, direction = spec.partition(".")
+                    rows.sort(
+                        key=lambda row: (column_value(row, column) is None, column_value(row, column)),
+                        reverse=direction.startswith("desc"),
+                    )
+            offset = int(params.get("offset", 0))
+            if "limit" in params:
+                rows = rows[offset:offset + int(params["limit"])]
+            return self._respond(request, rows)
+
+        if request.method == "POST":
+            body = json.loads(await request.body())
+            ignore_duplicates = "ignore-duplicates" in request.headers.get("prefer", "")
+            inserted = []
+            for values in body if isinstance(body, list) else [body]:
+                row = {"id": str(uuid.uuid4()), **values}
+                if row["id"] in table.rows:
+                    if ignore_duplicates:
+                        continue
+                    return JSONResponse({"code": "23505", "message": "duplicate key value"}, status_code=409)
+                row.setdefault("created_at", utcnow())
+                row.setdefault("updated_at", row["created_at"])
+                table.insert(row)
+                inserted.append(row)
+            if name == "template_data":
+                self.apply_summary_changes([], inserted)
+            self.bump_versions(name, inserted)
+            return self._respond(request, inserted, 201)
+
+        if request.method == "PATCH":
+            body = json.loads(await request.body())
+            rows = self._filter(table, params)
+            previous = [dict(row) for row in rows]
+            for row in rows:
+                row.update(body)
+                row["updated_at"] = utcnow()
+            if name == "template_data":
+                self.apply_summary_changes(previous, rows)
+            self.bump_versions(name, previous + rows)
+            return self._respond(request, rows)
+
+        rows = self._filter(table, params)
+        for row in rows:
+            table.delete(row)
+        if name == "template_data":
+            self.apply_summary_changes(rows, [])
+        self.bump_versions(name, rows)
+        return self._respond(request, rows)
+
+    async def handle_rpc(self, request: Request) -> Response:
+        function = request.path_params["function"]
+        await self._round_trip(f"RPC {function}")
+        arguments = json.loads(await request.body() or b"{}")
+        return JSONResponse(self.rpcs[function](**arguments))
+
+    # GoTrue
+
+    def _session(self, user: dict) -> dict:
+        now = int(time.time())
+        access_token = jwt.encode({
+            "iss": "benchmarks",
+            "sub": user["id"],
+            "aud": "authenticated",
+            "exp": now + 3600,
+            "iat": now,
+            "email": user["email"],
+            "phone": "",
+            "role": "authenticated",
+        }, self.jwt_secret, algorithm="HS256")
+        return {
+            "access_token": access_token,
+            "token_type": "bearer",
+            "expires_in": 3600,
+            "expires_at": now + 3600,
+            "refresh_token": uuid.uuid4().hex,
+            "user": user,
+        }
+
+    async def handle_signup(self, request: Request) -> Response:
+        await self._round_trip("POST signup")
+        body = json.loads(await request.body())
+        if body["email"] in self.users:
+            return JSONResponse({"code": 422, "error_code": "user_already_exists", "msg": "User already registered"}, status_code=422)
+        return JSONResponse(self.add_user(body["email"], body["password"]))
+
+    async def handle_token(self, request: Request) -> Response:
+        await self._round_trip("POST token")
+        body = json.loads(await request.body())
+        account = self.users.get(body.get("email"))
+        if account is None or account["password"] != body.get("password"):
+            return JSONResponse({"code": 400, "error_code": "invalid_credentials", "msg": "Invalid login credentials"}, status_code=400)
+        return JSONResponse(self._session(account["user"]))
+
+    async def handle_logout(self, request: Request) -> Response:
+        await self._round_trip("POST logout")
+        return Response(status_code=204)
+
+    async def handle_user(self, request: Request) -> Response:
+        await self._round_trip(f"{request.method} user")
+        token = request.headers.get("authorization", "").removeprefix("Bearer ")
+        try:
+            claims = jwt.decode(token, self.jwt_secret, algorithms=["HS256"], audience="authenticated")
+        except jwt.InvalidTokenError:
+            return JSONResponse({"code": 401, "msg": "invalid JWT"}, status_code=401)
+        for account in self.users.values():
+            if account["user"]["id"] == claims["sub"]:
+                if request.method == "PUT":
+                    body = json.loads(await request.body())
+                    if "password" in body:
+                        account["password"] = body["password"]
+                return JSONResponse(account["user"])
+        return JSONResponse({"code": 404, "msg": "User not found"}, status_code=404)
+
+    async def handle_recover(self, request: Request) -> Response:
+        await self._round_trip("POST recover")
+        return JSONResponse({})
+
+    async def handle_jwks(self, request: Request) -> Response:
+        return JSONResponse({"keys": []})
+
+
+# Template used by the seeded dataset, with the "Cantidad" field read by /data/sum
+BENCHMARK_FIELDS = [
+    {"name": "Cantidad", "type": "int", "display_unit": "ml"},
+    {"name": "Tipo", "type": "string", "display_unit": None},
+    {"name": "Precio", "type": "float", "display_unit": "$"},
+    {"name": "Fecha", "type": "date", "display_unit": None},
+    {"name": "Pagado", "type": "boolean", "display_unit": None},
+]
+BENCHMARK_TYPES = ("agua", "jugo", "cafe", "te", "leche")
+BENCHMARK_PASSWORD = "benchmark-password"
+
+
+def user_email(index: int) -> str:
+    return f"user{index}@benchmark.local"
+
+
+def random_values(rng: random.Random) -> dict:
+    return {
+        "Cantidad": rng.randint(100, 1000),
+        "Tipo": rng.choice(BENCHMARK_TYPES),
+        "Precio": round(rng.uniform(0.5, 20), 2),
+        "Fecha": f"2026-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}T12:00:00",
+        "Pagado": rng.random() < 0.5,
+    }
+
+
+def seed(backend: FakeSupabase, users: int, templates_per_user: int, records: int, random_seed: int = 0) -> None:
+    """Load users (user{i}@benchmark.local), templates and `records` rows per template"""
+    rng = random.Random(random_seed)
+    start = datetime.now(timezone.utc) - timedelta(days=365)
+    step = timedelta(days=365) / max(records, 1)
+    for i in range(users):
+        user = backend.add_user(user_email(i), BENCHMARK_PASSWORD)
+        for j in range(templates_per_user):
+            template = backend.add_template(user["id"], f"Consumo {j}", BENCHMARK_FIELDS)
+            backend.add_rows(template["id"], user["id"], [random_values(rng) for _ in range(records)], start, step)
+
+
+def main() -> None:
+    import uvicorn
+
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.fake_backend")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=54321)
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Delay added to every call")
+    parser.add_argument("--jitter-ms", type=float, default=0.0, help="Random extra delay, up to this value")
+    parser.add_argument("--users", type=int, default=10)
+    parser.add_argument("--templates", type=int, default=2, help="Templates per user")
+    parser.add_argument("--records", type=int, default=1000, help="Rows per template")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    backend = FakeSupabase(args.latency_ms / 1000, args.jitter_ms / 1000)
+    seed(backend, args.users, args.templates, args.records, args.seed)
+    uvicorn.run(backend.app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
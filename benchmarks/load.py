@@ -0,0 +1,411 @@
+"""Load test of the full API against the Supabase stand-in in benchmarks.fake_backend.
+
+Virtual users log in through /auth/login and then send a weighted mix of
+requests for a fixed duration (closed loop, `--concurrency` users at a time).
+Throughput and latency percentiles per endpoint are printed and written to a
+JSON file. A previous result can be passed as the baseline: the run fails when
+an endpoint's p95 latency or throughput regresses by more than the threshold.
+
+Run with:
+    python -m benchmarks.load --scenario mixed --duration 20 --output bench.json
+    python -m benchmarks.load --scenario mixed --baseline bench.json --threshold 0.1
+
+With `--backend localhost` the stand-in runs in its own process and is reached
+over HTTP, so its CPU time does not compete with the app's. With `--backend
+sqlite` templates and data are served from an in-memory SQLite storage and the
+stand-in only handles logins.
+"""
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Optional
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+# The app reads its configuration at import time
+BENCHMARK_JWT_SECRET = "benchmark-secret-benchmark-secret-0000"
+os.environ.setdefault("SUPABASE_JWT_SECRET", BENCHMARK_JWT_SECRET)
+os.environ.setdefault("SUPABASE_URL", "http://supabase.benchmark")
+os.environ.setdefault("SUPABASE_KEY", "benchmark-anon-key")
+# Virtual users send requests back to back, far above the per-user limits
+os.environ.setdefault("RATE_LIMIT_ENABLED", "false")
+
+import httpx
+from supabase import AsyncClientOptions, acreate_client
+
+from app.dependencies import create_http_client, get_supabase_client
+from app.main import app
+from app.metrics import backend_requests_total
+from app.storage import Repository, SQLiteRepository, SupabaseRepository, get_repository
+from app.writebehind import write_behind
+
+from .fake_backend import BENCHMARK_PASSWORD, FakeSupabase, random_values, seed, user_email
+
+
+@dataclass
+class VirtualUser:
+    email: str
+    headers: dict
+    template_ids: list[str]
+    created_ids: list[tuple[str, str]]
+    rng: random.Random
+    # ETags of polled URLs, sent back in If-None-Match like a caching client would
+    etags: dict[str, str] = field(default_factory=dict)
+
+    def template(self) -> str:
+        return self.rng.choice(self.template_ids)
+
+
+Operation = Callable[[httpx.AsyncClient, VirtualUser], Awaitable[httpx.Response]]
+
+
+async def create_data(api: httpx.AsyncClient, user: VirtualUser) -> httpx.Response:
+    template_id = user.template()
+    response = await api.post(f"/templates/{template_id}/data", json={"values": random_values(user.rng)}, headers=user.headers)
+    if response.status_code in (200, 202):
+        user.created_ids.append((template_id, response.json()["data_id"]))
+    return response
+
+
+async def update_data(api: httpx.AsyncClient, user: VirtualUser) -> httpx.Response:
+    if not user.created_ids:
+        return await create_data(api, user)
+    template_id, data_id = user.rng.choice(user.created_ids)
+    return await api.put(f"/templates/{template_id}/data/{data_id}", json={"values": random_values(user.rng)}, headers=user.headers)
+
+
+async def poll(api: httpx.AsyncClient, user: VirtualUser, url: str, params: Optional[dict] = None) -> httpx.Response:
+    """Conditional GET, revalidating the previous response of the same URL"""
+    key = str(httpx.URL(url, params=params))
+    headers = user.headers
+    if key in user.etags:
+        headers = {**headers, "If-None-Match": user.etags[key]}
+    response = await api.get(url, params=params, headers=headers)
+    if "etag" in response.headers:
+        user.etags[key] = response.headers["etag"]
+    return response
+
+
+async def list_data(api: httpx.AsyncClient, user: VirtualUser) -> httpx.Response:
+    return await poll(api, user, f"/templates/{user.template()}/data", {"limit": 50})
+
+
+async def list_templates(api: httpx.AsyncClient, user: VirtualUser) -> httpx.Response:
+    return await poll(api, user, "/templates/")
+
+
+async def template_details(api: httpx.AsyncClient, user: VirtualUser) -> httpx.Response:
+    return await poll(api, user, f"/templates/{user.template()}")
+
+
+async def templates_summary(api: httpx.AsyncClient, user: VirtualUser) -> httpx.Response:
+    return await poll(api, user, "/templates/summary")
+
+
+async def summary(api: httpx.AsyncClient, user: VirtualUser) -> httpx.Response:
+    return await api.get(f"/templates/{user.template()}/data/summary", headers=user.headers)
+
+
+async def sum_cantidad(api: httpx.AsyncClient, user: VirtualUser) -> httpx.Response:
+    return await api.get(f"/templates/{user.template()}/data/sum", headers=user.headers)
+
+
+async def aggregate(api: httpx.AsyncClient, user: VirtualUser) -> httpx.Response:
+    params = {"field": "Cantidad", "group_by": "Tipo", "bucket": "month"}
+    return await api.get(f"/templates/{user.template()}/data/aggregate", params=params, headers=user.headers)
+
+
+async def export_csv(api: httpx.AsyncClient, user: VirtualUser) -> httpx.Response:
+    return await api.get(f"/templates/{user.template()}/data/export", params={"format": "csv"}, headers=user.headers)
+
+
+async def export_ndjson_gzip(api: httpx.AsyncClient, user: VirtualUser) -> httpx.Response:
+    params = {"format": "ndjson", "gzip": "true"}
+    return await api.get(f"/templates/{user.template()}/data/export", params=params, headers=user.headers)
+
+
+# Weighted request mixes: endpoint label -> (operation, weight)
+SCENARIOS: dict[str, dict[str, tuple[Operation, int]]] = {
+    # Users logging consumption from the app
+    "logging": {
+        "POST /templates/{template_id}/data": (create_data, 70),
+        "PUT /templates/{template_id}/data/{data_id}": (update_data, 10),
+        "GET /templates/{template_id}/data": (list_data, 20),
+    },
+    # Dashboards polling totals and charts
+    "dashboard": {
+        "GET /templates/summary": (templates_summary, 15),
+        "GET /templates/": (list_templates, 15),
+        "GET /templates/{template_id}": (template_details, 10),
+        "GET /templates/{template_id}/data/summary": (summary, 25),
+        "GET /templates/{template_id}/data/sum": (sum_cantidad, 25),
+        "GET /templates/{template_id}/data/aggregate": (aggregate, 15),
+        "GET /templates/{template_id}/data": (list_data, 10),
+    },
+    # Full exports of a template
+    "export": {
+        "GET /templates/{template_id}/data/export?format=csv": (export_csv, 50),
+        "GET /templates/{template_id}/data/export?format=ndjson&gzip": (export_ndjson_gzip, 50),
+    },
+}
+# Mostly logging, some polling and the occasional export
+SCENARIOS["mixed"] = {
+    "POST /templates/{template_id}/data": (create_data, 40),
+    "PUT /templates/{template_id}/data/{data_id}": (update_data, 5),
+    "GET /templates/{template_id}/data": (list_data, 15),
+    "GET /templates/": (list_templates, 8),
+    "GET /templates/{template_id}": (template_details, 5),
+    "GET /templates/{template_id}/data/summary": (summary, 10),
+    "GET /templates/{template_id}/data/sum": (sum_cantidad, 10),
+    "GET /templates/{template_id}/data/aggregate": (aggregate, 5),
+    "GET /templates/{template_id}/data/export?format=csv": (export_csv, 1),
+    "GET /templates/{template_id}/data/export?format=ndjson&gzip": (export_ndjson_gzip, 1),
+}
+
+
+def percentile(sorted_values: list[float], fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def summarize(latencies: dict[str, list[float]], errors: dict[str, int], elapsed: float) -> dict:
+    endpoints = {}
+    for label, values in sorted(latencies.items()):
+        values = sorted(values)
+        endpoints[label] = {
+            "requests": len(values),
+            "errors": errors.get(label, 0),
+            "throughput": len(values) / elapsed,
+            "mean_ms": sum(values) / len(values) * 1000,
+            "p50_ms": percentile(values, 0.50) * 1000,
+            "p95_ms": percentile(values, 0.95) * 1000,
+            "p99_ms": percentile(values, 0.99) * 1000,
+        }
+    all_values = sorted(value for values in latencies.values() for value in values)
+    return {
+        "requests": len(all_values),
+        "errors": sum(errors.values()),
+        "throughput": len(all_values) / elapsed,
+        "p50_ms": percentile(all_values, 0.50) * 1000,
+        "p95_ms": percentile(all_values, 0.95) * 1000,
+        "p99_ms": percentile(all_values, 0.99) * 1000,
+        "endpoints": endpoints,
+    }
+
+
+def compare(result: dict, baseline: dict, threshold: float) -> list[str]:
+    """Endpoints whose p95 latency grew, or throughput dropped, by more than `threshold`"""
+    regressions = []
+    for label, current in result["endpoints"].items():
+        previous = baseline.get("endpoints", {}).get(label)
+        if not previous:
+            continue
+        if previous["p95_ms"] and current["p95_ms"] > previous["p95_ms"] * (1 + threshold):
+            regressions.append(f"{label}: p95 {previous['p95_ms']:.1f}ms -> {current['p95_ms']:.1f}ms")
+        if previous["throughput"] and current["throughput"] < previous["throughput"] * (1 - threshold):
+            regressions.append(f"{label}: throughput {previous['throughput']:.1f}/s -> {current['throughput']:.1f}/s")
+    return regressions
+
+
+def print_report(result: dict) -> None:
+    print(f"{'endpoint':<62} {'req':>7} {'err':>5} {'req/s':>8} {'p50':>8} {'p95':>8} {'p99':>8}")
+    for label, stats in result["endpoints"].items():
+        print(
+            f"{label:<62} {stats['requests']:>7} {stats['errors']:>5} {stats['throughput']:>8.1f} "
+            f"{stats['p50_ms']:>8.1f} {stats['p95_ms']:>8.1f} {stats['p99_ms']:>8.1f}"
+        )
+    print(
+        f"{'total':<62} {result['requests']:>7} {result['errors']:>5} {result['throughput']:>8.1f} "
+        f"{result['p50_ms']:>8.1f} {result['p95_ms']:>8.1f} {result['p99_ms']:>8.1f}"
+    )
+    if "backend_requests" in result:
+        print(f"\nSupabase requests: {result['backend_requests']} ({result['backend_requests_per_request']:.2f} per API request)")
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def _wait_for_port(port: int, timeout: float = 30) -> None:
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            _, writer = await asyncio.open_connection("127.0.0.1", port)
+            writer.close()
+            return
+        except OSError:
+            if time.monotonic() > deadline:
+                raise
+            await asyncio.sleep(0.1)
+
+
+async def login(api: httpx.AsyncClient, index: int, random_seed: int) -> VirtualUser:
+    email = user_email(index)
+    response = await api.post("/auth/login", json={"email": email, "password": BENCHMARK_PASSWORD})
+    response.raise_for_status()
+    headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+    templates = await api.get("/templates/", headers=headers)
+    templates.raise_for_status()
+    template_ids = [template["id"] for template in templates.json()["templates"]]
+    return VirtualUser(email, headers, template_ids, [], random.Random(random_seed + index))
+
+
+async def copy_to_sqlite(backend: FakeSupabase, repository: SQLiteRepository) -> None:
+    """Load the seeded templates and rows into the embedded storage"""
+    rows_by_template: dict[str, list[dict]] = {}
+    for row in backend.table("template_data").rows.values():
+        rows_by_template.setdefault(row["template_id"], []).append(row)
+    for template in backend.table("templates").rows.values():
+        created = await repository.create_template(template["user_id"], template["name"], template["fields"])
+        rows = [
+            {"template_id": created["id"], "user_id": row["user_id"], "values": row["values"], "created_at": row["created_at"]}
+            for row in rows_by_template.get(template["id"], [])
+        ]
+        if rows:
+            await repository.insert_data_batch(rows)
+
+
+async def run(args: argparse.Namespace) -> dict:
+    latency = args.latency_ms / 1000
+    jitter = args.jitter_ms / 1000
+    backend_process: Optional[subprocess.Popen] = None
+
+    if args.backend == "localhost":
+        port = _free_port()
+        backend_process = subprocess.Popen([
+            sys.executable, "-m", "benchmarks.fake_backend", "--port", str(port),
+            "--latency-ms", str(args.latency_ms), "--jitter-ms", str(args.jitter_ms),
+            "--users", str(args.users), "--templates", str(args.templates),
+            "--records", str(args.records), "--seed", str(args.seed),
+        ], env={**os.environ, "SUPABASE_JWT_SECRET": os.environ["SUPABASE_JWT_SECRET"]})
+        await _wait_for_port(port)
+        supabase_url = f"http://127.0.0.1:{port}"
+        http_client = create_http_client()
+    else:
+        backend = FakeSupabase(latency, jitter)
+        seed(backend, args.users, args.templates, args.records, args.seed)
+        supabase_url = os.environ["SUPABASE_URL"]
+        http_client = create_http_client(transport=httpx.ASGITransport(backend.app))
+
+    supabase = await acreate_client(supabase_url, os.environ["SUPABASE_KEY"], options=AsyncClientOptions(httpx_client=http_client))
+
+    async def benchmark_supabase_client():
+        return supabase
+
+    repository: Repository = SupabaseRepository(supabase)
+    if args.backend == "sqlite":
+        repository = SQLiteRepository(":memory:")
+        await copy_to_sqlite(backend, repository)
+
+    async def benchmark_repository():
+        return repository
+
+    app.dependency_overrides[get_supabase_client] = benchmark_supabase_client
+    app.dependency_overrides[get_repository] = benchmark_repository
+    if args.write_behind:
+        write_behind.directory = tempfile.mkdtemp(prefix="write-behind-")
+        await write_behind.start(repository)
+    scenario = SCENARIOS[args.scenario]
+    labels = list(scenario)
+    operations = [scenario[label][0] for label in labels]
+    weights = [scenario[label][1] for label in labels]
+    latencies: dict[str, list[float]] = {label: [] for label in labels}
+    errors: dict[str, int] = {}
+
+    try:
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app), base_url="http://api", timeout=None) as api:
+            users = [await login(api, i % args.users, args.seed) for i in range(args.concurrency)]
+            deadline = time.perf_counter() + args.warmup
+
+            async def virtual_user(user: VirtualUser, record: bool) -> None:
+                while time.perf_counter() < deadline:
+                    index = user.rng.choices(range(len(labels)), weights)[0]
+                    start = time.perf_counter()
+                    try:
+                        response = await operations[index](api, user)
+                        failed = response.status_code >= 400
+                    except Exception:
+                        failed = True
+                    if record:
+                        latencies[labels[index]].append(time.perf_counter() - start)
+                        if failed:
+                            errors[labels[index]] = errors.get(labels[index], 0) + 1
+
+            if args.warmup > 0:
+                await asyncio.gather(*(virtual_user(user, False) for user in users))
+
+            backend_requests_before = sum(backend_requests_total.values.values())
+            started = time.perf_counter()
+            deadline = started + args.duration
+            await asyncio.gather(*(virtual_user(user, True) for user in users))
+            elapsed = time.perf_counter() - started
+            backend_requests = sum(backend_requests_total.values.values()) - backend_requests_before
+    finally:
+        await write_behind.stop()
+        app.dependency_overrides.pop(get_supabase_client, None)
+        app.dependency_overrides.pop(get_repository, None)
+        await repository.close()
+        await http_client.aclose()
+        if backend_process is not None:
+            backend_process.terminate()
+            backend_process.wait()
+
+    result = summarize({label: values for label, values in latencies.items() if values}, errors, elapsed)
+    result["backend_requests"] = backend_requests
+    result["backend_requests_per_request"] = backend_requests / result["requests"] if result["requests"] else 0.0
+    result["config"] = {
+        key: getattr(args, key)
+        for key in ("scenario", "backend", "write_behind", "duration", "concurrency", "latency_ms", "jitter_ms", "users", "templates", "records", "seed")
+    }
+    return result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.load")
+    parser.add_argument("--scenario", choices=sorted(SCENARIOS), default="mixed")
+    parser.add_argument("--backend", choices=("inprocess", "localhost", "sqlite"), default="inprocess")
+    parser.add_argument("--write-behind", action="store_true", help="Accept data entries into the write-behind queue")
+    parser.add_argument("--duration", type=float, default=10, help="Measured seconds")
+    parser.add_argument("--warmup", type=float, default=2, help="Unmeasured seconds before the run")
+    parser.add_argument("--concurrency", type=int, default=20, help="Virtual users sending requests at the same time")
+    parser.add_argument("--latency-ms", type=float, default=5, help="Backend round trip latency")
+    parser.add_argument("--jitter-ms", type=float, default=2, help="Random extra backend latency, up to this value")
+    parser.add_argument("--users", type=int, default=10, help="Seeded users")
+    parser.add_argument("--templates", type=int, default=2, help="Seeded templates per user")
+    parser.add_argument("--records", type=int, default=1000, help="Seeded rows per template")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default="benchmark-results.json", help="Where to write the JSON results")
+    parser.add_argument("--baseline", help="Previous results to compare against")
+    parser.add_argument("--threshold", type=float, default=0.10, help="Allowed relative regression (0.10 = 10%%)")
+    args = parser.parse_args()
+
+    result = asyncio.run(run(args))
+    print_report(result)
+    with open(args.output, "w") as f:
+        json.dump(result, f, indent=2)
+    print(f"\nResults written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(result, baseline, args.threshold)
+        if regressions:
+            print(f"\nRegressions over {args.threshold:.0%}:")
+            for regression in regressions:
+                print(f"  {regression}")
+            sys.exit(1)
+        print(f"\nNo regressions over {args.threshold:.0%} against {args.baseline}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""Microbenchmark: encoding a page of template data rows as a JSON response.
+
+Run with: python -m benchmarks.serialization
+"""
+from datetime import datetime, timedelta, timezone
+import json
+import os
+import random
+import timeit
+import uuid
+
+# The app reads its configuration at import time
+os.environ.setdefault("SUPABASE_JWT_SECRET", "benchmark-secret-benchmark-secret-0000")
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from app.responses import FastJSONResponse
+from app.routers.template_data import TemplateDataPage
+
+ROW_COUNTS = (100, 1000, 10000)
+
+
+def build_rows(count: int) -> list[dict]:
+    rng = random.Random(0)
+    template_id, user_id = str(uuid.uuid4()), str(uuid.uuid4())
+    start = datetime.now(timezone.utc)
+    return [
+        {
+            "id": str(uuid.uuid4()),
+            "template_id": template_id,
+            "user_id": user_id,
+            "values": {"Cantidad": rng.randint(100, 1000), "Tipo": "agua", "Precio": 1.5, "Pagado": True},
+            "created_at": (start - timedelta(minutes=i)).isoformat(),
+        }
+        for i in range(count)
+    ]
+
+
+def run(repeat: int = 3) -> None:
+    print(f"{'rows':>6} {'jsonable+json (ms)':>19} {'response model (ms)':>20} {'direct (ms)':>12} {'speedup':>8}")
+    for row_count in ROW_COUNTS:
+        payload = {"data": build_rows(row_count), "next_cursor": None}
+        number = max(1, 10000 // row_count)
+
+        def legacy():
+            return JSONResponse(jsonable_encoder(payload))
+
+        def response_model():
+            return FastJSONResponse(TemplateDataPage.model_validate(payload).model_dump(mode="json"))
+
+        def direct():
+            return FastJSONResponse(payload)
+
+        assert json.loads(legacy().body) == json.loads(direct().body) == json.loads(response_model().body)
+        timings = [min(timeit.repeat(fn, number=number, repeat=repeat)) / number for fn in (legacy, response_model, direct)]
+        print(
+            f"{row_count:>6} {timings[0] * 1e3:>19.1f} {timings[1] * 1e3:>20.1f} "
+            f"{timings[2] * 1e3:>12.1f} {timings[0] / timings[2]:>7.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,132 @@
+"""Cold start benchmark: time until every worker of a production launch is ready.
+
+Starts the Supabase stand-in (benchmarks.fake_backend) on localhost, then
+`uvicorn app.main:app --workers N` against it. It reports the time until all
+workers finished their lifespan startup and until /health answers, and fails
+when that exceeds the budget.
+
+Run with: python -m benchmarks.startup --workers 4 --budget 3
+"""
+from typing import Optional
+import argparse
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+import urllib.request
+
+READY_LINE = "Application startup complete"
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _wait_for_port(port: int, timeout: float) -> None:
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=1).close()
+            return
+        except OSError:
+            if time.monotonic() > deadline:
+                raise
+            time.sleep(0.05)
+
+
+def _healthy(port: int) -> bool:
+    try:
+        with urllib.request.urlopen(f"http://127.0.0.1:{port}/health", timeout=1) as response:
+            return response.status == 200
+    except OSError:
+        return False
+
+
+def measure(workers: int, env: dict, timeout: float) -> tuple[float, float]:
+    """Seconds until every worker is ready, and until /health first answers"""
+    port = _free_port()
+    started = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port),
+         "--workers", str(workers), "--no-access-log"],
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+        text=True,
+    )
+    ready_workers = 0
+    all_ready: Optional[float] = None
+    lines_done = threading.Event()
+
+    def read_logs() -> None:
+        nonlocal ready_workers, all_ready
+        for line in server.stderr:
+            if READY_LINE in line:
+                ready_workers += 1
+                if ready_workers == workers:
+                    all_ready = time.perf_counter() - started
+                    lines_done.set()
+            elif "error" in line.lower():
+                print(line, end="", file=sys.stderr)
+
+    threading.Thread(target=read_logs, daemon=True).start()
+    try:
+        first_health = None
+        deadline = time.monotonic() + timeout
+        while first_health is None and time.monotonic() < deadline:
+            if _healthy(port):
+                first_health = time.perf_counter() - started
+            else:
+                time.sleep(0.01)
+        lines_done.wait(max(0.0, deadline - time.monotonic()))
+        if all_ready is None or first_health is None:
+            raise TimeoutError(f"Only {ready_workers} of {workers} workers ready after {timeout}s")
+        return all_ready, first_health
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.startup")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--latency-ms", type=float, default=20, help="Supabase round trip latency")
+    parser.add_argument("--budget", type=float, default=3.0, help="Maximum seconds until all workers are ready")
+    parser.add_argument("--timeout", type=float, default=60)
+    args = parser.parse_args()
+
+    backend_port = _free_port()
+    env = {
+        **os.environ,
+        "SUPABASE_URL": f"http://127.0.0.1:{backend_port}",
+        "SUPABASE_KEY": "benchmark-anon-key",
+        "SUPABASE_JWT_SECRET": os.environ.get("SUPABASE_JWT_SECRET", "benchmark-secret-benchmark-secret-0000"),
+    }
+    backend = subprocess.Popen(
+        [sys.executable, "-m", "benchmarks.fake_backend", "--port", str(backend_port),
+         "--latency-ms", str(args.latency_ms), "--users", "0"],
+        env=env,
+    )
+    try:
+        _wait_for_port(backend_port, args.timeout)
+        results = [measure(args.workers, env, args.timeout) for _ in range(args.runs)]
+    finally:
+        backend.terminate()
+        backend.wait()
+
+    for run, (all_ready, first_health) in enumerate(results, 1):
+        print(f"run {run}: {args.workers} workers ready in {all_ready * 1000:.0f} ms, first /health at {first_health * 1000:.0f} ms")
+    worst = max(all_ready for all_ready, _ in results)
+    if worst > args.budget:
+        print(f"Startup over budget: {worst * 1000:.0f} ms > {args.budget * 1000:.0f} ms")
+        sys.exit(1)
+    print(f"Startup within budget: {worst * 1000:.0f} ms <= {args.budget * 1000:.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""Microbenchmark: legacy per-field validation loop vs compiled pydantic-core validators.
+
+Run with: python -m benchmarks.validators
+"""
+from datetime import datetime
+from typing import Any
+import timeit
+
+from app.validation import TemplateValidator
+
+FIELD_COUNTS = (5, 50, 500)
+FIELD_TYPES = ("string", "int", "float", "boolean", "date")
+SAMPLE_VALUES = {
+    "string": "Marca",
+    "int": 250,
+    "float": "1.5",
+    "boolean": True,
+    "date": "2025-05-01T10:30:00",
+}
+
+
+def legacy_validate_field_value(field_type: str, value: Any) -> bool:
+    """Validator used by the routers before templates were compiled"""
+    try:
+        if field_type == "string":
+            return isinstance(value, str)
+        elif field_type == "int":
+            if isinstance(value, str):
+                int(value)
+            return isinstance(value, (int, str))
+        elif field_type == "float":
+            if isinstance(value, str):
+                float(value)
+            return isinstance(value, (float, str))
+        elif field_type == "boolean":
+            return isinstance(value, bool)
+        elif field_type == "date":
+            if isinstance(value, str):
+                datetime.fromisoformat(value)
+                return True
+            return False
+        else:
+            return True
+    except (ValueError, TypeError):
+        return False
+
+
+def legacy_validate(fields: list[dict], values: dict) -> list[str]:
+    field_errors = []
+    for field in fields:
+        field_name = field["name"]
+        field_type = field["type"]
+        if field_name not in values:
+            continue
+        if not legacy_validate_field_value(field_type, values[field_name]):
+            field_errors.append(f"El valor para el campo '{field_name}' no es del tipo esperado: {field_type}")
+    return field_errors
+
+
+def build_template(field_count: int) -> tuple[list[dict], dict]:
+    fields = [
+        {"name": f"field_{i}", "type": FIELD_TYPES[i % len(FIELD_TYPES)], "display_unit": None}
+        for i in range(field_count)
+    ]
+    values = {field["name"]: SAMPLE_VALUES[field["type"]] for field in fields}
+    return fields, values
+
+
+def run(repeat: int = 5) -> None:
+    print(f"{'fields':>6} {'legacy (us)':>12} {'compiled (us)':>14} {'speedup':>8}")
+    for field_count in FIELD_COUNTS:
+        fields, values = build_template(field_count)
+        validator = TemplateValidator(fields)
+        assert legacy_validate(fields, values) == validator.validate(values) == []
+
+        number = max(1, 20000 // field_count)
+        legacy = min(timeit.repeat(lambda: legacy_validate(fields, values), number=number, repeat=repeat)) / number
+        compiled = min(timeit.repeat(lambda: validator.validate(values), number=number, repeat=repeat)) / number
+        print(f"{field_count:>6} {legacy * 1e6:>12.1f} {compiled * 1e6:>14.1f} {legacy / compiled:>7.1f}x")
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,3 @@
+-- Keyset pagination of template data: rows of a template newest first, by (created_at, id)
+create index if not exists template_data_keyset_idx
+    on public.template_data (template_id, user_id, created_at desc, id desc);
@@ -0,0 +1,48 @@
+-- Numeric value of a template data field: only JSON numbers count, anything
+-- else (including strings holding a number) is skipped, as the Python sum did
+create or replace function public.template_data_number(p_value jsonb)
+returns numeric
+language sql
+immutable
+as $$
+    select case when jsonb_typeof(p_value) = 'number' then (p_value #>> '{}')::numeric end
+$$;
+
+-- Aggregates of one numeric field of a template, optionally grouped by another
+-- field and/or by a time bucket on created_at. Only the aggregated rows are returned.
+create or replace function public.aggregate_template_data(
+    p_template_id uuid,
+    p_user_id uuid,
+    p_field text,
+    p_group_by text default null,
+    p_bucket text default null
+)
+returns table (
+    group_value text,
+    bucket timestamptz,
+    records bigint,
+    count bigint,
+    sum numeric,
+    avg numeric,
+    min numeric,
+    max numeric
+)
+language sql
+stable
+as $$
+    select
+        case when p_group_by is null then null else d.values ->> p_group_by end,
+        case when p_bucket is null then null else date_trunc(p_bucket, d.created_at) end,
+        count(*),
+        count(n.value),
+        sum(n.value),
+        avg(n.value),
+        min(n.value),
+        max(n.value)
+    from public.template_data d
+    cross join lateral (select public.template_data_number(d.values -> p_field) as value) n
+    where d.template_id = p_template_id
+      and d.user_id = p_user_id
+    group by 1, 2
+    order by 2 nulls first, 1 nulls first
+$$;
@@ -0,0 +1,187 @@
+-- Running totals per template, maintained incrementally from template_data writes.
+-- `fields` holds, for every int/float field of the template:
+--   {"<field>": {"count": n, "sum": s, "min": m, "max": M}}
+create table if not exists public.template_summaries (
+    template_id uuid primary key references public.templates (id) on delete cascade,
+    user_id uuid not null,
+    record_count bigint not null default 0,
+    fields jsonb not null default '{}'::jsonb,
+    updated_at timestamptz not null default now()
+);
+
+create index if not exists template_summaries_user_idx on public.template_summaries (user_id);
+
+-- Apply a set of row changes to the summaries. Each change is
+-- {"t": template_id, "u": user_id, "v": values, "s": +1 for added rows / -1 for removed rows}
+create or replace function public.apply_template_summary_changes(p_changes jsonb)
+returns void
+language plpgsql
+as $$
+declare
+    r record;
+    v_current jsonb;
+    v_count bigint;
+    v_sum numeric;
+    v_min numeric;
+    v_max numeric;
+begin
+    if p_changes is null or jsonb_array_length(p_changes) = 0 then
+        return;
+    end if;
+
+    -- Record counts
+    for r in
+        select (c ->> 't')::uuid as template_id, (c ->> 'u')::uuid as user_id, sum((c ->> 's')::int) as records
+        from jsonb_array_elements(p_changes) c
+        group by 1, 2
+    loop
+        -- Templates deleted in the same transaction are skipped
+        insert into public.template_summaries as s (template_id, user_id, record_count)
+        select r.template_id, r.user_id, r.records
+        where exists (select 1 from public.templates where id = r.template_id)
+        on conflict (template_id) do update
+            set record_count = s.record_count + excluded.record_count,
+                updated_at = now();
+    end loop;
+
+    -- Per numeric field deltas
+    for r in
+        select
+            ch.template_id,
+            f.name as field,
+            sum(ch.sign) as count,
+            sum(ch.sign * n.value) as sum,
+            min(n.value) filter (where ch.sign > 0) as added_min,
+            max(n.value) filter (where ch.sign > 0) as added_max,
+            min(n.value) filter (where ch.sign < 0) as removed_min,
+            max(n.value) filter (where ch.sign < 0) as removed_max
+        from (
+            select (c ->> 't')::uuid as template_id, c -> 'v' as values, (c ->> 's')::int as sign
+            from jsonb_array_elements(p_changes) c
+        ) ch
+        join public.templates t on t.id = ch.template_id
+        cross join lateral jsonb_to_recordset(t.fields) as f (name text, type text)
+        cross join lateral (select public.template_data_number(ch.values -> f.name) as value) n
+        where f.type in ('int', 'float')
+          and n.value is not null
+        group by 1, 2
+    loop
+        select fields -> r.field into v_current
+        from public.template_summaries
+        where template_id = r.template_id
+        for update;
+
+        v_count := coalesce((v_current ->> 'count')::bigint, 0) + r.count;
+        v_sum := coalesce((v_current ->> 'sum')::numeric, 0) + r.sum;
+        v_min := (v_current ->> 'min')::numeric;
+        v_max := (v_current ->> 'max')::numeric;
+
+        if (r.removed_min is not null and r.removed_min <= v_min)
+            or (r.removed_max is not null and r.removed_max >= v_max) then
+            -- A removed value was the current minimum or maximum: recompute those from the rows
+            select min(n.value), max(n.value) into v_min, v_max
+            from public.template_data d
+            cross join lateral (select public.template_data_number(d.values -> r.field) as value) n
+            where d.template_id = r.template_id;
+        else
+            v_min := least(v_min, r.added_min);
+            v_max := greatest(v_max, r.added_max);
+        end if;
+
+        update public.template_summaries
+        set fields = jsonb_set(
+                fields,
+                array[r.field],
+                jsonb_build_object('count', v_count, 'sum', v_sum, 'min', v_min, 'max', v_max)
+            ),
+            updated_at = now()
+        where template_id = r.template_id;
+    end loop;
+end;
+$$;
+
+-- Statement level trigger: all rows written by one statement are applied at once
+create or replace function public.template_summaries_on_change()
+returns trigger
+language plpgsql
+as $$
+declare
+    v_changes jsonb;
+begin
+    if TG_OP = 'INSERT' then
+        select jsonb_agg(jsonb_build_object('t', template_id, 'u', user_id, 'v', values, 's', 1))
+        into v_changes from new_rows;
+    elsif TG_OP = 'DELETE' then
+        select jsonb_agg(jsonb_build_object('t', template_id, 'u', user_id, 'v', values, 's', -1))
+        into v_changes from old_rows;
+    else
+        select jsonb_agg(c) into v_changes from (
+            select jsonb_build_object('t', template_id, 'u', user_id, 'v', values, 's', -1) as c from old_rows
+            union all
+            select jsonb_build_object('t', template_id, 'u', user_id, 'v', values, 's', 1) from new_rows
+        ) changes;
+    end if;
+
+    perform public.apply_template_summary_changes(v_changes);
+    return null;
+end;
+$$;
+
+drop trigger if exists template_summaries_insert on public.template_data;
+create trigger template_summaries_insert
+    after insert on public.template_data
+    referencing new table as new_rows
+    for each statement execute function public.template_summaries_on_change();
+
+drop trigger if exists template_summaries_update on public.template_data;
+create trigger template_summaries_update
+    after update on public.template_data
+    referencing old table as old_rows new table as new_rows
+    for each statement execute function public.template_summaries_on_change();
+
+drop trigger if exists template_summaries_delete on public.template_data;
+create trigger template_summaries_delete
+    after delete on public.template_data
+    referencing old table as old_rows
+    for each statement execute function public.template_summaries_on_change();
+
+-- Recompute summaries from the raw rows (one template, or all of them)
+create or replace function public.rebuild_template_summaries(p_template_id uuid default null)
+returns integer
+language plpgsql
+as $$
+declare
+    v_rebuilt integer;
+begin
+    delete from public.template_summaries
+    where p_template_id is null or template_id = p_template_id;
+
+    insert into public.template_summaries (template_id, user_id, record_count, fields)
+    select
+        t.id,
+        t.user_id,
+        (select count(*) from public.template_data d where d.template_id = t.id),
+        coalesce((
+            select jsonb_object_agg(f.name, jsonb_build_object(
+                'count', a.count, 'sum', coalesce(a.sum, 0), 'min', a.min, 'max', a.max
+            ))
+            from jsonb_to_recordset(t.fields) as f (name text, type text)
+            cross join lateral (
+                select count(n.value) as count, sum(n.value) as sum, min(n.value) as min, max(n.value) as max
+                from public.template_data d
+                cross join lateral (select public.template_data_number(d.values -> f.name) as value) n
+                where d.template_id = t.id
+            ) a
+            where f.type in ('int', 'float')
+              and a.count > 0
+        ), '{}'::jsonb)
+    from public.templates t
+    where p_template_id is null or t.id = p_template_id;
+
+    get diagnostics v_rebuilt = row_count;
+    return v_rebuilt;
+end;
+$$;
+
+-- Backfill existing data
+select public.rebuild_template_summaries();
@@ -0,0 +1,30 @@
+-- Delete a template owned by the user in a single round trip.
+-- Returns 'deleted', 'not_found' (missing or not owned) or 'has_data' (data exists and p_force is false).
+create or replace function public.delete_template(
+    p_template_id uuid,
+    p_user_id uuid,
+    p_force boolean default false
+)
+returns text
+language plpgsql
+as $$
+begin
+    perform 1 from public.templates
+    where id = p_template_id and user_id = p_user_id
+    for update;
+
+    if not found then
+        return 'not_found';
+    end if;
+
+    if exists (select 1 from public.template_data where template_id = p_template_id) then
+        if not p_force then
+            return 'has_data';
+        end if;
+        delete from public.template_data where template_id = p_template_id;
+    end if;
+
+    delete from public.templates where id = p_template_id;
+    return 'deleted';
+end;
+$$;
@@ -0,0 +1,99 @@
+-- Version counters used as ETags for conditional GETs. Keys:
+--   'templates:<user_id>'          bumped on any write to the user's templates
+--   'template_data:<template_id>'  bumped on any write to the template's data
+-- A missing row means version 0.
+create table if not exists public.resource_versions (
+    key text primary key,
+    version bigint not null default 0
+);
+
+-- Bump every key once, however many rows of the statement map to it
+create or replace function public.bump_resource_versions(p_keys text[])
+returns void
+language sql
+as $$
+    insert into public.resource_versions as v (key, version)
+    select distinct k, 1
+    from unnest(p_keys) k
+    where k is not null
+    order by 1
+    on conflict (key) do update
+        set version = v.version + 1;
+$$;
+
+-- Statement level triggers: one bump per statement and key
+create or replace function public.templates_bump_version()
+returns trigger
+language plpgsql
+as $$
+begin
+    if TG_OP = 'INSERT' then
+        perform public.bump_resource_versions(array(select 'templates:' || user_id from new_rows));
+    elsif TG_OP = 'DELETE' then
+        perform public.bump_resource_versions(array(select 'templates:' || user_id from old_rows));
+    else
+        perform public.bump_resource_versions(array(
+            select 'templates:' || user_id from old_rows
+            union
+            select 'templates:' || user_id from new_rows
+        ));
+    end if;
+    return null;
+end;
+$$;
+
+create or replace function public.template_data_bump_version()
+returns trigger
+language plpgsql
+as $$
+begin
+    if TG_OP = 'INSERT' then
+        perform public.bump_resource_versions(array(select 'template_data:' || template_id from new_rows));
+    elsif TG_OP = 'DELETE' then
+        perform public.bump_resource_versions(array(select 'template_data:' || template_id from old_rows));
+    else
+        perform public.bump_resource_versions(array(
+            select 'template_data:' || template_id from old_rows
+            union
+            select 'template_data:' || template_id from new_rows
+        ));
+    end if;
+    return null;
+end;
+$$;
+
+drop trigger if exists templates_version_insert on public.templates;
+create trigger templates_version_insert
+    after insert on public.templates
+    referencing new table as new_rows
+    for each statement execute function public.templates_bump_version();
+
+drop trigger if exists templates_version_update on public.templates;
+create trigger templates_version_update
+    after update on public.templates
+    referencing old table as old_rows new table as new_rows
+    for each statement execute function public.templates_bump_version();
+
+drop trigger if exists templates_version_delete on public.templates;
+create trigger templates_version_delete
+    after delete on public.templates
+    referencing old table as old_rows
+    for each statement execute function public.templates_bump_version();
+
+drop trigger if exists template_data_version_insert on public.template_data;
+create trigger template_data_version_insert
+    after insert on public.template_data
+    referencing new table as new_rows
+    for each statement execute function public.template_data_bump_version();
+
+drop trigger if exists template_data_version_update on public.template_data;
+create trigger template_data_version_update
+    after update on public.template_data
+    referencing old table as old_rows new table as new_rows
+    for each statement execute function public.template_data_bump_version();
+
+drop trigger if exists template_data_version_delete on public.template_data;
+create trigger template_data_version_delete
+    after delete on public.template_data
+    referencing old table as old_rows
+    for each statement execute function public.template_data_bump_version();
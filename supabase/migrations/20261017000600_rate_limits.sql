@@ -0,0 +1,49 @@
+-- Token buckets shared by every API worker (RATE_LIMIT_BACKEND=supabase).
+-- Unlogged: losing the buckets on a crash only resets the limits.
+create unlogged table if not exists public.rate_limit_buckets (
+    key text primary key,
+    tokens double precision not null,
+    updated_at timestamptz not null default clock_timestamp()
+);
+
+-- Refill the bucket for the elapsed time and take one token.
+-- Returns 0 when allowed, else the seconds until a token is available.
+create or replace function public.take_rate_limit_token(
+    p_key text,
+    p_rate double precision,
+    p_burst double precision
+)
+returns double precision
+language plpgsql
+as $$
+declare
+    v_now timestamptz := clock_timestamp();
+    v_tokens double precision;
+begin
+    insert into public.rate_limit_buckets as b (key, tokens, updated_at)
+    values (p_key, p_burst, v_now)
+    on conflict (key) do update
+        set tokens = least(p_burst, b.tokens + extract(epoch from v_now - b.updated_at) * p_rate),
+            updated_at = v_now
+    returning tokens into v_tokens;
+
+    if v_tokens >= 1 then
+        update public.rate_limit_buckets set tokens = tokens - 1 where key = p_key;
+        return 0;
+    end if;
+    return (1 - v_tokens) / p_rate;
+end;
+$$;
+
+-- Buckets idle for a day are full again anyway
+create or replace function public.prune_rate_limit_buckets()
+returns integer
+language sql
+as $$
+    with pruned as (
+        delete from public.rate_limit_buckets
+        where updated_at < now() - interval '1 day'
+        returning 1
+    )
+    select count(*)::integer from pruned;
+$$;
@@ -0,0 +1,59 @@
+-- Dashboard: every template of a user with its running totals and last entry, in one call
+create or replace function public.user_templates_summary(p_user_id uuid)
+returns jsonb
+language sql
+stable
+as $$
+    select coalesce(jsonb_agg(jsonb_build_object(
+        'template_id', t.id,
+        'name', t.name,
+        'fields', t.fields,
+        'record_count', coalesce(s.record_count, 0),
+        'totals', coalesce(s.fields, '{}'::jsonb),
+        'last_entry_at', l.created_at
+    ) order by t.created_at, t.id), '[]'::jsonb)
+    from public.templates t
+    left join public.template_summaries s on s.template_id = t.id
+    -- Newest entry from the keyset index (template_id, user_id, created_at desc, id desc)
+    left join lateral (
+        select d.created_at
+        from public.template_data d
+        where d.template_id = t.id and d.user_id = p_user_id
+        order by d.created_at desc
+        limit 1
+    ) l on true
+    where t.user_id = p_user_id;
+$$;
+
+-- Data writes also bump a per-user version ('user_data:<user_id>'), the ETag of the dashboard
+create or replace function public.template_data_bump_version()
+returns trigger
+language plpgsql
+as $$
+begin
+    if TG_OP = 'INSERT' then
+        perform public.bump_resource_versions(array(
+            select 'template_data:' || template_id from new_rows
+            union
+            select 'user_data:' || user_id from new_rows
+        ));
+    elsif TG_OP = 'DELETE' then
+        perform public.bump_resource_versions(array(
+            select 'template_data:' || template_id from old_rows
+            union
+            select 'user_data:' || user_id from old_rows
+        ));
+    else
+        perform public.bump_resource_versions(array(
+            select 'template_data:' || template_id from old_rows
+            union
+            select 'template_data:' || template_id from new_rows
+            union
+            select 'user_data:' || user_id from old_rows
+            union
+            select 'user_data:' || user_id from new_rows
+        ));
+    end if;
+    return null;
+end;
+$$;
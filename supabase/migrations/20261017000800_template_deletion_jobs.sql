@@ -0,0 +1,239 @@
+-- Force deletion of templates with data: the template is hidden right away and
+-- its data is deleted by a background job, in bounded id ranges.
+
+-- Hidden templates (deletion in progress) are left out of every read
+alter table public.templates add column if not exists deleted_at timestamptz;
+
+-- Id range scans of a template's rows, one chunk at a time
+create index if not exists template_data_template_id_idx
+    on public.template_data (template_id, id);
+
+create table if not exists public.template_deletion_jobs (
+    id uuid primary key default gen_random_uuid(),
+    -- No foreign key: the template row is deleted when the job finishes
+    template_id uuid not null,
+    user_id uuid not null,
+    status text not null default 'pending' check (status in ('pending', 'running', 'done')),
+    -- Estimated from the template summary when the job is created
+    total_rows bigint not null default 0,
+    deleted_rows bigint not null default 0,
+    -- Resume point: rows with a smaller id have been deleted
+    last_id uuid,
+    -- A job whose lease expired (its worker died) can be claimed by another worker
+    lease_until timestamptz,
+    error text,
+    created_at timestamptz not null default now(),
+    updated_at timestamptz not null default now(),
+    finished_at timestamptz
+);
+
+create index if not exists template_deletion_jobs_template_idx
+    on public.template_deletion_jobs (template_id);
+create index if not exists template_deletion_jobs_unfinished_idx
+    on public.template_deletion_jobs (created_at)
+    where status <> 'done';
+
+-- Delete a template owned by the user.
+-- Returns {"status": "deleted" | "not_found" | "has_data"}, or {"status": "queued", "job_id": ...}
+-- when p_force is set and the template has data: it is hidden and its data is
+-- left to public.delete_template_data_chunk.
+drop function if exists public.delete_template(uuid, uuid, boolean);
+create or replace function public.delete_template(
+    p_template_id uuid,
+    p_user_id uuid,
+    p_force boolean default false
+)
+returns jsonb
+language plpgsql
+as $$
+declare
+    v_job_id uuid;
+begin
+    perform 1 from public.templates
+    where id = p_template_id and user_id = p_user_id and deleted_at is null
+    for update;
+
+    if not found then
+        return jsonb_build_object('status', 'not_found');
+    end if;
+
+    if not exists (select 1 from public.template_data where template_id = p_template_id) then
+        delete from public.templates where id = p_template_id;
+        return jsonb_build_object('status', 'deleted');
+    end if;
+
+    if not p_force then
+        return jsonb_build_object('status', 'has_data');
+    end if;
+
+    update public.templates set deleted_at = now() where id = p_template_id;
+
+    insert into public.template_deletion_jobs (template_id, user_id, total_rows)
+    values (
+        p_template_id,
+        p_user_id,
+        coalesce((select record_count from public.template_summaries where template_id = p_template_id), 0)
+    )
+    returning id into v_job_id;
+
+    -- The totals of a hidden template are not read anymore
+    delete from public.template_summaries where template_id = p_template_id;
+
+    return jsonb_build_object('status', 'queued', 'job_id', v_job_id);
+end;
+$$;
+
+-- Claim the oldest unfinished job nobody holds a lease on (null when there is none)
+create or replace function public.claim_template_deletion_job(p_lease_seconds integer default 60)
+returns jsonb
+language sql
+as $$
+    update public.template_deletion_jobs j
+    set status = 'running',
+        lease_until = now() + make_interval(secs => p_lease_seconds),
+        updated_at = now()
+    where j.id = (
+        select id from public.template_deletion_jobs
+        where status <> 'done'
+          and (lease_until is null or lease_until < now())
+        order by created_at
+        limit 1
+        for update skip locked
+    )
+    returning to_jsonb(j);
+$$;
+
+-- Delete the next chunk of a job's rows, in id order from the job's resume
+-- point, and renew its lease. Once no rows are left the template itself is
+-- deleted and the job is done. Returns the job.
+create or replace function public.delete_template_data_chunk(
+    p_job_id uuid,
+    p_chunk_size integer default 5000,
+    p_lease_seconds integer default 60
+)
+returns jsonb
+language plpgsql
+as $$
+declare
+    v_job public.template_deletion_jobs;
+    v_deleted bigint;
+    v_last_id uuid;
+begin
+    select * into v_job from public.template_deletion_jobs where id = p_job_id for update;
+
+    if not found or v_job.status = 'done' then
+        return to_jsonb(v_job);
+    end if;
+
+    -- Deleted rows are not returned to the caller
+    with chunk as (
+        select id from public.template_data
+        where template_id = v_job.template_id
+          and id > coalesce(v_job.last_id, '00000000-0000-0000-0000-000000000000'::uuid)
+        order by id
+        limit p_chunk_size
+    ), deleted as (
+        delete from public.template_data d
+        using chunk
+        where d.id = chunk.id
+        returning d.id
+    )
+    select count(*), (array_agg(id order by id desc))[1]
+    into v_deleted, v_last_id
+    from deleted;
+
+    if v_deleted > 0 then
+        update public.template_deletion_jobs
+        set deleted_rows = deleted_rows + v_deleted,
+            last_id = v_last_id,
+            lease_until = now() + make_interval(secs => p_lease_seconds),
+            error = null,
+            updated_at = now()
+        where id = p_job_id
+        returning * into v_job;
+    elsif exists (select 1 from public.template_data where template_id = v_job.template_id) then
+        -- Rows written behind the resume point while the job ran: start over
+        update public.template_deletion_jobs
+        set last_id = null,
+            lease_until = now() + make_interval(secs => p_lease_seconds),
+            updated_at = now()
+        where id = p_job_id
+        returning * into v_job;
+    else
+        delete from public.templates where id = v_job.template_id;
+
+        update public.template_deletion_jobs
+        set status = 'done',
+            lease_until = null,
+            error = null,
+            updated_at = now(),
+            finished_at = now()
+        where id = p_job_id
+        returning * into v_job;
+    end if;
+
+    return to_jsonb(v_job);
+end;
+$$;
+
+-- Rows deleted by a job do not update the running totals: the summary of a
+-- hidden template is gone, and keeping min/max exact would rescan the
+-- remaining rows on every chunk
+create or replace function public.template_summaries_on_change()
+returns trigger
+language plpgsql
+as $$
+declare
+    v_changes jsonb;
+begin
+    if TG_OP = 'INSERT' then
+        select jsonb_agg(jsonb_build_object('t', template_id, 'u', user_id, 'v', values, 's', 1))
+        into v_changes from new_rows;
+    elsif TG_OP = 'DELETE' then
+        select jsonb_agg(jsonb_build_object('t', o.template_id, 'u', o.user_id, 'v', o.values, 's', -1))
+        into v_changes
+        from old_rows o
+        where not exists (
+            select 1 from public.templates t
+            where t.id = o.template_id and t.deleted_at is not null
+        );
+    else
+        select jsonb_agg(c) into v_changes from (
+            select jsonb_build_object('t', template_id, 'u', user_id, 'v', values, 's', -1) as c from old_rows
+            union all
+            select jsonb_build_object('t', template_id, 'u', user_id, 'v', values, 's', 1) from new_rows
+        ) changes;
+    end if;
+
+    perform public.apply_template_summary_changes(v_changes);
+    return null;
+end;
+$$;
+
+-- Dashboard without hidden templates
+create or replace function public.user_templates_summary(p_user_id uuid)
+returns jsonb
+language sql
+stable
+as $$
+    select coalesce(jsonb_agg(jsonb_build_object(
+        'template_id', t.id,
+        'name', t.name,
+        'fields', t.fields,
+        'record_count', coalesce(s.record_count, 0),
+        'totals', coalesce(s.fields, '{}'::jsonb),
+        'last_entry_at', l.created_at
+    ) order by t.created_at, t.id), '[]'::jsonb)
+    from public.templates t
+    left join public.template_summaries s on s.template_id = t.id
+    -- Newest entry from the keyset index (template_id, user_id, created_at desc, id desc)
+    left join lateral (
+        select d.created_at
+        from public.template_data d
+        where d.template_id = t.id and d.user_id = p_user_id
+        order by d.created_at desc
+        limit 1
+    ) l on true
+    where t.user_id = p_user_id
+      and t.deleted_at is null;
+$$;
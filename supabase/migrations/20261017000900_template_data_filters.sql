@@ -0,0 +1,72 @@
+-- Equality filters on `values` (`values=cs.{...}`) are answered from this index
+create index if not exists template_data_values_idx
+    on public.template_data using gin ("values" jsonb_path_ops);
+
+-- Whether `values` matches every filter of a list of {"field", "op", "value"}
+-- (value: an array for `in`). Same semantics as the PostgREST filters built by
+-- the API: eq/in compare JSON values, lt/gt only compare values of the same
+-- JSON type (numbers with numbers, strings with strings).
+create or replace function public.template_data_matches(p_values jsonb, p_filters jsonb)
+returns boolean
+language sql
+immutable
+as $$
+    select coalesce(bool_and(coalesce(
+        case f ->> 'op'
+            when 'eq' then p_values @> jsonb_build_object(f ->> 'field', f -> 'value')
+            when 'in' then (p_values -> (f ->> 'field')) in (select jsonb_array_elements(f -> 'value'))
+            when 'lt' then jsonb_typeof(p_values -> (f ->> 'field')) = jsonb_typeof(f -> 'value')
+                and p_values -> (f ->> 'field') < f -> 'value'
+            when 'gt' then jsonb_typeof(p_values -> (f ->> 'field')) = jsonb_typeof(f -> 'value')
+                and p_values -> (f ->> 'field') > f -> 'value'
+        end,
+        false
+    )), true)
+    from jsonb_array_elements(coalesce(p_filters, '[]'::jsonb)) f
+$$;
+
+-- The aggregates also apply to a created_at range and field filters
+drop function if exists public.aggregate_template_data(uuid, uuid, text, text, text);
+
+create or replace function public.aggregate_template_data(
+    p_template_id uuid,
+    p_user_id uuid,
+    p_field text,
+    p_group_by text default null,
+    p_bucket text default null,
+    p_created_after timestamptz default null,
+    p_created_before timestamptz default null,
+    p_filters jsonb default null
+)
+returns table (
+    group_value text,
+    bucket timestamptz,
+    records bigint,
+    count bigint,
+    sum numeric,
+    avg numeric,
+    min numeric,
+    max numeric
+)
+language sql
+stable
+as $$
+    select
+        case when p_group_by is null then null else d.values ->> p_group_by end,
+        case when p_bucket is null then null else date_trunc(p_bucket, d.created_at) end,
+        count(*),
+        count(n.value),
+        sum(n.value),
+        avg(n.value),
+        min(n.value),
+        max(n.value)
+    from public.template_data d
+    cross join lateral (select public.template_data_number(d.values -> p_field) as value) n
+    where d.template_id = p_template_id
+      and d.user_id = p_user_id
+      and (p_created_after is null or d.created_at >= p_created_after)
+      and (p_created_before is null or d.created_at < p_created_before)
+      and (p_filters is null or public.template_data_matches(d.values, p_filters))
+    group by 1, 2
+    order by 2 nulls first, 1 nulls first
+$$;
@@ -0,0 +1,287 @@
+-- Compact storage of template data: rows of templates with `compact` store
+-- `values` as [layout version, value of fields[0], value of fields[1], ...]
+-- instead of repeating every field name (see app/compact.py). Both forms may
+-- coexist in a template; every function below reads either.
+alter table public.templates add column if not exists compact boolean not null default false;
+
+-- 16 bit fingerprint of the field names in order, like app.compact.layout_version
+create or replace function public.template_layout_version(p_fields jsonb)
+returns integer
+language sql
+immutable
+as $$
+    select ('x' || substr(md5(coalesce(string_agg(f ->> 'name', chr(31) order by position), '')), 1, 4))::bit(16)::integer
+    from jsonb_array_elements(p_fields) with ordinality as e (f, position)
+$$;
+
+-- Value of the field at `p_position` (1 based, as in the template fields) of a row in either form
+create or replace function public.template_data_field(p_values jsonb, p_name text, p_position integer)
+returns jsonb
+language sql
+immutable
+as $$
+    select case when jsonb_typeof(p_values) = 'array' then p_values -> p_position else p_values -> p_name end
+$$;
+
+-- Values of a row as an object
+create or replace function public.template_data_object(p_values jsonb, p_fields jsonb)
+returns jsonb
+language sql
+immutable
+as $$
+    select case
+        when jsonb_typeof(p_values) <> 'array' then p_values
+        else coalesce((
+            select jsonb_object_agg(e.f ->> 'name', p_values -> e.position::integer)
+            from jsonb_array_elements(p_fields) with ordinality as e (f, position)
+            where jsonb_typeof(p_values -> e.position::integer) <> 'null'
+        ), '{}'::jsonb)
+    end
+$$;
+
+-- Values of a row in the storage form of its template
+create or replace function public.template_data_encode(p_values jsonb, p_fields jsonb, p_compact boolean)
+returns jsonb
+language sql
+immutable
+as $$
+    select case
+        when not p_compact then public.template_data_object(p_values, p_fields)
+        when jsonb_typeof(p_values) = 'array' then p_values
+        else jsonb_build_array(public.template_layout_version(p_fields)) || coalesce((
+            select jsonb_agg(coalesce(p_values -> (e.f ->> 'name'), 'null'::jsonb) order by e.position)
+            from jsonb_array_elements(p_fields) with ordinality as e (f, position)
+        ), '[]'::jsonb)
+    end
+$$;
+
+-- Running totals reading fields by position in compact rows
+create or replace function public.apply_template_summary_changes(p_changes jsonb)
+returns void
+language plpgsql
+as $$
+declare
+    r record;
+    v_current jsonb;
+    v_count bigint;
+    v_sum numeric;
+    v_min numeric;
+    v_max numeric;
+begin
+    if p_changes is null or jsonb_array_length(p_changes) = 0 then
+        return;
+    end if;
+
+    -- Record counts
+    for r in
+        select (c ->> 't')::uuid as template_id, (c ->> 'u')::uuid as user_id, sum((c ->> 's')::int) as records
+        from jsonb_array_elements(p_changes) c
+        group by 1, 2
+    loop
+        -- Templates deleted in the same transaction are skipped
+        insert into public.template_summaries as s (template_id, user_id, record_count)
+        select r.template_id, r.user_id, r.records
+        where exists (select 1 from public.templates where id = r.template_id)
+        on conflict (template_id) do update
+            set record_count = s.record_count + excluded.record_count,
+                updated_at = now();
+    end loop;
+
+    -- Per numeric field deltas
+    for r in
+        select
+            ch.template_id,
+            f.field ->> 'name' as field,
+            f.position::integer as position,
+            sum(ch.sign) as count,
+            sum(ch.sign * n.value) as sum,
+            min(n.value) filter (where ch.sign > 0) as added_min,
+            max(n.value) filter (where ch.sign > 0) as added_max,
+            min(n.value) filter (where ch.sign < 0) as removed_min,
+            max(n.value) filter (where ch.sign < 0) as removed_max
+        from (
+            select (c ->> 't')::uuid as template_id, c -> 'v' as values, (c ->> 's')::int as sign
+            from jsonb_array_elements(p_changes) c
+        ) ch
+        join public.templates t on t.id = ch.template_id
+        cross join lateral jsonb_array_elements(t.fields) with ordinality as f (field, position)
+        cross join lateral (
+            select public.template_data_number(public.template_data_field(ch.values, f.field ->> 'name', f.position::integer)) as value
+        ) n
+        where f.field ->> 'type' in ('int', 'float')
+          and n.value is not null
+        group by 1, 2, 3
+    loop
+        select fields -> r.field into v_current
+        from public.template_summaries
+        where template_id = r.template_id
+        for update;
+
+        v_count := coalesce((v_current ->> 'count')::bigint, 0) + r.count;
+        v_sum := coalesce((v_current ->> 'sum')::numeric, 0) + r.sum;
+        v_min := (v_current ->> 'min')::numeric;
+        v_max := (v_current ->> 'max')::numeric;
+
+        if (r.removed_min is not null and r.removed_min <= v_min)
+            or (r.removed_max is not null and r.removed_max >= v_max) then
+            -- A removed value was the current minimum or maximum: recompute those from the rows
+            select min(n.value), max(n.value) into v_min, v_max
+            from public.template_data d
+            cross join lateral (
+                select public.template_data_number(public.template_data_field(d.values, r.field, r.position)) as value
+            ) n
+            where d.template_id = r.template_id;
+        else
+            v_min := least(v_min, r.added_min);
+            v_max := greatest(v_max, r.added_max);
+        end if;
+
+        update public.template_summaries
+        set fields = jsonb_set(
+                fields,
+                array[r.field],
+                jsonb_build_object('count', v_count, 'sum', v_sum, 'min', v_min, 'max', v_max)
+            ),
+            updated_at = now()
+        where template_id = r.template_id;
+    end loop;
+end;
+$$;
+
+create or replace function public.rebuild_template_summaries(p_template_id uuid default null)
+returns integer
+language plpgsql
+as $$
+declare
+    v_rebuilt integer;
+begin
+    delete from public.template_summaries
+    where p_template_id is null or template_id = p_template_id;
+
+    insert into public.template_summaries (template_id, user_id, record_count, fields)
+    select
+        t.id,
+        t.user_id,
+        (select count(*) from public.template_data d where d.template_id = t.id),
+        coalesce((
+            select jsonb_object_agg(f.field ->> 'name', jsonb_build_object(
+                'count', a.count, 'sum', coalesce(a.sum, 0), 'min', a.min, 'max', a.max
+            ))
+            from jsonb_array_elements(t.fields) with ordinality as f (field, position)
+            cross join lateral (
+                select count(n.value) as count, sum(n.value) as sum, min(n.value) as min, max(n.value) as max
+                from public.template_data d
+                cross join lateral (
+                    select public.template_data_number(public.template_data_field(d.values, f.field ->> 'name', f.position::integer)) as value
+                ) n
+                where d.template_id = t.id
+            ) a
+            where f.field ->> 'type' in ('int', 'float')
+              and a.count > 0
+        ), '{}'::jsonb)
+    from public.templates t
+    where p_template_id is null or t.id = p_template_id;
+
+    get diagnostics v_rebuilt = row_count;
+    return v_rebuilt;
+end;
+$$;
+
+-- Aggregates over rows in either form
+create or replace function public.aggregate_template_data(
+    p_template_id uuid,
+    p_user_id uuid,
+    p_field text,
+    p_group_by text default null,
+    p_bucket text default null,
+    p_created_after timestamptz default null,
+    p_created_before timestamptz default null,
+    p_filters jsonb default null
+)
+returns table (
+    group_value text,
+    bucket timestamptz,
+    records bigint,
+    count bigint,
+    sum numeric,
+    avg numeric,
+    min numeric,
+    max numeric
+)
+language sql
+stable
+as $$
+    select
+        case when p_group_by is null then null else v.values ->> p_group_by end,
+        case when p_bucket is null then null else date_trunc(p_bucket, d.created_at) end,
+        count(*),
+        count(n.value),
+        sum(n.value),
+        avg(n.value),
+        min(n.value),
+        max(n.value)
+    from public.template_data d
+    join public.templates t on t.id = d.template_id
+    cross join lateral (select public.template_data_object(d.values, t.fields) as values) v
+    cross join lateral (select public.template_data_number(v.values -> p_field) as value) n
+    where d.template_id = p_template_id
+      and d.user_id = p_user_id
+      and (p_created_after is null or d.created_at >= p_created_after)
+      and (p_created_before is null or d.created_at < p_created_before)
+      and (p_filters is null or public.template_data_matches(v.values, p_filters))
+    group by 1, 2
+    order by 2 nulls first, 1 nulls first
+$$;
+
+-- Switch a template to (or back from) compact storage and rewrite the next
+-- chunk of its rows, in id order after p_after_id. Returns
+-- {"rows": rows scanned, "converted": rows rewritten, "last_id": resume point
+-- or null once every row was scanned}.
+create or replace function public.convert_template_values(
+    p_template_id uuid,
+    p_compact boolean,
+    p_after_id uuid default null,
+    p_chunk_size integer default 5000
+)
+returns jsonb
+language plpgsql
+as $$
+declare
+    v_fields jsonb;
+    v_rows integer;
+    v_converted integer;
+    v_last_id uuid;
+begin
+    update public.templates set compact = p_compact
+    where id = p_template_id
+    returning fields into v_fields;
+
+    if v_fields is null then
+        return jsonb_build_object('rows', 0, 'converted', 0, 'last_id', null);
+    end if;
+
+    select count(*), max(id::text)::uuid into v_rows, v_last_id
+    from (
+        select id from public.template_data
+        where template_id = p_template_id
+          and (p_after_id is null or id > p_after_id)
+        order by id
+        limit p_chunk_size
+    ) chunk;
+
+    update public.template_data d
+    set values = public.template_data_encode(d.values, v_fields, p_compact)
+    where d.template_id = p_template_id
+      and (p_after_id is null or d.id > p_after_id)
+      and d.id <= v_last_id
+      and (jsonb_typeof(d.values) = 'array') <> p_compact;
+
+    get diagnostics v_converted = row_count;
+
+    return jsonb_build_object(
+        'rows', v_rows,
+        'converted', v_converted,
+        'last_id', case when v_rows < p_chunk_size then null else v_last_id end
+    );
+end;
+$$;
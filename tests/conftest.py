@@ -0,0 +1,67 @@
+import os
+import time
+
+# The app reads its configuration at import time
+os.environ.setdefault("SUPABASE_JWT_SECRET", "test-secret-test-secret-test-secret-00")
+os.environ.setdefault("RATE_LIMIT_ENABLED", "false")
+os.environ.setdefault("STORAGE_BACKEND", "supabase")
+
+import httpx
+import jwt
+import pytest
+from supabase import AsyncClientOptions, acreate_client
+
+from app.cache import template_cache
+from app.dependencies import create_http_client, get_supabase_client
+from app.main import app
+from benchmarks.fake_backend import FakeSupabase
+
+# Round trip added by the fake backend to every call, in seconds, for the tests
+# that measure waiting on it (they override the `backend` fixture)
+BACKEND_LATENCY = 0.2
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture
+def backend() -> FakeSupabase:
+    return FakeSupabase()
+
+
+@pytest.fixture
+async def api(backend: FakeSupabase):
+    """Client of the app, with Supabase served by the in-memory fake backend"""
+    http = create_http_client(transport=httpx.ASGITransport(backend.app))
+    supabase = await acreate_client("http://fake.local", "anon", options=AsyncClientOptions(httpx_client=http))
+
+    async def fake_supabase_client():
+        return supabase
+
+    app.dependency_overrides[get_supabase_client] = fake_supabase_client
+    template_cache.clear()
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app), base_url="http://test") as client:
+        yield client
+    app.dependency_overrides.clear()
+    template_cache.clear()
+    await http.aclose()
+
+
+@pytest.fixture
+def headers() -> dict[str, str]:
+    now = int(time.time())
+    claims = {"iss": "test", "sub": "user-1", "aud": "authenticated", "email": "user@test.local", "iat": now, "exp": now + 3600}
+    token = jwt.encode(claims, os.environ["SUPABASE_JWT_SECRET"], algorithm="HS256")
+    return {"Authorization": f"Bearer {token}"}
+
+
+@pytest.fixture
+async def template_id(api: httpx.AsyncClient, headers: dict[str, str]) -> str:
+    response = await api.post("/templates/", json={
+        "name": "Agua Tomada",
+        "fields": [{"name": "Cantidad", "type": "int"}, {"name": "Tipo", "type": "string"}],
+    }, headers=headers)
+    assert response.status_code == 200, response.text
+    return response.json()["template_id"]
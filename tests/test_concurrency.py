@@ -0,0 +1,36 @@
+"""Requests waiting on Supabase must not block each other (async data path)."""
+import asyncio
+import time
+
+import pytest
+
+from benchmarks.fake_backend import FakeSupabase
+
+from .conftest import BACKEND_LATENCY
+
+pytestmark = pytest.mark.anyio
+
+CONCURRENT_REQUESTS = 20
+
+
+@pytest.fixture
+def backend() -> FakeSupabase:
+    return FakeSupabase(latency=BACKEND_LATENCY)
+
+
+async def test_backend_calls_overlap(api, headers, template_id, backend):
+    # Warm the template cache: each request below is then a single insert
+    response = await api.post(f"/templates/{template_id}/data", json={"values": {"Cantidad": 0}}, headers=headers)
+    assert response.status_code == 200, response.text
+
+    start = time.perf_counter()
+    responses = await asyncio.gather(*(
+        api.post(f"/templates/{template_id}/data", json={"values": {"Cantidad": i}}, headers=headers)
+        for i in range(CONCURRENT_REQUESTS)
+    ))
+    elapsed = time.perf_counter() - start
+
+    assert [r.status_code for r in responses] == [200] * CONCURRENT_REQUESTS
+    assert len(backend.table("template_data").rows) == CONCURRENT_REQUESTS + 1
+    # Serialized calls would take CONCURRENT_REQUESTS * BACKEND_LATENCY
+    assert elapsed < 2 * BACKEND_LATENCY, f"{CONCURRENT_REQUESTS} requests took {elapsed:.2f}s"
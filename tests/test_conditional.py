@@ -0,0 +1,28 @@
+"""ETag conditional GETs, with bodies that may be sent gzipped or not."""
+import pytest
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.mark.parametrize("encoding", ["identity", "gzip"])
+async def test_template_data_etag(api, headers, template_id, encoding):
+    for i in range(50):
+        response = await api.post(f"/templates/{template_id}/data", json={"values": {"Cantidad": i, "Tipo": "agua"}}, headers=headers)
+        assert response.status_code == 200, response.text
+
+    response = await api.get(f"/templates/{template_id}/data", params={"limit": 50}, headers={**headers, "Accept-Encoding": encoding})
+
+    assert response.status_code == 200
+    assert response.headers.get("content-encoding", "identity") == encoding
+    # Same tag for both encodings: it must be weak, and caches must vary on the encoding
+    etag = response.headers["etag"]
+    assert etag.startswith('W/"')
+    assert "Accept-Encoding" in response.headers["vary"]
+
+    response = await api.get(f"/templates/{template_id}/data", params={"limit": 50}, headers={
+        **headers, "Accept-Encoding": encoding, "If-None-Match": etag,
+    })
+
+    assert response.status_code == 304
+    assert response.headers["etag"] == etag
+    assert "Accept-Encoding" in response.headers["vary"]
@@ -0,0 +1,22 @@
+"""Streamed export of template data."""
+import pytest
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.mark.parametrize("gzip", [False, True])
+async def test_export_csv(api, headers, template_id, gzip):
+    for i in range(3):
+        response = await api.post(f"/templates/{template_id}/data", json={"values": {"Cantidad": i, "Tipo": "agua"}}, headers=headers)
+        assert response.status_code == 200, response.text
+
+    response = await api.get(f"/templates/{template_id}/data/export", params={"format": "csv", "gzip": gzip}, headers=headers)
+
+    assert response.status_code == 200
+    if gzip:
+        assert response.headers["content-encoding"] == "gzip"
+    # The client decodes the transfer encoding: the saved file is plain CSV
+    assert response.headers["content-disposition"] == f'attachment; filename="{template_id}.csv"'
+    lines = response.text.splitlines()
+    assert lines[0] == "id,created_at,Cantidad,Tipo"
+    assert sorted(line.split(",", 2)[2] for line in lines[1:]) == ["0,agua", "1,agua", "2,agua"]
@@ -0,0 +1,32 @@
+"""Prometheus exposition of the app's metrics."""
+import httpx
+import pytest
+
+from app.main import app  # noqa: F401  (registers the cache and write-behind collectors)
+from app.metrics import backend_call_labels, registry
+
+
+def test_totals_are_counters():
+    # Prometheus reserves the _total suffix for counters, the only type rate() applies to
+    for metric in registry.metrics:
+        assert metric.name.endswith("_total") == (metric.type == "counter"), metric.name
+
+
+def test_cache_totals_exposed_as_counters():
+    text = registry.render()
+    assert "# TYPE cache_hits_total counter" in text
+    assert "# TYPE write_behind_rows_total counter" in text
+    assert 'cache_hits_total{cache="template"}' in text
+
+
+@pytest.mark.parametrize("method, path, labels", [
+    ("GET", "/rest/v1/template_data", ("template_data", "select")),
+    ("POST", "/rest/v1/rpc/aggregate_template_data", ("aggregate_template_data", "rpc")),
+    ("POST", "/auth/v1/token", ("auth", "token")),
+    ("GET", "/auth/v1/.well-known/jwks.json", ("auth", ".well-known/jwks.json")),
+    # Ids in auth paths would make a label per user
+    ("PUT", "/auth/v1/admin/users/3f1c6a52-9b0e-4d3a-8f7e-2a1b5c6d7e8f", ("auth", "admin/users/{id}")),
+    ("DELETE", "/auth/v1/admin/users/3f1c6a52-9b0e-4d3a-8f7e-2a1b5c6d7e8f/factors/42", ("auth", "admin/users/{id}/factors/{id}")),
+])
+def test_backend_call_labels(method, path, labels):
+    assert backend_call_labels(httpx.Request(method, f"http://supabase.local{path}")) == labels
@@ -0,0 +1,57 @@
+"""`fields` projection of the data list returns `values` as the full list does."""
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from app.main import app
+from app.storage import SQLiteRepository, get_repository
+
+pytestmark = pytest.mark.anyio
+
+# Stored as is, bypassing validation: rows written before it, or by other clients
+STORED_VALUES = [
+    {"Cantidad": 1, "Tipo": None},
+    {"Cantidad": 2},
+    {"Cantidad": None, "Tipo": "agua"},
+]
+
+
+@pytest.fixture(params=["supabase", "sqlite"])
+async def store_rows(request, api, backend, headers):
+    """Function storing raw rows in the storage backend under test"""
+    if request.param == "supabase":
+        async def store(template_id: str, rows: list[dict]) -> None:
+            backend.add_rows(template_id, "user-1", rows, datetime.now(timezone.utc), timedelta(seconds=1))
+        yield store
+        return
+
+    repository = SQLiteRepository(":memory:")
+
+    async def sqlite_repository():
+        return repository
+
+    app.dependency_overrides[get_repository] = sqlite_repository
+
+    async def store(template_id: str, rows: list[dict]) -> None:
+        for values in rows:
+            await repository.insert_data(template_id, "user-1", values)
+    yield store
+    await repository.close()
+
+
+@pytest.mark.parametrize("compact", [False, True])
+async def test_projection_keeps_nulls(api, headers, store_rows, compact):
+    response = await api.post("/templates/", json={
+        "name": "Agua Tomada",
+        "compact": compact,
+        "fields": [{"name": "Cantidad", "type": "int"}, {"name": "Tipo", "type": "string"}],
+    }, headers=headers)
+    template_id = response.json()["template_id"]
+    # Object rows, also in compact templates (written before a conversion)
+    await store_rows(template_id, STORED_VALUES)
+
+    full = await api.get(f"/templates/{template_id}/data", headers=headers)
+    projected = await api.get(f"/templates/{template_id}/data", params={"fields": "Cantidad,Tipo"}, headers=headers)
+
+    assert sorted(map(repr, (row["values"] for row in full.json()["data"]))) == sorted(map(repr, STORED_VALUES))
+    assert [row["values"] for row in projected.json()["data"]] == [row["values"] for row in full.json()["data"]]
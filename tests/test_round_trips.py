@@ -0,0 +1,100 @@
+"""Backend round trips per mutation: one conditional call each (template cached)."""
+import pytest
+
+from app.cache import template_cache
+from benchmarks.fake_backend import FakeSupabase
+
+pytestmark = pytest.mark.anyio
+
+
+async def round_trips(backend: FakeSupabase, request) -> tuple[int, object]:
+    """Backend calls made while serving a request, and its response"""
+    before = sum(backend.calls.values())
+    response = await request
+    return sum(backend.calls.values()) - before, response
+
+
+async def create_entry(api, headers, template_id: str) -> str:
+    response = await api.post(f"/templates/{template_id}/data", json={"values": {"Cantidad": 1}}, headers=headers)
+    assert response.status_code == 200, response.text
+    return response.json()["data_id"]
+
+
+async def test_create_template(api, headers, backend):
+    calls, response = await round_trips(backend, api.post("/templates/", json={
+        "name": "Café", "fields": [{"name": "Tazas", "type": "int"}],
+    }, headers=headers))
+    assert response.status_code == 200
+    assert calls == 1
+
+
+async def test_create_data(api, headers, backend, template_id):
+    await create_entry(api, headers, template_id)
+    calls, response = await round_trips(backend, api.post(
+        f"/templates/{template_id}/data", json={"values": {"Cantidad": 2}}, headers=headers,
+    ))
+    assert response.status_code == 200
+    assert calls == 1
+
+
+async def test_update_data(api, headers, backend, template_id):
+    data_id = await create_entry(api, headers, template_id)
+    calls, response = await round_trips(backend, api.put(
+        f"/templates/{template_id}/data/{data_id}", json={"values": {"Cantidad": 5}}, headers=headers,
+    ))
+    assert response.status_code == 200
+    assert calls == 1
+
+
+async def test_update_data_template_cache_miss(api, headers, backend, template_id):
+    # The template is needed to validate the values: a cache miss adds its fetch
+    data_id = await create_entry(api, headers, template_id)
+    template_cache.clear()
+    calls, response = await round_trips(backend, api.put(
+        f"/templates/{template_id}/data/{data_id}", json={"values": {"Cantidad": 5}}, headers=headers,
+    ))
+    assert response.status_code == 200
+    assert calls == 2
+
+
+async def test_update_missing_data(api, headers, backend, template_id):
+    await create_entry(api, headers, template_id)
+    calls, response = await round_trips(backend, api.put(
+        f"/templates/{template_id}/data/00000000-0000-0000-0000-000000000000",
+        json={"values": {"Cantidad": 5}}, headers=headers,
+    ))
+    assert response.status_code == 404
+    assert calls == 1
+
+
+async def test_delete_data(api, headers, backend, template_id):
+    data_id = await create_entry(api, headers, template_id)
+    calls, response = await round_trips(backend, api.delete(f"/templates/{template_id}/data/{data_id}", headers=headers))
+    assert response.status_code == 200
+    assert calls == 1
+
+
+async def test_delete_data_template_cache_miss(api, headers, backend, template_id):
+    # The template is checked first, so entries of a template being deleted stay hidden
+    data_id = await create_entry(api, headers, template_id)
+    template_cache.clear()
+    calls, response = await round_trips(backend, api.delete(f"/templates/{template_id}/data/{data_id}", headers=headers))
+    assert response.status_code == 200
+    assert calls == 2
+
+
+async def test_delete_template(api, headers, backend, template_id):
+    calls, response = await round_trips(backend, api.delete(f"/templates/{template_id}", headers=headers))
+    assert response.status_code == 200
+    assert calls == 1
+
+
+async def test_delete_template_with_data(api, headers, backend, template_id):
+    await create_entry(api, headers, template_id)
+    calls, response = await round_trips(backend, api.delete(f"/templates/{template_id}", headers=headers))
+    assert response.status_code == 400
+    assert calls == 1
+
+    calls, response = await round_trips(backend, api.delete(f"/templates/{template_id}?force=true", headers=headers))
+    assert response.status_code == 202
+    assert calls == 1
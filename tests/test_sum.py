@@ -0,0 +1,33 @@
+"""Sum of the 'Cantidad' field of a template."""
+import pytest
+
+pytestmark = pytest.mark.anyio
+
+
+async def create_template(api, headers, cantidad_type: str) -> str:
+    response = await api.post("/templates/", json={
+        "name": "Agua Tomada", "fields": [{"name": "Cantidad", "type": cantidad_type}],
+    }, headers=headers)
+    return response.json()["template_id"]
+
+
+@pytest.mark.parametrize("cantidad_type, values", [
+    # Only values that are already numbers are summed, strings holding one are skipped
+    ("int", [250, 500, "750"]),
+    ("float", [0.5, 1.5, 1]),
+    # Not tracked by the running totals: summed from the rows
+    ("string", ["250", "500", "750.5", "mucho"]),
+])
+async def test_sum_cantidad(api, headers, cantidad_type, values):
+    template_id = await create_template(api, headers, cantidad_type)
+    for value in values:
+        response = await api.post(f"/templates/{template_id}/data", json={"values": {"Cantidad": value}}, headers=headers)
+        assert response.status_code == 200, response.text
+
+    response = await api.get(f"/templates/{template_id}/data/sum", headers=headers)
+
+    assert response.status_code == 200
+    numbers = [value for value in values if isinstance(value, (int, float))]
+    assert response.json()["total_cantidad"] == sum(numbers)
+    assert response.json()["registros_procesados"] == len(numbers)
+    assert response.json()["total_registros"] == len(values)
@@ -0,0 +1,49 @@
+"""Validation of template data values against the template's field types."""
+import pytest
+
+from app.filters import parse_field_filter
+from app.validation import TemplateValidator
+
+FIELDS = [
+    {"name": "Cantidad", "type": "int"},
+    {"name": "Precio", "type": "float"},
+    {"name": "Fecha", "type": "date"},
+    {"name": "Pagado", "type": "boolean"},
+]
+
+
+@pytest.mark.parametrize("values", [
+    {"Cantidad": 5, "Precio": 2.5},
+    {"Cantidad": "5", "Precio": "2.5"},
+    {"Cantidad": 5.0, "Precio": 3},
+    {"Fecha": "2025-05-01"},
+    {"Fecha": "2025-05-01T10:00:00+02:00"},
+    {"Pagado": False},
+])
+def test_valid_values(values):
+    assert TemplateValidator(FIELDS).validate(values) == []
+
+
+@pytest.mark.parametrize("values", [
+    {"Cantidad": True},
+    {"Precio": False},
+    {"Cantidad": 5.5},
+    {"Fecha": "20250501"},
+    {"Fecha": "2025-13-01"},
+    {"Fecha": "2025-02-30"},
+    {"Fecha": "٢٠٢٥-05-01"},
+    {"Fecha": "2025-05-01 10:00"},
+    {"Pagado": 1},
+])
+def test_invalid_values(values):
+    assert TemplateValidator(FIELDS).validate(values) == [
+        f"El valor para el campo '{name}' no es del tipo esperado: {field['type']}"
+        for name in values for field in FIELDS if field["name"] == name
+    ]
+
+
+def test_date_filters_are_iso():
+    field_types = {field["name"]: field["type"] for field in FIELDS}
+    assert parse_field_filter("Fecha:lt:2025-05-01", field_types).value == "2025-05-01"
+    with pytest.raises(ValueError):
+        parse_field_filter("Fecha:lt:20250501", field_types)